@@ -0,0 +1,184 @@
+"""End-to-end benchmark of the crawl pipeline against the local stand-in site (testdata/ucr_site.py).
+Each scenario crawls all the pages of a synthetic search result and extracts the articles from them with
+music.article_crawl.crawl_article_info(), the pipeline of get_article_info_list() in music/crawl.py, and with
+the fetcher of its 'requests' mode, music.http_session.get_text() (music/crawl.py itself runs its demo cells
+against the real site when imported, so it cannot be imported here). The 'bounded' scenario limits
+the memory of the pages fetched ahead with a music.memory_guard.MemoryBudget. Reported per scenario:
+pages/s, articles/s, the time to the first article, the fetch time, the p50/p95/p99 page latency,
+and the peak RSS (each scenario runs in a fresh process, so that the peaks are comparable).
+The split of the extraction time into parsing and extraction is measured by benchmarks/extract.py.
+The results are also written as JSON, to compare runs across versions.
+Usage (from the project root):
+    python -m benchmarks.crawl [--pages 50] [--latency 0.05] [--jitter 0.02] [--output results.json]
+"""
+
+
+#%%
+# Setup / Data
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from pathlib import Path
+
+from music import http_session, parsers
+from music.article_crawl import crawl_article_info
+from music.http_cache import HTTPCache
+from music.memory_guard import MemoryBudget
+from music.urls import page_url
+from settings import *
+from testdata.ucr_site import FixtureSite
+
+try:
+    import resource
+except ImportError:                             # not available on Windows
+    resource = None
+
+SCENARIOS = {
+    'sequential': {'concurrency': 1, 'cached': False},
+    'concurrent': {'concurrency': 8, 'cached': False},
+    'cached': {'concurrency': 8, 'cached': True},
+    'bounded': {'concurrency': 8, 'cached': False, 'max_bytes': 16 * 1024 * 1024},
+}
+DEFAULT_OUTPUT_DIR = PROJECT_DIR / 'benchmarks' / 'results'
+
+
+#%%
+def percentile(values, p):
+    """Returns the p-th percentile (0-100) of values, by linear interpolation.
+    """
+
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method='inclusive')[min(98, max(0, round(p) - 1))]
+
+
+#%%
+def peak_rss_mb():
+    """Returns the peak resident set size of the current process in MB (None if it cannot be measured).
+    """
+
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024      # bytes on macOS, KB on Linux
+
+
+#%%
+def crawl_once(start_url, concurrency, budget=None):
+    """Crawls all the pages from start_url and extracts their articles, as get_article_info_list() does in
+    the 'requests' mode; returns the measurements.
+    """
+
+    latencies = []
+
+    def fetch_page(page):
+        start = time.perf_counter()
+        html = http_session.get_text(page_url(start_url, page), allow_redirects=False)
+        latencies.append(time.perf_counter() - start)
+        return html
+
+    articles = 0
+    first_article = None
+    start = time.perf_counter()
+    for _ in crawl_article_info(start_url, fetch_page, None, concurrency, budget=budget):
+        articles += 1
+        first_article = first_article or time.perf_counter() - start
+    wall_time = time.perf_counter() - start
+    pages = len(latencies)
+
+    return {
+        'pages': pages,
+        'articles': articles,
+        'wall_s': wall_time,
+        'pages_per_s': pages / wall_time,
+        'articles_per_s': articles / wall_time,
+        'first_article_ms': (first_article or 0.0) * 1000,
+        'fetch_s': sum(latencies),              # summed over the fetching threads, so it may exceed wall_s
+        'latency_p50_ms': percentile(latencies, 50) * 1000,
+        'latency_p95_ms': percentile(latencies, 95) * 1000,
+        'latency_p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+#%%
+def run_scenario(start_url, concurrency, cached, max_bytes=None):
+    """Runs a scenario (in a fresh process, see main()) and returns its measurements, including the peak RSS.
+    In the cached scenario, a first crawl fills an empty response cache and the second one is measured.
+    With max_bytes, the pages in flight are limited by a MemoryBudget(max_bytes).
+    """
+
+    http_session.configure_session(pool_size=max(concurrency, 1))
+    with tempfile.TemporaryDirectory() as cache_dir:
+        if cached:
+            http_session.set_cache(HTTPCache(Path(cache_dir) / 'http_cache.sqlite', ttl=3600))
+            crawl_once(start_url, concurrency)
+        result = crawl_once(start_url, concurrency, MemoryBudget(max_bytes) if max_bytes else None)
+        http_session.set_cache(None)
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+#%%
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=PROJECT_DIR).stdout.strip() or None
+    except OSError:
+        return None
+
+
+#%%
+def print_results(results):
+    print(f'{"scenario":<12} {"pages/s":>8} {"arts/s":>8} {"1st ms":>8} {"fetch s":>8} '
+          f'{"p50 ms":>7} {"p95 ms":>7} {"p99 ms":>7} {"RSS MB":>7}')
+    for name, r in results.items():
+        rss = f'{r["peak_rss_mb"]:>7.1f}' if r['peak_rss_mb'] is not None else f'{"-":>7}'
+        print(f'{name:<12} {r["pages_per_s"]:>8.1f} {r["articles_per_s"]:>8.1f} {r["first_article_ms"]:>8.1f} '
+              f'{r["fetch_s"]:>8.2f} {r["latency_p50_ms"]:>7.1f} {r["latency_p95_ms"]:>7.1f} '
+              f'{r["latency_p99_ms"]:>7.1f} {rss}')
+
+
+#%%
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='End-to-end crawl benchmark against the local stand-in site.')
+    parser.add_argument('--pages', type=int, default=50, help='the number of pages of the search result')
+    parser.add_argument('--latency', type=float, default=0.05, help='the response latency of the site, in seconds')
+    parser.add_argument('--jitter', type=float, default=0.02, help='the max deviation of the latency, in seconds')
+    parser.add_argument('--scenarios', nargs='*', default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument('--output', type=Path, help='the JSON results file (default: benchmarks/results/...)')
+    args = parser.parse_args(argv)
+
+    results = {}
+    with FixtureSite(n_pages=args.pages, latency=args.latency, jitter=args.jitter) as site:
+        for name in args.scenarios:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+                results[name] = executor.submit(run_scenario, site.start_url, **SCENARIOS[name]).result()
+    print_results(results)
+
+    output = args.output or DEFAULT_OUTPUT_DIR / f'crawl-{datetime.now():%Y%m%d-%H%M%S}.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        'benchmark': 'crawl',
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {'pages': args.pages, 'latency': args.latency, 'jitter': args.jitter,
+                       'parser': parsers.get_backend(), 'scenarios': {n: SCENARIOS[n] for n in args.scenarios}},
+        'results': results,
+    }, indent=4), encoding='utf-8')
+    print(f'Results written to {output}')
+
+
+#%%
+if __name__ == '__main__':
+    main()
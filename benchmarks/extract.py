@@ -0,0 +1,86 @@
+"""Benchmark of the single-pass article extraction (music.extract.extract_article_info()) against the original one,
+which looked up every field of every article with findNext()/find_next() (kept here as extract_article_info_findnext()).
+The original lookups walk forward through the document from the article until they match, with bs4's generic
+matching for every element they pass; if an element is missing from an article, the walk runs on into the next
+articles (up to the end of the document, which makes the extraction quadratic in the page size).
+The single-pass extraction visits every element of an article once, and nothing outside it.
+The pages are synthetic search-result pages of growing size (testdata/ucr_site.py); each page is parsed once,
+and only the extraction from the soup is timed.
+Usage (from the project root):
+    python -m benchmarks.extract [<articles per page> ...]          # default: 10 100 500 1000
+"""
+
+
+#%%
+# Setup / Data
+
+import sys
+import time
+import warnings
+
+from music import parsers
+from music.extract import extract_article_info, get_articles
+from testdata.ucr_site import synthesize_page
+
+DEFAULT_SIZES = (10, 100, 500, 1000)
+DEFAULT_REPEAT = 3
+
+
+#%%
+def extract_article_info_findnext(soup):
+    """The original extraction, as it was in music/crawl.py (for comparison only).
+    """
+
+    article_info_list = []
+    for article in get_articles(soup):
+        div_image = article.findNext('div', {'class': 'article-image-wrapper'})
+        div_content = article.findNext('div', {'class': 'content'})
+        featured_image_url = div_image.findNext('a').attrs['data-image']
+        article_title = div_content.find('a').text
+        article_date = div_content.find_next('time').text
+        article_author = div_content.find_next('em').text.lstrip(' by  ')
+        article_info_list.append((article_title, article_author, article_date, featured_image_url))
+    return article_info_list
+
+
+#%%
+def time_extraction(extract, soup, repeat=DEFAULT_REPEAT):
+    """Returns the best time in ms of extract(soup) out of repeat runs.
+    """
+
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        extract(soup)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+#%%
+def benchmark_extraction(sizes=DEFAULT_SIZES, repeat=DEFAULT_REPEAT):
+    """Returns {articles per page: (findNext ms, single-pass ms)} for pages of the sizes.
+    """
+
+    results = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)         # findNext() is deprecated in bs4
+        for size in sizes:
+            soup = parsers.make_soup(synthesize_page(1, 1, per_page=size))
+            assert extract_article_info_findnext(soup) == extract_article_info(soup)
+            results[size] = (time_extraction(extract_article_info_findnext, soup, repeat),
+                             time_extraction(extract_article_info, soup, repeat))
+    return results
+
+
+#%%
+def print_results(results):
+    print(f'{"articles/page":>13} {"findNext ms":>12} {"single-pass ms":>15} {"speedup":>8}')
+    for size, (findnext_ms, single_pass_ms) in results.items():
+        print(f'{size:>13} {findnext_ms:>12.1f} {single_pass_ms:>15.1f} {findnext_ms / single_pass_ms:>7.1f}x')
+
+
+#%%
+if __name__ == '__main__':
+
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    print_results(benchmark_extraction(sizes))
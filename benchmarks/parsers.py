@@ -0,0 +1,90 @@
+"""Benchmark of the parser backends from music.parsers on saved search-result pages.
+For each installed backend, reports the time per page (ms/page) and the peak Python memory (tracemalloc)
+of parsing the pages, and of parsing plus extracting the article info from them.
+Note that tracemalloc only sees the memory allocated through Python; the C-level trees of lxml and selectolax
+are not included in the peak memory.
+Usage (from the project root):
+    python -m benchmarks.parsers [<html file> ...]          # default: DATA_DIR / 'soup*.html'
+"""
+
+
+#%%
+# Setup / Data
+
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from music import parsers
+from music.extract import extract_article_info_from_html
+from settings import *
+
+DEFAULT_REPEAT = 5
+
+
+#%%
+def parse(html, backend):
+    """Parses html with the backend, without extracting anything.
+    """
+
+    if backend == 'selectolax':
+        from selectolax.lexbor import LexborHTMLParser
+        return LexborHTMLParser(html)
+    return parsers.make_soup(html, backend)
+
+
+#%%
+def measure(func, pages, repeat=DEFAULT_REPEAT):
+    """Returns (ms/page, peak memory in KB) of calling func(page) for all pages, repeat times.
+    The time is measured without tracemalloc (which slows the allocations down), the memory in a separate pass.
+    """
+
+    func(pages[0])                              # warm-up: imports, caches
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            func(page)
+    ms_per_page = (time.perf_counter() - start) * 1000 / (repeat * len(pages))
+
+    tracemalloc.start()
+    for page in pages:
+        func(page)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return ms_per_page, peak / 1024
+
+
+#%%
+def benchmark_backends(pages, repeat=DEFAULT_REPEAT):
+    """Returns {backend: {'parse': (ms/page, peak KB), 'extract': (ms/page, peak KB)}} for all installed backends.
+    """
+
+    results = {}
+    for backend in parsers.BACKENDS:
+        if not parsers.is_available(backend):
+            continue
+        results[backend] = {
+            'parse': measure(lambda html: parse(html, backend), pages, repeat),
+            'extract': measure(lambda html: extract_article_info_from_html(html, backend), pages, repeat),
+        }
+    return results
+
+
+#%%
+def print_results(results, n_pages):
+    print(f'{n_pages} page(s)')
+    print(f'{"backend":<12} {"parse ms/page":>14} {"parse peak KB":>14} {"extract ms/page":>16} {"extract peak KB":>16}')
+    for backend, result in results.items():
+        (parse_ms, parse_kb), (extract_ms, extract_kb) = result['parse'], result['extract']
+        print(f'{backend:<12} {parse_ms:>14.2f} {parse_kb:>14.0f} {extract_ms:>16.2f} {extract_kb:>16.0f}')
+
+
+#%%
+if __name__ == '__main__':
+
+    files = [Path(arg) for arg in sys.argv[1:]] or sorted(DATA_DIR.glob('soup*.html'))
+    if not files:
+        sys.exit('No pages to parse; save some first (see music/crawl.py) or pass HTML files as arguments.')
+    pages = [file.read_text(encoding='utf-8', errors='replace') for file in files]
+    print_results(benchmark_backends(pages), len(pages))
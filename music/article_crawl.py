@@ -0,0 +1,86 @@
+"""The streaming extraction of the article records of a multi-page search result: the pipeline behind
+iter_article_info() and get_article_info_list() in music/crawl.py, apart from the fetchers.
+The pages are fetched by music.crawl_engine.crawl_paginated(), extracted (through the extract cache, or in worker
+processes, if specified), and their records are deduplicated, stored and checkpointed page by page;
+so, it runs the same on the real site (the fetchers of music/crawl.py) and on the local stand-in site
+(testdata.ucr_site.FixtureSite, with music.http_session.get_text()).
+"""
+
+
+#%%
+# Setup / Data
+
+from functools import partial
+from urllib.parse import urljoin
+
+from music import parsers
+from music.crawl_engine import crawl_paginated, map_in_processes
+from music.extract import article_key, extract_article_info_from_html, inspect_page
+from music.urls import page_url
+
+
+#%%
+def crawl_article_info(start_url, fetch_page, max_pages=1, concurrency=1, extract_cache=None, checkpoint=None,
+                       incremental=False, workers=0, store=None, budget=None, dedupe=None, backend=None,
+                       prefetch=None):
+    """Generator that yields the (title, author, date, image_url) tuple of each article of the multi-page list
+    that starts at start_url, as soon as its page is fetched and extracted.
+    Parameters:
+    - fetch_page: a blocking callable that takes a page number and returns the HTML of that page of the list,
+      e.g. lambda page: get_next_html(start_url, page, mode) from music/crawl.py; it must raise on error responses
+      (see music.http_session.get_text()), or an error page ends the list
+    - max_pages, concurrency, prefetch, budget: as in music.crawl_engine.crawl_paginated()
+    - extract_cache, workers, store, dedupe, checkpoint, incremental: as in iter_article_info() in music/crawl.py
+    - backend: the parser backend of the extraction (by default, the one selected with music.parsers.set_backend())
+    If a fetch fails, its exception is raised after the records of the pages before it have been yielded
+    (and checkpointed); the checkpoint is finished only when the crawl reaches the end of the list.
+    """
+
+    page = checkpoint.next_page() if checkpoint is not None else 1
+    next_html = crawl_paginated(fetch_page, inspect_page, page, max_pages, concurrency, prefetch, budget)
+
+    # The parser backend is passed explicitly, since worker processes do not share the module state;
+    # the URLs of the articles are extracted as well, for the store (they are not part of the yielded tuples)
+    extract = partial(extract_article_info_from_html, backend=backend or parsers.get_backend(), with_url=True)
+    if extract_cache is not None:
+        extract = partial(extract_cache.extract, extract=extract)
+    if workers:
+        next_records = map_in_processes(extract, next_html, workers)
+    else:
+        next_records = (extract(html) for html in next_html)
+
+    for records in next_records:
+        merged_records = []
+        if dedupe is not None:
+            records, merged_records = dedupe.filter_page(records)
+        if store is not None:
+            url = page_url(start_url, page)
+            store.upsert_page([(urljoin(url, article_url) if article_url else None,) + tuple(info)
+                               for article_url, *info in records + merged_records])
+        records = [tuple(record[1:]) for record in records]
+        if checkpoint is None:
+            yield from records
+        else:
+            new_records = [record for record in records if article_key(record) not in checkpoint.seen]
+            yield from new_records if incremental else records
+            checkpoint.save(page, [article_key(record) for record in records])
+            if incremental and not new_records:
+                next_records.close()
+                next_html.close()
+                return
+        page += 1
+    if checkpoint is not None:
+        checkpoint.finish()
+
+
+#%%
+if __name__ == '__main__':
+
+    from music.http_session import get_text
+    from testdata.ucr_site import FixtureSite
+
+    # Test crawl_article_info(start_url, fetch_page, ...) on the local stand-in site
+    with FixtureSite(n_pages=5) as site:
+        for article_info in crawl_article_info(site.start_url, lambda page: get_text(page_url(site.start_url, page)),
+                                               max_pages=None, concurrency=3):
+            print(article_info)
@@ -0,0 +1,115 @@
+"""The article-detail stage of the crawl: the pages of the articles listed on the search-result pages.
+The title links of the search results (music.extract.extract_article_urls()) are deduplicated, since the same article
+can appear on several result pages (e.g. when newly published articles push the older ones to the next page),
+and the article pages are fetched concurrently with music.crawl_engine.crawl_in_order(), by the same fetcher as
+the search-result pages (so, through the same session, rate limiter and cache, see music.http_session).
+From each article page, its canonical URL, body text and tags are extracted; the articles reachable by several URLs
+are deduplicated by their canonical URLs as well.
+"""
+
+
+#%%
+# Setup / Data
+
+from collections import namedtuple
+from urllib.parse import urljoin
+
+import requests
+
+from music import parsers
+from music.crawl_engine import DEFAULT_CONCURRENCY, crawl_in_order
+from music.memory_guard import release_soup
+from music.urls import canonicalize_url
+
+# The info extracted from an article page: the URL it was fetched from, its canonical URL,
+# its body text (the paragraphs separated by newlines), and the list of its tags
+ArticleDetail = namedtuple('ArticleDetail', ['url', 'canonical_url', 'body', 'tags'])
+
+
+#%%
+def unique_urls(urls, seen=None, pending=None):
+    """Generator that yields those of the urls that have not been seen before (compared by their canonical forms).
+    seen, if specified, is the set of the canonical URLs (music.urls.canonicalize_url()) seen so far, and it is updated.
+    If pending (a set) is specified, the canonical URLs yielded are added to pending instead, and are skipped as well;
+    the caller moves them to seen once they are processed (so, a URL whose processing fails is not marked seen).
+    """
+
+    seen = set() if seen is None else seen
+    marked = seen if pending is None else pending
+    for url in urls:
+        key = canonicalize_url(url)
+        if key not in seen and key not in marked:
+            marked.add(key)
+            yield url
+
+
+#%%
+def extract_article_detail(html, url=''):
+    """Returns the ArticleDetail of the article page at url, given its HTML.
+    The canonical URL comes from the canonical link (or the og:url meta tag; otherwise, it is url itself),
+    the body from the paragraphs of the 'pod-content' div (or of the 'article' tag), and the tags from
+    the rel="tag" links (or the article:tag meta tags).
+    """
+
+    soup = parsers.make_soup(html)
+
+    canonical = soup.find('link', rel='canonical')
+    og_url = soup.find('meta', property='og:url')
+    canonical_url = (canonical.get('href') if canonical else None) or (og_url.get('content') if og_url else None)
+    canonical_url = urljoin(url, canonical_url) if canonical_url else url
+
+    content = soup.find('div', {'class': 'pod-content'}) or soup.find('article')
+    paragraphs = [p.get_text(' ', strip=True) for p in content.find_all('p')] if content else []
+    body = '\n'.join(paragraph for paragraph in paragraphs if paragraph)
+
+    tags = [a.get_text(strip=True) for a in soup.find_all('a', rel='tag')] or \
+           [meta.get('content', '') for meta in soup.find_all('meta', property='article:tag')]
+    tags = list(dict.fromkeys(tag for tag in tags if tag))
+
+    release_soup(soup)
+    return ArticleDetail(url, canonical_url, body, tags)
+
+
+#%%
+def crawl_article_details(urls, fetch_html, concurrency=DEFAULT_CONCURRENCY, seen=None, failed=None):
+    """Generator that yields the ArticleDetail of each article at the urls (e.g. from extract_article_urls()),
+    once per article, in the order of the urls.
+    Parameters:
+    - urls: an iterable of article URLs, possibly with duplicates; it is consumed lazily, so it can be
+      a generator fed by the crawl of the search-result pages
+    - fetch_html: a blocking callable that takes a URL and returns the HTML, e.g. get_html() from music/crawl.py;
+      it must raise on error responses (as get_html() does, with requests.HTTPError)
+    - concurrency: the max number of article pages fetched (and extracted) in parallel
+    - seen: the set of the canonical URLs of the articles already crawled (see unique_urls()); it is updated
+      with the fetched URLs and the canonical URLs, so it can be shared by several crawls
+      (e.g. the persistent music.frontier.SeenSet of a CrawlFrontier, frontier.seen)
+    - failed: a dict, updated with {url: exception} for the articles whose fetch failed with
+      a requests.RequestException (an error response, a timeout,...)
+    The failed articles are skipped, and the crawl goes on; a URL is added to seen only once its article page
+    is fetched and extracted, so the failed ones are fetched again by the next crawl with the same seen.
+    """
+
+    seen = set() if seen is None else seen
+    failed = {} if failed is None else failed
+    pending = set()                         # the canonical URLs scheduled, but not yielded yet
+
+    def fetch_and_extract(url):
+        try:
+            html = fetch_html(url)
+        except requests.RequestException as error:
+            return url, error
+        return url, extract_article_detail(html, url)
+
+    for url, detail in crawl_in_order(fetch_and_extract, unique_urls(urls, seen, pending), concurrency):
+        key = canonicalize_url(url)
+        pending.discard(key)
+        if isinstance(detail, Exception):
+            failed[url] = detail
+            continue
+        seen.add(key)
+        canonical_key = canonicalize_url(detail.canonical_url)
+        if canonical_key != key:
+            if canonical_key in seen:
+                continue
+            seen.add(canonical_key)
+        yield detail
@@ -0,0 +1,151 @@
+"""A persistent store of the articles found by the crawl module, in an SQLite database.
+Unlike the CSV file, which is rewritten as a whole by every run, the store is updated incrementally:
+the articles of each crawled page are upserted (inserted, or updated if their URL is already there) in a single
+transaction, and the dates are also stored parsed (ISO format), so that queries such as
+"the articles by Nick DeRiso published in 2022" are index lookups instead of full scans.
+As in music.http_cache, the database is in WAL mode, so it can be read while a crawl is writing to it.
+SQLite UPSERT: https://www.sqlite.org/lang_upsert.html
+"""
+
+
+#%%
+# Setup / Data
+
+import sqlite3
+import time
+from contextlib import closing
+from datetime import date, datetime
+from pathlib import Path
+
+from settings import *
+
+DEFAULT_STORE_FILE = DATA_DIR / 'articles.sqlite'
+DATE_FORMATS = ('%B %d, %Y', '%b %d, %Y', '%Y-%m-%d', '%m/%d/%Y')
+
+ARTICLE_COLUMNS = ('url', 'title', 'author', 'date', 'image_url')
+
+
+#%%
+def parse_date(text):
+    """Returns the date in text (e.g. 'June 18, 2022', as on the search-result pages) in ISO format ('2022-06-18'),
+    or None if text is empty or not a date in any of DATE_FORMATS.
+    """
+
+    text = ' '.join((text or '').split())
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date().isoformat()
+        except ValueError:
+            pass
+    return None
+
+
+#%%
+class ArticleStore:
+    """The class describing the article store, the SQLite database at path.
+    The articles are keyed by their URLs; the records are (url, title, author, date, image_url) tuples,
+    as extracted by music.extract.extract_article_info(soup, with_url=True) with absolute URLs.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_FILE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.__connect() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS articles ('
+                               'url TEXT PRIMARY KEY, title TEXT, author TEXT, date TEXT, published TEXT, '
+                               'image_url TEXT, first_seen REAL, last_seen REAL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS articles_author ON articles (author, published)')
+            connection.execute('CREATE INDEX IF NOT EXISTS articles_published ON articles (published)')
+
+    def __str__(self):
+        return f'ArticleStore({self.path}, {len(self)} article(s))'
+
+    def __len__(self):
+        with self.__connect() as connection:
+            return connection.execute('SELECT COUNT(*) FROM articles').fetchone()[0]
+
+    def __connect(self):
+        # One short-lived connection per operation, as in music.http_cache
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.execute('PRAGMA busy_timeout=30000')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return closing(connection)
+
+    def upsert_page(self, records):
+        """Inserts the records (of a page), or updates the stored articles with the same URLs, in a single transaction.
+        A missing date (e.g. from a page fetched without JavaScript) does not overwrite a known one.
+        The records without a URL are skipped. Returns the number of records written.
+        """
+
+        now = time.time()
+        rows = [(url, title, author, article_date, parse_date(article_date), image_url, now, now)
+                for url, title, author, article_date, image_url in records if url]
+        with self.__connect() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.executemany(
+                'INSERT INTO articles VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (url) DO UPDATE SET title = excluded.title, author = excluded.author, '
+                "date = CASE WHEN excluded.date != '' THEN excluded.date ELSE date END, "
+                'published = COALESCE(excluded.published, published), '
+                'image_url = excluded.image_url, last_seen = excluded.last_seen', rows)
+            connection.execute('COMMIT')
+        return len(rows)
+
+    def get(self, url):
+        """Returns the (url, title, author, date, image_url) record of the article at url, or None.
+        """
+
+        with self.__connect() as connection:
+            return connection.execute(f'SELECT {", ".join(ARTICLE_COLUMNS)} FROM articles WHERE url = ?',
+                                      (url,)).fetchone()
+
+    def find(self, author=None, year=None, since=None, until=None, limit=None):
+        """Returns the list of the (url, title, author, date, image_url) records of the articles
+        by author (if specified), published in year, or since/until (datetime.date objects or ISO strings, inclusive),
+        newest first; at most limit records, if limit is specified.
+        The articles whose dates are unknown only match if no year, since or until is specified.
+        """
+
+        if year is not None:
+            since, until = date(year, 1, 1), date(year, 12, 31)
+        conditions, parameters = [], []
+        if author is not None:
+            conditions.append('author = ?')
+            parameters.append(author)
+        if since is not None:
+            conditions.append('published >= ?')
+            parameters.append(str(since))
+        if until is not None:
+            conditions.append('published <= ?')
+            parameters.append(str(until))
+        query = f'SELECT {", ".join(ARTICLE_COLUMNS)} FROM articles'
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY published DESC'
+        if limit is not None:
+            query += f' LIMIT {int(limit)}'
+        with self.__connect() as connection:
+            return connection.execute(query, parameters).fetchall()
+
+    def authors(self):
+        """Returns the list of (author, number of articles) pairs, the most prolific authors first.
+        """
+
+        with self.__connect() as connection:
+            return connection.execute('SELECT author, COUNT(*) AS n FROM articles GROUP BY author '
+                                      'ORDER BY n DESC, author').fetchall()
+
+
+#%%
+if __name__ == '__main__':
+
+    import tempfile
+
+    # Test ArticleStore(path): upsert a page, then query it
+    with tempfile.TemporaryDirectory() as store_dir:
+        store = ArticleStore(Path(store_dir) / 'articles.sqlite')
+        store.upsert_page([('https://ultimateclassicrock.com/paul-mccartney-80/', 'Paul McCartney Turns 80',
+                            'Nick DeRiso', 'June 18, 2022', 'https://townsquare.media/paul.jpg')])
+        print(store)
+        print(store.find(author='Nick DeRiso', year=2022))
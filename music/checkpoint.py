@@ -0,0 +1,79 @@
+"""Crawl checkpoints, for resumable and incremental crawls.
+A checkpoint is a small JSON file per start URL (under DATA_DIR / 'checkpoints') that records
+the last page whose articles have been processed and the keys of all the articles seen so far.
+It is saved after each page, atomically (written to a temporary file first, then renamed),
+so an interrupted crawl can resume after the last saved page.
+"""
+
+
+#%%
+# Setup / Data
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from settings import *
+
+DEFAULT_CHECKPOINT_DIR = DATA_DIR / 'checkpoints'
+
+
+#%%
+class CrawlCheckpoint:
+    """The class describing the checkpoint of the crawl that starts from start_url.
+    Fields:
+    - last_page: the last page processed by an unfinished crawl (0 if there is no unfinished crawl)
+    - seen: the set of keys (music.extract.article_key()) of the articles seen in all the crawls so far
+    """
+
+    def __init__(self, start_url, checkpoint_dir=DEFAULT_CHECKPOINT_DIR):
+        self.start_url = start_url
+        name = hashlib.sha1(start_url.encode('utf-8')).hexdigest()[:16]
+        self.path = Path(checkpoint_dir) / f'{name}.json'
+        self.last_page = 0
+        self.seen = set()
+        if self.path.exists():
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+            self.last_page = data['last_page']
+            self.seen = set(data['seen'])
+
+    def __str__(self):
+        return f'CrawlCheckpoint({self.start_url}, last_page={self.last_page}, {len(self.seen)} article(s) seen)'
+
+    def next_page(self):
+        """Returns the page to start (or resume) the crawl from.
+        """
+
+        return self.last_page + 1
+
+    def save(self, page, keys):
+        """Records that page has been processed and that it contained the articles with the keys.
+        """
+
+        self.last_page = page
+        self.seen.update(keys)
+        self.__write()
+
+    def finish(self):
+        """Records that the crawl has ended, so that the next crawl starts from the first page again
+        (the seen articles are kept, for incremental crawls).
+        """
+
+        self.last_page = 0
+        self.__write()
+
+    def clear(self):
+        """Forgets everything, i.e. deletes the checkpoint file.
+        """
+
+        self.last_page = 0
+        self.seen = set()
+        self.path.unlink(missing_ok=True)
+
+    def __write(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {'start_url': self.start_url, 'last_page': self.last_page, 'seen': sorted(self.seen)}
+        tmp_path = self.path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(data), encoding='utf-8')
+        os.replace(tmp_path, self.path)
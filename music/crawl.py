@@ -4,10 +4,26 @@ BeautifulSoup documentation: https://www.crummy.com/software/BeautifulSoup/bs4/d
 
 #%%
 # Setup / Data
+from contextlib import contextmanager
+
 import requests
 from bs4 import BeautifulSoup
 from selenium import webdriver
 
+from music import driver_pool, http_cache, http_session, parsers, rate_limit, urls
+from music.article_crawl import crawl_article_info
+from music.article_detail import crawl_article_details
+from music.article_store import ArticleStore
+from music.checkpoint import CrawlCheckpoint
+from music.crawl_engine import crawl_paginated
+from music.extract import extract_article_info_from_html, extract_article_urls, inspect_page
+from music.fan_out import crawl_musicians
+from music.frontier import CrawlFrontier
+from music.host_scheduler import PolitenessScheduler, crawl_seeds
+from music.hybrid_fetch import fetch_hybrid
+from music.memory_guard import MemoryBudget, release_soup
+from music.near_duplicates import NearDuplicateFilter
+from music.page_archive import PageArchive
 from util import utility
 from settings import *
 
@@ -38,26 +54,62 @@ soup = BeautifulSoup(response_text, 'html.parser')
 #%%
 
 
+def get_html(url: str) -> str:
+    """Returns the HTML text of the page at the corresponding URL, passed as a string.
+    Creates Response object from HTTP GET request, using http_session.get_text(<url string>, allow_redirects=False)
+    on the shared keep-alive session from music.http_session (connections are pooled and reused across pages;
+    if the on-disk response cache is enabled, fresh pages come from the cache and stale ones are revalidated),
+    and then returns the text field of the Response object.
+    Raises requests.HTTPError for an error response (404, 429, 500, 503,...), so that a crawl never takes
+    an error page for the empty page after the end of a list.
+    """
+
+    # Get and return the text of the Response object from HTTP GET request;
+    # assume that no redirection is allowed (allow_redirects=False)
+    return http_session.get_text(url, allow_redirects=False)
+
+#%%
+
+
 def get_soup(url: str) -> BeautifulSoup:
     """Returns BeautifulSoup object from the corresponding URL, passed as a string.
-    Creates Response object from HTTP GET request, using requests.get(<url string>, allow_redirects=False),
-    and then uses the text field of the Response object and the 'html.parser' to create the BeautifulSoup object.
+    Uses get_html(url) to get the text of the Response object from HTTP GET request,
+    and the selected parser backend ('html.parser' by default, see music.parsers) to create the BeautifulSoup object.
     """
 
-    # Create Response object from HTTP GET request; assume that no redirection is allowed (allow_redirects=False)
-    response = requests.get(url, allow_redirects=False)
+    # Create and return the corresponding BeautifulSoup object from the response text; use the selected parser
+    return parsers.make_soup(get_html(url))
+
+#%%
 
-    # Get text from the Response object, using <response>.text
-    response_text = response.text
 
-    # Create and return the corresponding BeautifulSoup object from the response text; use features='html.parser'
-    return BeautifulSoup(response_text, features='html.parser')
+# Test get_soup(url)
+soup = get_soup(start_url)
 
 #%%
+# Select a faster parser backend for the whole crawl module (falls back to 'html.parser' if lxml is not installed);
+# the speed and memory of the backends can be compared with: python -m benchmarks.parsers
+parsers.set_backend('lxml')
+soup = get_soup(start_url)
 
+#%%
+# Configure the shared session used by get_soup(): connection pool size per host, default headers, timeouts
+http_session.configure_session(pool_size=8, headers={'Accept-Language': 'en-US'}, timeout=(5, 20))
+soup = get_soup(start_url)
 
-# Test get_soup(url)
+#%%
+# Enable the on-disk response cache (DATA_DIR / 'http_cache.sqlite') for the crawl fetchers;
+# re-running get_soup() within the TTL needs no network at all, and after the TTL it costs a 304 response
+http_session.set_cache(http_cache.HTTPCache(ttl=24 * 60 * 60))
+soup = get_soup(start_url)
+soup = get_soup(start_url)
+
+#%%
+# Enable the adaptive per-host rate limiter for the crawl fetchers: at most 5 requests/s per host on average,
+# and a concurrency limit that grows while the host responds well and halves on 429/503 or rising latency
+http_session.set_rate_limiter(rate_limit.RateLimiter(rate=5, burst=10))
 soup = get_soup(start_url)
+print(http_session.get_rate_limiter())
 # print(type(soup))
 # print(str(soup))
 
@@ -141,15 +193,57 @@ soup_file.write_text(str(soup), encoding='utf-8', errors='replace')
 #%%
 
 
+def get_html_selenium(url: str) -> str:
+    """Returns the HTML text of the page at the corresponding URL, passed as a string, after JavaScript has run.
+    Makes an HTTP GET request, using a headless driver checked out from the driver pool (music.driver_pool)
+    instead of launching a new webdriver.Chrome() for each URL, and its driver.get(url).
+    Then returns the page_source field of the driver object.
+    If the on-disk response cache is enabled, a fresh rendered copy of the page is used instead;
+    if the rate limiter is enabled, the page loads count against the host's limits like the requests do;
+    if the page archive is enabled, the rendered pages are archived (see music.page_archive).
+    The pages are rendered as in the render profile of the pool (driver_pool.set_render_profile()): by default,
+    without images, style sheets and third-party resources, and just until the 'time' tags are filled.
+    """
+
+    pool_render = driver_pool.get_default_pool().render
+    rate_limiter = http_session.get_rate_limiter()
+    render = pool_render if rate_limiter is None else lambda u: rate_limiter.call(u, lambda: pool_render(u))
+    archive = http_session.get_archive()
+    if archive is not None:
+        render_and_archive = render
+
+        def render(u):
+            html = render_and_archive(u)
+            archive.append(u, html, fetcher='rendered')
+            return html
+    cache = http_session.get_cache()
+    return cache.get_rendered(url, render) if cache else render(url)
+
+#%%
+
+
 def get_soup_selenium(url: str) -> BeautifulSoup:
     """Returns BeautifulSoup object from the corresponding URL, passed as a string.
-    Makes an HTTP GET request, using driver = webdriver.Chrome() from the selenium package and its driver.get(url).
-    Then uses the page_source field of the driver object and the 'html.parser' to create and return the BeautifulSoup o.
+    Uses get_html_selenium(url) to get the page_source field of a (pooled) selenium driver after driver.get(url),
+    and the selected parser backend ('html.parser' by default, see music.parsers) to create and return the BeautifulSoup o.
     """
 
-    driver = webdriver.Chrome()
-    driver.get(url)
-    return BeautifulSoup(driver.page_source, 'html.parser')
+    return parsers.make_soup(get_html_selenium(url))
+
+#%%
+
+
+def get_html_archived(url: str) -> str:
+    """Returns the HTML text of the latest version of the page at url from the page archive set with
+    http_session.set_archive() (see music.page_archive), without any network access;
+    an empty string if the page has not been archived. Raises RuntimeError if no page archive is set.
+    """
+
+    archive = http_session.get_archive()
+    if archive is None:
+        raise RuntimeError('no page archive set (see http_session.set_archive())')
+    archived_page = archive.get(url)
+    return archived_page.html if archived_page else ''
 
 #%%
 
@@ -162,6 +256,21 @@ print(soup.find('article').find('div', {'class': 'content'}).find('a').text)
 # print(type(soup))
 # print(str(soup))
 
+#%%
+# Test get_html_selenium(url) with the render profiles of music.driver_pool: the full page load as the browser does it,
+# the default fast profile, and the fast profile that returns just the article list and the pagination links
+import time
+for profile in (driver_pool.FULL_PROFILE, driver_pool.FAST_PROFILE, driver_pool.FRAGMENT_PROFILE):
+    driver_pool.set_render_profile(profile)
+    driver_pool.configure_default_pool(size=1)
+    get_html_selenium(get_specific_page(start_url, 5))                     # launch the browser (not timed)
+    start = time.perf_counter()
+    html = get_html_selenium(get_specific_page(start_url, 6))
+    elapsed = time.perf_counter() - start
+    print(f'{elapsed:.2f}s, {len(html)} characters, {len(extract_article_info_from_html(html))} articles')
+driver_pool.set_render_profile(driver_pool.FAST_PROFILE)
+driver_pool.close_default_pool()
+
 #%%
 # Demonstrate occasional anomalies in the ResultSet returned by <BeautifulSoup object>.find_all(<tag>);
 # note that they may be appearing only in the selenium version, not in the requests version
@@ -240,11 +349,11 @@ print(sibling)
 
 def get_specific_page(start_url: str, page=1):
     """Returns a specific page from a Website where long lists of items are split in multiple pages.
+    The page number is set in the query of start_url (parsed with music.urls.page_url(), not split as a string),
+    so start_url can be the URL of any page of the list.
     """
 
-    if page > 1:
-        return start_url.split('&searchpage=')[0] + '&searchpage=' + str(page)
-    return start_url.split('&searchpage=')[0]
+    return urls.page_url(start_url, page)
 
 
 #%%
@@ -296,18 +405,102 @@ def get_next_soup_selenium(start_url: str, page=1):
 next_soup = get_next_soup_selenium(start_url, 2)
 print(next_soup)
 
+#%%
+
+
+def get_next_html(start_url: str, page=1, mode='requests', report=None):
+    """Returns the HTML text of a specific page in case there are multiple pages that list objects of interest.
+    Parameters:
+    - start_url: the starting page/url of a multi-page list of objects
+    - page: the page number of a specific page of a multi-page list of objects
+    - mode: 'requests' (get_html()), 'selenium' (get_html_selenium()), 'hybrid' (see get_next_soup_hybrid()),
+      or 'archive' (get_html_archived(), the pages archived by an earlier crawl)
+    - report: in the 'hybrid' mode, a callable that receives the FetchDecision made for the page
+    """
+
+    url = get_specific_page(start_url, page)
+    if mode == 'hybrid':
+        return fetch_hybrid(url, get_html, get_html_selenium, report)
+    if mode == 'archive':
+        return get_html_archived(url)
+    return get_html_selenium(url) if mode == 'selenium' else get_html(url)
+
+#%%
+
+
+def get_next_soup_hybrid(start_url: str, page=1, report=None):
+    """Returns the BeautifulSoup object corresponding to a specific page
+    in case there are multiple pages that list objects of interest, using requests first and selenium only if needed.
+    Parameters:
+    - start_url: the starting page/url of a multi-page list of objects
+    - page: the page number of a specific page of a multi-page list of objects
+    - report: a callable that receives the FetchDecision made for the page (see music.hybrid_fetch)
+    The page is fetched with get_html(); only if the resulting page misses some of the fields needed by
+    get_article_info_list() (e.g. the JavaScript-filled 'time' tags), it is fetched again with get_html_selenium().
+    """
+
+    return parsers.make_soup(get_next_html(start_url, page, 'hybrid', report))
+
 
 #%%
-def crawl(url: str, max_pages=1):
+# Test get_next_soup_hybrid(start_url: str, page=1, report=None)
+next_soup = get_next_soup_hybrid(start_url, 2, report=print)
+print(next_soup)
+
+
+#%%
+@contextmanager
+def _driver_pool_for(mode, concurrency):
+    # in the 'selenium' and 'hybrid' modes, one pooled headless driver per page fetched in parallel;
+    # all of them are quit when the crawl ends
+    if mode in ('selenium', 'hybrid'):
+        driver_pool.configure_default_pool(size=concurrency)
+    try:
+        yield
+    finally:
+        if mode in ('selenium', 'hybrid'):
+            driver_pool.close_default_pool()
+
+
+#%%
+def crawl_html(url: str, max_pages=1, concurrency=1, mode='selenium', report=print, first_page=1, prefetch=None,
+               budget=None):
+    """Web crawler implemented as a Python generator that yields the HTML texts of the pages of a multi-page list
+    (get_next_html()), in page order, from first_page to max_pages. The other parameters are the same as in crawl().
+    """
+
+    get_page = lambda page: get_next_html(url, page, mode, report)
+    with _driver_pool_for(mode, concurrency):
+        yield from crawl_paginated(get_page, inspect_page, first_page, max_pages, concurrency, prefetch, budget)
+
+
+#%%
+def crawl(url: str, max_pages=1, concurrency=1, mode='selenium', report=print, prefetch=None, budget=None,
+          release=False):
     """Web crawler that collects info about specific articles from Ultimate Classic Rock,
     implemented as a Python generator that yields BeautifulSoup objects (get_next_soup() or get_next_soup_selenium())
     from multi-page movie lists.
-    Parameters: the url of the starting page and the max number of pages to crawl in case of multi-page lists.
+    Parameters: the url of the starting page and the max number of pages to crawl in case of multi-page lists
+    (None: all of them), the max number of pages to fetch in parallel (concurrency), and the fetch mode:
+    'selenium' (get_next_soup_selenium()), 'requests' (get_next_soup(), on the shared keep-alive session),
+    or 'hybrid' (get_next_soup_hybrid(), which renders with selenium only the pages whose static HTML misses fields;
+    the decision made for each page is passed to report()), or 'archive' (the pages archived by earlier crawls).
+    With concurrency > 1, the pages are fetched by the thread-pool engine from music.crawl_engine,
+    but the soups are still yielded in page order. In the 'selenium' mode, the pages are rendered
+    on a pool of concurrency headless drivers (music.driver_pool), which is shut down when the crawl ends.
+    The crawl stops after the last page of the list, detected from the pagination links or from a page without
+    articles, even if max_pages is greater (see music.crawl_engine.crawl_paginated()); while a page is processed,
+    the next prefetch pages (by default, concurrency pages) are already being fetched.
+    Memory: with budget (a music.memory_guard.MemoryBudget), fewer pages are prefetched if they do not fit
+    in the memory budget; with release=True, each soup is decomposed as soon as the next one is requested,
+    so a long crawl does not accumulate soups waiting for the garbage collector (do not keep the soups then).
     """
 
-    for page in range(max_pages):
-        yield get_next_soup_selenium(url, page + 1)
-        page += 1
+    for html in crawl_html(url, max_pages, concurrency, mode, report, prefetch=prefetch, budget=budget):
+        soup = parsers.make_soup(html)
+        yield soup
+        if release:
+            release_soup(soup)
 
 #%%
 # Test crawl(url: str, max_pages=1)
@@ -322,34 +515,71 @@ while True:
         break
 
 #%%
+# Test crawl(url: str, max_pages=None, ...): crawl all the pages, stopping after the last one,
+# with the next 4 pages always being prefetched while the current one is processed
+pages_crawled = sum(1 for s in crawl(start_url, None, concurrency=4, mode='requests', prefetch=4))
+print(pages_crawled)
+
+#%%
 
 
-def get_article_info_list(start_url: str, max_pages=1):
+def get_article_info_list(start_url: str, max_pages=1, concurrency=1, mode='hybrid', extract_cache=None, workers=0,
+                          store=None, dedupe=None):
     """
     Returns structured information about articles related to Paul McCartney from a multi-page article list.
     :param start_url: the url of the starting page of a multi-page article list
-    :param max_pages: the max number of pages to crawl
+    :param max_pages: the max number of pages to crawl (None: all of them, see crawl())
+    :param concurrency: the max number of pages to fetch in parallel (see crawl())
+    :param mode: the fetch mode, 'selenium', 'requests' or 'hybrid' (see crawl()), or 'archive'
+        (re-run the extraction on the pages archived by earlier crawls, see get_next_html());
+        the dates and authors are also read from the data embedded in the static HTML (JSON-LD, inline script
+        payloads, data-* attributes; see music.structured_data), so in the default 'hybrid' mode, a page costs
+        a single HTTP GET, and the browser is only launched for the pages that ship no such data
+    :param extract_cache: a music.extract_cache.ExtractCache; the pages whose content has been seen before
+        are neither parsed nor extracted again, their tuples come from the cache
+    :param workers: if > 0, the pages are parsed and extracted in a pool of workers processes
+        (music.crawl_engine.map_in_processes()), decoupled from the concurrent fetching; only the tuples come back
+    :param store: a music.article_store.ArticleStore; the articles of each page are upserted into it, keyed by
+        their URLs, as soon as the page is extracted
+    :param dedupe: a music.near_duplicates.NearDuplicateFilter; the near duplicates of the articles seen before
+        (e.g. with slightly different titles or image URLs) are dropped before they are stored or returned,
+        and, if the filter merges, their fields fill the empty ones of the articles seen before (in the store too)
     :return: a list of tuples of info-items about the articles from a multi-page article list
     Creates and uses the following data:
     -
     """
 
-    article_info_list = []
-    next_soup = crawl(start_url, max_pages)
-    while True:
-        try:
-            s = next(next_soup)
-            for article in s.find_all('article')[:-1]:
-                div_image = article.findNext('div', {'class': 'article-image-wrapper'})
-                div_content = article.findNext('div', {'class': 'content'})
-                featured_image_url = div_image.findNext('a').attrs['data-image']
-                article_title = div_content.find('a').text
-                article_date = div_content.find_next('time').text
-                article_author = div_content.find_next('em').text.lstrip(' by  ')
-                article_info_list.append((article_title, article_author, article_date, featured_image_url))
-        except StopIteration:
-            break
-    return article_info_list
+    return list(iter_article_info(start_url, max_pages, concurrency, mode, extract_cache, workers=workers, store=store,
+                                  dedupe=dedupe))
+
+#%%
+
+
+def iter_article_info(start_url: str, max_pages=1, concurrency=1, mode='hybrid', extract_cache=None,
+                      checkpoint=None, incremental=False, workers=0, store=None, budget=None, dedupe=None):
+    """
+    Streaming version of get_article_info_list(), implemented as a Python generator
+    that yields the tuple of info-items of each article as soon as its page is fetched and parsed.
+    The parameters are the same as in get_article_info_list(), plus:
+    :param checkpoint: a music.checkpoint.CrawlCheckpoint, saved after each page; an interrupted crawl
+        resumes from the page after the last saved one (the records of the pages before it are not yielded again)
+    :param incremental: if True (requires checkpoint), only the articles not seen in the previous crawls are yielded,
+        and the crawl stops at the first page that contains no new articles; search results are newest-first,
+        so a daily update typically touches just a page or two
+    :param store: as in get_article_info_list(); the store is written page by page, while crawling
+    :param dedupe: as in get_article_info_list(); the records are filtered page by page, in a single pass
+        (each record is looked up in the filter's index, not compared with all the records seen before)
+    :param budget: a music.memory_guard.MemoryBudget that bounds the memory of the pages fetched ahead (see crawl());
+        the soups are always decomposed right after the extraction, so the memory stays flat however many pages
+    Only the records of the current page are kept in memory, so the time to the first record and the memory
+    do not grow with max_pages; use it with music.sinks.CSVSink to write the records while crawling.
+    The pipeline itself is music.article_crawl.crawl_article_info(); the pages are fetched with get_next_html().
+    """
+
+    fetch_page = lambda page: get_next_html(start_url, page, mode, print)
+    with _driver_pool_for(mode, concurrency):
+        yield from crawl_article_info(start_url, fetch_page, max_pages, concurrency, extract_cache, checkpoint,
+                                      incremental, workers, store, budget, dedupe, backend=parsers.get_backend())
 
 #%%
 
@@ -359,6 +589,43 @@ article_info_list = get_article_info_list(start_url, 3)
 for article_info in article_info_list:
     print(article_info)
 
+#%%
+# Test get_articles_info(start_url: str, max_pages=1, concurrency=1) with pages fetched in parallel
+article_info_list = get_article_info_list(start_url, 3, concurrency=3)
+for article_info in article_info_list:
+    print(article_info)
+
+#%%
+# Test get_articles_info(start_url: str, max_pages=1, concurrency=1, mode='hybrid');
+# the selenium browser is launched only for the pages whose static HTML misses some fields
+article_info_list = get_article_info_list(start_url, 3, concurrency=3, mode='hybrid')
+for article_info in article_info_list:
+    print(article_info)
+
+#%%
+# Test get_articles_info(start_url: str, max_pages=1, concurrency=1, mode='requests'): no browser at all;
+# the dates come from the data embedded in the static HTML (the articles whose dates are not embedded get '')
+from music.structured_data import find_embedded_articles
+print(len(find_embedded_articles(get_html(start_url))), 'article keys embedded in the first page')
+article_info_list = get_article_info_list(start_url, 3, concurrency=3, mode='requests')
+print(sum(1 for article_info in article_info_list if article_info[2]), 'of', len(article_info_list), 'dates found')
+
+#%%
+# Test get_articles_info(start_url: str, max_pages=1, ..., extract_cache=None);
+# in the second run, the pages that have not changed are neither parsed nor extracted
+from music.extract_cache import ExtractCache
+extract_cache = ExtractCache()
+article_info_list = get_article_info_list(start_url, 3, concurrency=3, extract_cache=extract_cache)
+article_info_list = get_article_info_list(start_url, 3, concurrency=3, extract_cache=extract_cache)
+print(extract_cache)
+
+#%%
+# Test get_articles_info(start_url: str, max_pages=1, ..., workers=0) with a pool of 4 processes doing the parsing;
+# note: on platforms that start worker processes by spawning (Windows, macOS), run this from a script that guards
+# the call with if __name__ == '__main__': (or from an interactive console), not by running this whole file
+article_info_list = get_article_info_list(start_url, 10, concurrency=5, mode='requests', workers=4)
+print(len(article_info_list))
+
 #%%
 # Put everything in a csv file
 import csv
@@ -370,6 +637,191 @@ with open(csv_file, 'w', newline='', encoding='utf-8') as f:    # newline: avoid
     out.writerow(header_row)
     out.writerows(article_info_list)
 
+#%%
+# Stream the records to the csv file while crawling: each batch of (at most) 20 records is appended to the file
+# as soon as it is complete, so the first records are in the file long before the crawl ends
+from music.sinks import CSVSink
+with CSVSink(csv_file, batch_size=20, append=False) as sink:
+    for article_info in iter_article_info(start_url, 3, concurrency=3):
+        sink.write(article_info)
+print(sink)
+
+#%%
+# Crawl with a checkpoint: if the crawl is interrupted (e.g. by Ctrl+C), running the cell again resumes the crawl
+# after the last page processed; afterwards, an incremental crawl only yields the articles not seen before
+checkpoint = CrawlCheckpoint(start_url)
+with CSVSink(csv_file, batch_size=20) as sink:
+    sink.write_many(iter_article_info(start_url, 10, concurrency=3, checkpoint=checkpoint))
+print(checkpoint)
+new_article_info_list = list(iter_article_info(start_url, 10, checkpoint=checkpoint, incremental=True))
+print(len(new_article_info_list))
+
+#%%
+
+
+def iter_article_urls(start_url: str, max_pages=1, concurrency=1, mode='requests'):
+    """Generator that yields the absolute URLs of the articles (their title links) from a multi-page article list,
+    page by page; an article that appears on several pages is yielded from each of them.
+    The parameters are the same as in crawl().
+    """
+
+    page = 1
+    for html in crawl_html(start_url, max_pages, concurrency, mode):
+        soup = parsers.make_soup(html)
+        yield from extract_article_urls(soup, get_specific_page(start_url, page))
+        release_soup(soup)
+        page += 1
+
+#%%
+
+
+def iter_article_details(start_url: str, max_pages=1, concurrency=1, mode='requests', seen=None, failed=None):
+    """
+    Generator that follows the title links of the articles from a multi-page article list and yields
+    the music.article_detail.ArticleDetail (url, canonical URL, body text, tags) of each article, once per article.
+    :param start_url, max_pages, concurrency, mode: as in crawl(); they apply to the crawl of the article list
+    :param seen: a set of the (canonical) URLs of the articles to skip, e.g. crawled before; it is updated
+        (e.g. frontier.seen of a music.frontier.CrawlFrontier, to skip the articles crawled in previous runs)
+    :param failed: a dict, updated with {url: exception} for the article pages that could not be fetched
+        (e.g. an error response); they are skipped, and they are not added to seen, so the next run retries them
+    The article pages are fetched with get_html(), concurrency at a time, while the article list is still
+    being crawled; so, they share the keep-alive session, the rate limiter and the cache with the list pages.
+    The URLs that appear on several pages of the list (and the URLs with the same canonical URL) are fetched once.
+    """
+
+    article_urls = iter_article_urls(start_url, max_pages, concurrency, mode)
+    yield from crawl_article_details(article_urls, get_html, concurrency, seen, failed)
+
+#%%
+# Test iter_article_details(start_url: str, max_pages=1, concurrency=1, mode='requests', seen=None)
+for article_detail in iter_article_details(start_url, 2, concurrency=4):
+    print(article_detail.canonical_url, article_detail.tags)
+    print(article_detail.body[:200])
+    print()
+
+#%%
+# Crawl all the pages in bounded memory: at most 64 MB of pages (as soups) fetched ahead of the extraction,
+# and no prefetching while the process takes more than 512 MB; the soups are decomposed right after the extraction
+budget = MemoryBudget(max_bytes=64 * 1024 * 1024, max_rss=512 * 1024 * 1024)
+with CSVSink(csv_file, batch_size=100, append=False) as sink:
+    sink.write_many(iter_article_info(start_url, None, concurrency=8, mode='requests', budget=budget))
+print(sink, budget)
+
+#%%
+# Upsert the articles into the SQLite article store (music.article_store) page by page, while crawling;
+# then, queries by author and date are index lookups, and a later crawl only updates the articles it finds again
+article_store = ArticleStore()
+article_info_list = get_article_info_list(start_url, 3, concurrency=3, store=article_store)
+print(article_store)
+for article in article_store.find(author='Nick DeRiso', year=2022):
+    print(article)
+
+#%%
+# Drop the near duplicates (music.near_duplicates) before they reach the store: the same article listed again
+# on the next page, under a tracking URL or with a slightly different title, is stored once
+near_duplicate_filter = NearDuplicateFilter()
+article_info_list = get_article_info_list(start_url, 5, concurrency=3, store=article_store,
+                                          dedupe=near_duplicate_filter)
+print(len(article_info_list), near_duplicate_filter, article_store)
+
+#%%
+# Archive every fetched page (music.page_archive), then re-run get_article_info_list() entirely from the archive,
+# e.g. after a change of the extraction logic; the archive keeps all the versions of every page
+http_session.set_archive(PageArchive())
+article_info_list = get_article_info_list(start_url, 3, concurrency=3, mode='requests')
+article_info_list_archived = get_article_info_list(start_url, None, mode='archive')
+print(article_info_list == article_info_list_archived, http_session.get_archive())
+
+#%%
+# Queue the article URLs in a disk-backed crawl frontier (music.frontier): each URL is queued once, in any run,
+# and the URLs taken from the frontier but not marked as done are handed out again after a restart
+with CrawlFrontier() as frontier:
+    print(len(frontier.add_many(iter_article_urls(start_url, 3, concurrency=3))))
+    article_url = frontier.pop()
+    while article_url is not None:
+        article_html = get_html(article_url)
+        frontier.done(article_url)
+        article_url = frontier.pop()
+    print(frontier)
+
+#%%
+
+
+def crawl_sites(start_urls, max_pages=1, per_host=2, crawl_delay=1.0, mode='requests', host_settings=None):
+    """Web crawler for many multi-page lists at once, possibly on different sites (e.g. the candidates
+    in the leftovers below, or the searches for several queries), implemented as a Python generator
+    that yields (start_url, page, HTML text of the page) in the order in which the pages are fetched.
+    Parameters:
+    - start_urls: the URLs of the starting pages of the lists
+    - max_pages: the max number of pages to crawl per list (None: all of them, up to the last page of each list)
+    - per_host, crawl_delay, host_settings: the politeness limits of every site (see music.host_scheduler):
+      at most per_host pages of a site in flight, and crawl_delay seconds between the requests to a site
+    - mode: the fetch mode, as in get_next_html()
+    The sites are served round-robin, so the crawl gets faster with every site added,
+    while each site is crawled no faster than it would be on its own.
+    """
+
+    scheduler = PolitenessScheduler(per_host, crawl_delay, host_settings=host_settings)
+    if mode in ('selenium', 'hybrid'):
+        driver_pool.configure_default_pool(size=scheduler.workers)
+    try:
+        yield from crawl_seeds(lambda url, page: get_next_html(url, page, mode), start_urls, get_specific_page,
+                               inspect_page, max_pages, scheduler)
+    finally:
+        if mode in ('selenium', 'hybrid'):
+            driver_pool.close_default_pool()
+
+#%%
+# Test crawl_sites(start_urls, max_pages=1, ...): several searches, at most 2 requests in flight to the site, 1s apart
+# (the searches of other sites with the same markup would be crawled in parallel with them, within their own limits)
+search_urls = [f'https://ultimateclassicrock.com/search/?s={query}'
+               for query in ('paul%20mccartney', 'albums', 'wings')]
+for search_url, page, html in crawl_sites(search_urls, 2):
+    print(page, search_url, len(html))
+
+#%%
+
+
+def get_musician_article_list(musicians, max_pages=1, per_host=2, crawl_delay=1.0, mode='requests', stats=None):
+    """
+    Returns structured information about the articles related to all the musicians (Musician objects),
+    from the searches for their names, crawled concurrently (see music.fan_out).
+    :param musicians: the musicians, e.g. those from testdata/musicians.py
+    :param max_pages: the max number of pages to crawl per search (None: all of them)
+    :param per_host, crawl_delay: the politeness limits of the site (see crawl_sites())
+    :param mode: the fetch mode of the search-result pages, 'requests', 'selenium' or 'hybrid' (see crawl())
+    :param stats: a dict, updated with the numbers of pages, records, unique articles and duplicates
+    :return: the list of the music.fan_out.MatchedArticle (url, title, author, date, image_url, queries)
+        of the articles, once per article, each with the set of the queries whose results list it
+    """
+
+    fetch_html = {'selenium': get_html_selenium,
+                  'hybrid': lambda url: fetch_hybrid(url, get_html, get_html_selenium)}.get(mode, get_html)
+    scheduler = PolitenessScheduler(per_host, crawl_delay)
+    if mode in ('selenium', 'hybrid'):
+        driver_pool.configure_default_pool(size=per_host)
+    try:
+        return crawl_musicians(musicians, fetch_html, max_pages, scheduler=scheduler, backend=parsers.get_backend(),
+                               stats=stats)
+    finally:
+        if mode in ('selenium', 'hybrid'):
+            driver_pool.close_default_pool()
+
+#%%
+# Test get_musician_article_list(musicians, max_pages=1, ...) for all the musicians from the test data;
+# then, fetch the pages of the articles once per article, however many searches found them
+from music.musician_module import Musician
+from testdata import musicians as musicians_data
+all_musicians = [value for value in vars(musicians_data).values() if isinstance(value, Musician)]
+fan_out_stats = {}
+musician_article_list = get_musician_article_list(all_musicians, 2, stats=fan_out_stats)
+print(fan_out_stats)
+for matched_article in musician_article_list:
+    if len(matched_article.queries) > 1:
+        print(matched_article.title, sorted(matched_article.queries))
+article_details = list(crawl_article_details((article.url for article in musician_article_list), get_html, 4))
+print(len(article_details))
+
 #%%
 # Leftovers
 
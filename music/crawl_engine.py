@@ -0,0 +1,169 @@
+"""Concurrent, thread-based page fetching for the crawl module.
+The fetchers in music/crawl.py (get_next_soup(), get_next_soup_selenium(),...) are blocking calls,
+so each page fetch runs in a worker thread of a ThreadPoolExecutor, and the size of the thread pool bounds
+the number of pages in flight. The results are always yielded in page order; the engine works the same
+in plain scripts and where an event loop is already running (Jupyter, asyncio.run()).
+crawl_paginated() also discovers where a multi-page list ends, and prefetches pages ahead of the consumer.
+CPU-bound work on the fetched pages (parsing, extraction) can be moved to worker processes
+with map_in_processes(), so that it neither holds the GIL nor stalls the fetching.
+"""
+
+
+#%%
+# Setup / Data
+
+import itertools
+import math
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+DEFAULT_CONCURRENCY = 8
+
+
+#%%
+def _crawl_ordered(fetch_page, pages, concurrency, window, last_page=None, admit=None):
+    """Generator that yields (page, fetch_page(page)) for the pages (page numbers, or any other items), in order.
+    Each fetch is submitted to a pool of concurrency worker threads as soon as it is scheduled,
+    and window pages ahead of the consumer are scheduled, so they are fetched while the consumer processes
+    the current page. If last_page is specified, pages greater than last_page() are neither scheduled nor yielded
+    (their fetches are cancelled). If admit is specified, a page is scheduled ahead of the consumer only if
+    admit(n) returns True, where n is the number of pages in flight with it (including the page being consumed);
+    the page the consumer waits for is always scheduled.
+    """
+
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='crawl')
+    pending = deque()
+    beyond_last = (lambda page: False) if last_page is None else (lambda page: page > last_page())
+
+    def schedule():
+        while len(pending) < max(1, window):
+            if pending and admit is not None and not admit(len(pending) + 2):
+                return
+            page = next(pages, None)
+            if page is None or beyond_last(page):
+                return
+            pending.append((page, executor.submit(fetch_page, page)))
+
+    try:
+        schedule()
+        while pending:
+            page, future = pending.popleft()
+            if beyond_last(page):
+                future.cancel()
+                continue
+            result = future.result()
+            schedule()
+            yield page, result
+    finally:
+        for _, future in pending:
+            future.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+#%%
+def crawl_in_order(fetch_page, pages, concurrency=DEFAULT_CONCURRENCY, budget=None):
+    """Generator that yields fetch_page(page) for all pages (page numbers, URLs,...), in the order of pages,
+    while up to concurrency pages are being fetched in parallel.
+    Only a window of concurrency pages ahead of the consumer is scheduled at any time,
+    so crawling many pages does not keep all the results in memory.
+    If a fetch raises an exception, it is raised when the consumer reaches the corresponding page.
+    If budget (a music.memory_guard.MemoryBudget) is specified, fetch_page() must return the HTML texts of the pages,
+    and fewer pages are scheduled ahead if they do not fit in the memory budget.
+    """
+
+    fetch, admit = _with_budget(fetch_page, budget)
+    for _, result in _crawl_ordered(fetch, iter(pages), concurrency, concurrency, admit=admit):
+        yield result
+
+
+#%%
+def _with_budget(fetch_page, budget):
+    # returns fetch_page wrapped so that the budget sees the sizes of the pages, and the budget's admit()
+    if budget is None:
+        return fetch_page, None
+
+    def fetch_and_record(page):
+        result = fetch_page(page)
+        budget.record(result)
+        return result
+
+    return fetch_and_record, budget.admit
+
+
+#%%
+def crawl_paginated(fetch_page, inspect, first_page=1, max_pages=None, concurrency=DEFAULT_CONCURRENCY,
+                    prefetch=None, budget=None):
+    """Generator that yields fetch_page(page) for the pages of a multi-page list, in page order,
+    from first_page until the last page of the list (or max_pages, if specified and smaller).
+    Parameters:
+    - fetch_page: a blocking callable that takes a page number, e.g. lambda page: get_next_html(start_url, page)
+    - inspect: a callable that takes the result of fetch_page() and returns a tuple (has_items, last_page):
+      whether the page lists any items, and the number of the last page if the page tells it (otherwise None)
+    - concurrency: the max number of pages fetched in parallel
+    - prefetch: the number of pages fetched speculatively ahead of the consumer (by default, concurrency)
+    The crawl stops at the first page without items, and no page after the last page announced by a page
+    (e.g. in its pagination links) is requested; so, max_pages need not be guessed at all.
+    fetch_page must raise on error responses (e.g. with music.http_session.get_text()), rather than return
+    the error page: an exception is raised when its page would be yielded, an error page would end the crawl.
+    inspect() runs in the fetching thread, right after the fetch.
+    - budget: as in crawl_in_order(); it bounds the memory of the prefetched pages
+    """
+
+    bound = [math.inf if max_pages is None else max_pages]
+    pages = itertools.count(first_page)
+    fetch, admit = _with_budget(fetch_page, budget)
+
+    def fetch_and_inspect(page):
+        result = fetch(page)
+        return result, inspect(result)
+
+    prefetch = prefetch or concurrency
+    for page, (result, (has_items, last_page)) in _crawl_ordered(fetch_and_inspect, pages, concurrency, prefetch,
+                                                                 lambda: bound[0], admit):
+        if not has_items:
+            return
+        if last_page:
+            bound[0] = min(bound[0], last_page)
+        yield result
+
+
+#%%
+def map_in_processes(func, items, workers=None, lookahead=None):
+    """Generator that yields func(item) for all items (e.g. the HTML texts yielded by crawl_in_order()), in order,
+    computing them in a ProcessPoolExecutor with workers processes (by default, one per CPU core).
+    Each item is submitted as soon as it arrives, and at most lookahead items (by default, 2 * workers)
+    are being processed ahead of the consumer; so, the items keep being fetched while the earlier ones are parsed.
+    func must be picklable (e.g. a module-level function or a functools.partial of it), and so must the items
+    and the results: only they travel between the processes.
+    """
+
+    workers = workers or os.cpu_count() or 1
+    lookahead = lookahead or 2 * workers
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        try:
+            for item in items:
+                pending.append(executor.submit(func, item))
+                if len(pending) >= lookahead:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+#%%
+if __name__ == '__main__':
+
+    import time
+
+    def slow_page(page):
+        time.sleep(0.2)
+        return page
+
+    # Test crawl_in_order(fetch_page, pages, concurrency)
+    start = time.perf_counter()
+    print(list(crawl_in_order(slow_page, range(1, 11), concurrency=5)))
+    print(f'{time.perf_counter() - start:.2f}s')
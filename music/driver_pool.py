@@ -0,0 +1,366 @@
+"""A bounded pool of long-lived, headless Selenium WebDriver objects for the crawl module.
+Launching a browser is by far the most expensive part of get_soup_selenium(), so the drivers are
+created once, checked out per page, health-checked on checkout, recycled after max_pages pages,
+and quit when the pool is closed. Several pages can render concurrently, one per driver.
+How a page is rendered is described by a RenderProfile: by default, the browser does not load images, style sheets,
+fonts and third-party resources (ads, trackers), driver.get() returns as soon as the DOM is ready (the 'eager'
+page-load strategy) instead of after the full load, and then the driver waits just until the 'time' tags
+of the articles have been filled in by JavaScript. Optionally, only the HTML of the article list is returned,
+instead of the serialization of the whole page.
+Selenium documentation: https://www.selenium.dev/documentation/webdriver/
+Page-load strategies: https://www.selenium.dev/documentation/webdriver/drivers/options/#pageloadstrategy
+"""
+
+
+#%%
+# Setup / Data
+
+import atexit
+import queue
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_MAX_PAGES = 50                  # pages rendered by a driver before it is recycled
+
+# The URL patterns (as in Chrome DevTools' Network.setBlockedURLs) of the resources a profile can block
+STYLE_PATTERNS = ('*.css', '*.css?*', '*.woff', '*.woff2', '*.ttf', '*.otf', '*fonts.googleapis.com*',
+                  '*fonts.gstatic.com*')
+THIRD_PARTY_PATTERNS = ('*doubleclick.net*', '*googlesyndication.com*', '*googletagmanager.com*',
+                        '*google-analytics.com*', '*googletagservices.com*', '*amazon-adsystem.com*',
+                        '*adsrvr.org*', '*scorecardresearch.com*', '*facebook.net*', '*connect.facebook.com*',
+                        '*twitter.com/widgets*', '*quantserve.com*', '*taboola.com*', '*outbrain.com*',
+                        '*chartbeat.com*', '*chartbeat.net*')
+
+# The JavaScript conditions of render(): all the elements that match arguments[0] have some text (True if there are
+# none, e.g. on a page after the last one); and the outer HTML of the elements that match arguments[0],
+# followed by the last 'article' tag of the page if it is outside them: the extraction drops the last 'article' tag
+# as a non-result (see music.extract.get_articles()), so the fragment must end with the same one as the page
+_FILLED_SCRIPT = ('return Array.from(document.querySelectorAll(arguments[0]))'
+                  '.every(element => element.textContent.trim() !== "");')
+_FRAGMENT_SCRIPT = ('const elements = Array.from(document.querySelectorAll(arguments[0]));'
+                    'const articles = document.getElementsByTagName("article");'
+                    'const last = articles[articles.length - 1];'
+                    'if (elements.length && last && !elements.some(element => element.contains(last))) '
+                    'elements.push(last);'
+                    'return elements.map(element => element.outerHTML).join("\\n");')
+
+# How the pages are rendered:
+# - headless: run the browser without a window
+# - block_images, block_styles, block_third_party: do not load images; style sheets and web fonts;
+#   ads, trackers and social widgets (the resources matching THIRD_PARTY_PATTERNS)
+# - page_load_strategy: 'normal' (driver.get() waits for the full load), 'eager' (the DOM is ready) or 'none'
+# - wait_for: a CSS selector; after driver.get(), wait until all its elements have some text (None: do not wait)
+# - wait_timeout: the max seconds to wait for wait_for; the page is returned as it is after that
+# - fragment: a CSS selector; return the outer HTML of its elements (and of the last 'article' tag, in a minimal page)
+#   instead of the whole page
+#   (None: the whole page_source)
+RenderProfile = namedtuple('RenderProfile', ['headless', 'block_images', 'block_styles', 'block_third_party',
+                                             'page_load_strategy', 'wait_for', 'wait_timeout', 'fragment'])
+
+FAST_PROFILE = RenderProfile(headless=True, block_images=True, block_styles=True, block_third_party=True,
+                             page_load_strategy='eager', wait_for='article time', wait_timeout=10.0, fragment=None)
+# Just the search-result list and the pagination links, which is all that the extraction needs
+FRAGMENT_PROFILE = FAST_PROFILE._replace(fragment='div.rowline, nav.pagination')
+# The full page load, as the browser would do it
+FULL_PROFILE = RenderProfile(headless=True, block_images=False, block_styles=False, block_third_party=False,
+                             page_load_strategy='normal', wait_for=None, wait_timeout=0.0, fragment=None)
+
+_render_profile = FAST_PROFILE
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+#%%
+def set_render_profile(profile: RenderProfile):
+    """Sets the render profile of the pools created afterwards without an explicit profile
+    (e.g. the module-wide pool, see get_default_pool() and configure_default_pool()).
+    """
+
+    global _render_profile
+    _render_profile = profile
+
+
+def get_render_profile() -> RenderProfile:
+    return _render_profile
+
+
+#%%
+def blocked_url_patterns(profile: RenderProfile):
+    """Returns the list of the URL patterns of the resources that profile blocks (images are blocked separately,
+    by a browser preference, since they can be loaded from anywhere).
+    """
+
+    return list(STYLE_PATTERNS if profile.block_styles else ()) + \
+        list(THIRD_PARTY_PATTERNS if profile.block_third_party else ())
+
+
+#%%
+def make_headless_chrome(profile: RenderProfile = None):
+    """Returns a new Chrome WebDriver, configured as in profile (by default, the profile set with set_render_profile()).
+    Selenium is imported here, so that the pool itself can be used (and tested) without it.
+    """
+
+    from selenium import webdriver
+
+    profile = profile or get_render_profile()
+    options = webdriver.ChromeOptions()
+    if profile.headless:
+        options.add_argument('--headless=new')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--no-sandbox')
+    options.page_load_strategy = profile.page_load_strategy
+    if profile.block_images:
+        options.add_argument('--blink-settings=imagesEnabled=false')
+        options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+    driver = webdriver.Chrome(options=options)
+    patterns = blocked_url_patterns(profile)
+    if patterns:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+    return driver
+
+
+#%%
+def wait_until_filled(driver, selector, timeout, poll_interval=0.05):
+    """Waits until all the elements matching the CSS selector in the page loaded by driver have some text,
+    at most timeout seconds. Returns True if they have, False on timeout.
+    """
+
+    deadline = time.monotonic() + timeout
+    while True:
+        if driver.execute_script(_FILLED_SCRIPT, selector):
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(poll_interval)
+
+
+#%%
+def is_alive(driver):
+    """Health check: returns True if the driver (i.e. its browser session) still responds.
+    """
+
+    try:
+        driver.current_url
+        return True
+    except Exception:
+        return False
+
+
+#%%
+def _quit(driver):
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+#%%
+class DriverPoolClosedError(Exception):
+    """Raised when a driver is requested from a closed DriverPool.
+    """
+
+    def __str__(self):
+        return 'The driver pool is closed.'
+
+
+#%%
+class DriverPool:
+    """The class describing a bounded pool of WebDriver objects.
+    Parameters:
+    - size: the max number of drivers alive at the same time (i.e. the max number of pages rendered concurrently)
+    - factory: a callable that creates a new driver (by default, make_headless_chrome() with the profile;
+      use a fake in tests)
+    - max_pages: the number of pages a driver renders before it is quit and replaced by a fresh one
+    - health_check: a callable that takes a driver and returns False if the driver must be replaced
+    - profile: the RenderProfile of the pages (by default, the one set with set_render_profile())
+    """
+
+    def __init__(self, size=DEFAULT_POOL_SIZE, factory=None, max_pages=DEFAULT_MAX_PAGES, health_check=is_alive,
+                 profile=None):
+        self.size = max(1, size)
+        self.profile = profile or get_render_profile()
+        self.factory = factory or (lambda: make_headless_chrome(self.profile))
+        self.max_pages = max_pages
+        self.health_check = health_check
+        self.__idle = queue.LifoQueue()         # LIFO: reuse the warmest driver first
+        self.__pages = {}                       # id(driver) -> pages rendered so far
+        self.__created = 0
+        self.__closed = False
+        self.__lock = threading.Lock()
+        self.__available = threading.Semaphore(self.size)
+
+    def __str__(self):
+        return f'DriverPool(size={self.size}, alive={self.__created}, idle={self.__idle.qsize()})'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def closed(self):
+        return self.__closed
+
+    def acquire(self, timeout=None):
+        """Checks out a healthy driver, creating one if the pool has not reached its size yet.
+        Blocks (at most timeout seconds, if specified) while all the drivers are checked out.
+        """
+
+        if self.__closed:
+            raise DriverPoolClosedError()
+        if not self.__available.acquire(timeout=timeout):
+            raise TimeoutError('No driver became available in time.')
+        try:
+            while True:
+                try:
+                    driver = self.__idle.get_nowait()
+                except queue.Empty:
+                    return self.__create()
+                if self.health_check(driver):
+                    return driver
+                self.__discard(driver)
+        except BaseException:
+            self.__available.release()
+            raise
+
+    def release(self, driver, broken=False):
+        """Returns a checked-out driver to the pool.
+        The driver is quit instead if it is broken, if it has rendered max_pages pages, or if the pool is closed.
+        """
+
+        with self.__lock:
+            self.__pages[id(driver)] = self.__pages.get(id(driver), 0) + 1
+            worn_out = self.max_pages and self.__pages[id(driver)] >= self.max_pages
+        if broken or worn_out or self.__closed:
+            self.__discard(driver)
+        else:
+            self.__idle.put(driver)
+        self.__available.release()
+
+    @contextmanager
+    def driver(self, timeout=None):
+        """Context manager that checks out a driver and returns it to the pool afterwards:
+            with pool.driver() as driver:
+                driver.get(url)
+        If the block raises an exception, the driver is considered broken and is replaced.
+        """
+
+        driver = self.acquire(timeout)
+        try:
+            yield driver
+        except BaseException:
+            self.release(driver, broken=True)
+            raise
+        self.release(driver)
+
+    def render(self, url):
+        """Loads url in a pooled driver and returns the page source (HTML after JavaScript has run),
+        as in the profile of the pool: after waiting for the profile's wait_for elements to be filled, if specified,
+        and only the profile's fragment of the page, if specified (the whole page if the fragment is not found).
+        """
+
+        profile = self.profile
+        with self.driver() as driver:
+            driver.get(url)
+            if profile.wait_for:
+                wait_until_filled(driver, profile.wait_for, profile.wait_timeout)
+            if profile.fragment:
+                fragment = driver.execute_script(_FRAGMENT_SCRIPT, profile.fragment)
+                if fragment:
+                    return f'<!DOCTYPE html>\n<html><body>\n{fragment}\n</body></html>'
+            return driver.page_source
+
+    def close(self):
+        """Quits all idle drivers; the drivers still checked out are quit when they are released.
+        """
+
+        self.__closed = True
+        while True:
+            try:
+                self.__discard(self.__idle.get_nowait())
+            except queue.Empty:
+                break
+
+    def __create(self):
+        driver = self.factory()
+        with self.__lock:
+            self.__created += 1
+            self.__pages[id(driver)] = 0
+        return driver
+
+    def __discard(self, driver):
+        _quit(driver)
+        with self.__lock:
+            self.__created -= 1
+            self.__pages.pop(id(driver), None)
+
+
+#%%
+def get_default_pool() -> DriverPool:
+    """Returns the module-wide pool used by get_soup_selenium(), creating it with the default settings on first use.
+    """
+
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None or _default_pool.closed:
+            _default_pool = DriverPool()
+        return _default_pool
+
+
+#%%
+def configure_default_pool(**kwargs) -> DriverPool:
+    """Replaces the module-wide pool with DriverPool(**kwargs) and returns it; the previous pool is closed.
+    """
+
+    global _default_pool
+    with _default_pool_lock:
+        old_pool, _default_pool = _default_pool, DriverPool(**kwargs)
+    if old_pool is not None:
+        old_pool.close()
+    return _default_pool
+
+
+#%%
+def close_default_pool():
+    """Closes the module-wide pool (if any); called automatically at interpreter exit.
+    """
+
+    global _default_pool
+    with _default_pool_lock:
+        old_pool, _default_pool = _default_pool, None
+    if old_pool is not None:
+        old_pool.close()
+
+
+atexit.register(close_default_pool)
+
+
+#%%
+if __name__ == '__main__':
+
+    class FakeDriver:
+        def __init__(self):
+            self.current_url = 'about:blank'
+            self.page_source = ''
+
+        def get(self, url):
+            self.current_url = url
+            self.page_source = f'<html><body>{url}</body></html>'
+
+        def execute_script(self, script, selector):
+            return True if script == _FILLED_SCRIPT else ''
+
+        def quit(self):
+            print(f'quit {self}')
+
+    # Test DriverPool with a fake driver
+    print(blocked_url_patterns(FAST_PROFILE))
+    with DriverPool(size=2, factory=FakeDriver, max_pages=2) as pool:
+        for page in range(1, 5):
+            print(pool.render(f'https://ultimateclassicrock.com/search/?s=paul%20mccartney&searchpage={page}'))
+            print(pool)
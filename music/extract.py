@@ -0,0 +1,246 @@
+"""Extraction of article info from the soups of Ultimate Classic Rock search-result pages.
+Kept apart from music/crawl.py, so that it can be used (and tested) without crawling.
+"""
+
+
+#%%
+# Setup / Data
+
+import re
+from urllib.parse import urljoin
+
+from music import parsers
+from music.memory_guard import release_soup
+from music.structured_data import (AUTHOR_ATTRIBUTES, DATE_ATTRIBUTES, complete_records, find_embedded_articles,
+                                   format_date)
+
+ARTICLE_FIELDS = ('title', 'author', 'date', 'image_url')
+PAGE_PARAMETER = 'searchpage'               # the query parameter of the page number in search-result URLs
+
+_ARTICLE_TAG = re.compile(r'<article[\s>]', re.IGNORECASE)
+_DATA_ATTRIBUTES_SELECTOR = ', '.join(f'[{name}]' for name in DATE_ATTRIBUTES + AUTHOR_ATTRIBUTES)
+_PAGE_LINK = re.compile(r'href="[^"]*[?&;]' + PAGE_PARAMETER + r'=(\d+)', re.IGNORECASE)
+
+# The version of the extraction logic; increment it whenever extract_article_info() changes what it returns,
+# so that the records cached for previously seen pages (see music.extract_cache) are invalidated
+EXTRACTOR_VERSION = 4
+
+
+#%%
+def get_articles(soup):
+    """Returns the 'article' tags of a search-result page.
+    The last 'article' tag on the page is not a search result (see the anomaly demonstrated in music/crawl.py),
+    so it is eliminated.
+    """
+
+    return soup.find_all('article')[:-1]
+
+
+#%%
+def article_key(article_info):
+    """Returns the key that identifies an article across pages and crawls, given its (title, author, date, image_url).
+    The date is not part of the key, since it is missing from the static HTML of a page (see missing_fields()).
+    """
+
+    article_title, article_author = article_info[0], article_info[1]
+    return f'{article_title.strip()}|{article_author.strip()}'
+
+
+#%%
+def scan_article(article):
+    """Returns the (url, title, author, date, image_url) of an 'article' tag of a search-result page,
+    gathered in a single traversal of the article's subtree:
+    - image_url: the data-image of the first link in the 'article-image-wrapper' div
+    - url, title: the href and the text of the first link in the 'content' div
+    - date, author: the texts of the first 'time' and 'em' tags in the 'content' div
+    Every lookup is scoped to the article, so a missing element gives None (url, image_url) or '' (the texts)
+    instead of the element of the next article. An empty date or author (e.g. a 'time' tag to be filled
+    by JavaScript) is taken from the attributes instead: the data-* attributes of the article or any of its tags
+    (see music.structured_data.DATE_ATTRIBUTES and AUTHOR_ATTRIBUTES), or else the datetime of the 'time' tag.
+    """
+
+    url = image_url = None
+    title = author = date = ''
+    attribute_date = attribute_author = time_datetime = ''
+    found_link = found_image = found_time = found_em = False
+    stack = [(article, None)]               # (tag, the div it is in: 'image', 'content' or None)
+    while stack:
+        tag, context = stack.pop()
+        for child in reversed(tag.contents):
+            name = child.name
+            if name is None:                # strings, comments
+                continue
+            child_context = context
+            if name == 'div':
+                classes = child.get('class') or ()
+                if 'article-image-wrapper' in classes:
+                    child_context = 'image'
+                elif 'content' in classes:
+                    child_context = 'content'
+            stack.append((child, child_context))
+
+        # the tag itself; its children were pushed in reverse, so the traversal is in document order
+        name = tag.name
+        if tag.attrs:
+            attribute_date = attribute_date or _first_attribute(tag.attrs, DATE_ATTRIBUTES)
+            attribute_author = attribute_author or _first_attribute(tag.attrs, AUTHOR_ATTRIBUTES)
+        if context == 'image':
+            if name == 'a' and not found_image:
+                image_url, found_image = tag.get('data-image'), True
+        elif context == 'content':
+            if name == 'a' and not found_link:
+                url, title, found_link = tag.get('href'), tag.get_text(), True
+            elif name == 'time' and not found_time:
+                date, found_time = tag.get_text(), True
+                time_datetime = tag.get('datetime') or ''
+            elif name == 'em' and not found_em:
+                author, found_em = tag.get_text().lstrip(' by  '), True
+    if not date.strip():
+        date = format_date(attribute_date or time_datetime)
+    if not author.strip() and attribute_author:
+        author = attribute_author.strip()
+    return url, title, author, date, image_url
+
+
+def _first_attribute(attributes, names):
+    for name in names:
+        value = attributes.get(name)
+        if value:
+            return value
+    return ''
+
+
+#%%
+def extract_article_info(soup, with_url=False):
+    """Returns the list of (title, author, date, image_url) tuples of the articles from a search-result page.
+    If with_url is True, the tuples are (url, title, author, date, image_url), where url is the href of the title link
+    (as it is on the page, i.e. possibly relative; None if the link has no href).
+    Each article is scanned once, within its own subtree (see scan_article()); the original extraction with
+    findNext()/find_next() walked forward through the document for every field of every article, and took
+    the element of a following article if one was missing (see benchmarks/extract.py).
+    """
+
+    article_info_list = []
+    for article in get_articles(soup):
+        article_info = scan_article(article)
+        article_info_list.append(article_info if with_url else article_info[1:])
+    return article_info_list
+
+
+#%%
+def extract_article_urls(soup, page_url=''):
+    """Returns the list of the absolute URLs of the articles (their title links) from a search-result page
+    at page_url, in the order of the articles.
+    """
+
+    article_urls = []
+    for article in get_articles(soup):
+        div_content = article.find('div', {'class': 'content'})
+        title_link = div_content.find('a') if div_content else None
+        if title_link and title_link.get('href'):
+            article_urls.append(urljoin(page_url, title_link['href']))
+    return article_urls
+
+
+#%%
+def extract_article_info_selectolax(html, with_url=False):
+    """Returns the list of (title, author, date, image_url) tuples of the articles from the HTML of a search-result page,
+    using the selectolax parser and CSS selectors instead of BeautifulSoup (the adapter for the 'selectolax' backend).
+    with_url is the same as in extract_article_info().
+    """
+
+    from selectolax.lexbor import LexborHTMLParser
+
+    def text(node):
+        return node.text() if node is not None else ''
+
+    article_info_list = []
+    for article in LexborHTMLParser(html).css('article')[:-1]:
+        image_link = article.css_first('div.article-image-wrapper a')
+        title_link = article.css_first('div.content a')
+        featured_image_url = image_link.attributes.get('data-image') if image_link is not None else None
+        article_title = text(title_link)
+        time_tag = article.css_first('div.content time')
+        article_date = text(time_tag)
+        article_author = text(article.css_first('div.content em')).lstrip(' by  ')
+        if not (article_date.strip() and article_author.strip()):
+            # the same fallbacks as in scan_article()
+            tags = [article] + article.css(_DATA_ATTRIBUTES_SELECTOR)
+            if not article_date.strip():
+                attribute_date = next(filter(None, (_first_attribute(tag.attributes, DATE_ATTRIBUTES)
+                                                    for tag in tags)), '')
+                article_date = format_date(attribute_date or (time_tag.attributes.get('datetime')
+                                                              if time_tag is not None else ''))
+            if not article_author.strip():
+                article_author = next(filter(None, (_first_attribute(tag.attributes, AUTHOR_ATTRIBUTES)
+                                                    for tag in tags)), '').strip()
+        article_info = (article_title, article_author, article_date, featured_image_url)
+        article_url = title_link.attributes.get('href') if title_link is not None else None
+        article_info_list.append((article_url,) + article_info if with_url else article_info)
+    return article_info_list
+
+
+#%%
+def extract_article_info_from_html(html, backend=None, with_url=False):
+    """Returns the list of (title, author, date, image_url) tuples of the articles from the HTML of a search-result page.
+    The page is parsed with the parser backend (by default, the one selected with music.parsers.set_backend()),
+    and the soup is decomposed right after the extraction. with_url is the same as in extract_article_info().
+    The dates and authors missing from the tags (and their attributes) are taken from the data embedded
+    in the scripts of the page, if any (see music.structured_data); so, the static HTML fetched with plain requests
+    is usually complete, without rendering the page.
+    """
+
+    if parsers.resolve(backend) == 'selectolax':
+        records = extract_article_info_selectolax(html, with_url=True)
+    else:
+        soup = parsers.make_soup(html, backend)
+        try:
+            records = extract_article_info(soup, with_url=True)
+        finally:
+            release_soup(soup)              # only the tuples live on (see music.memory_guard)
+    if any(not (author.strip() and date.strip()) for url, title, author, date, image_url in records):
+        records = complete_records(records, find_embedded_articles(html))
+    return records if with_url else [record[1:] for record in records]
+
+
+#%%
+def missing_fields(soup, embedded=None):
+    """Returns the set of fields (from ARTICLE_FIELDS) that extract_article_info() needs,
+    but that are missing or empty in at least one article of the page; an empty set means the page is complete.
+    A page without any articles returns {'article'}. embedded is the data embedded in the scripts of the page
+    (from music.structured_data.find_embedded_articles(), as used by extract_article_info_from_html()).
+    Typically, the soups created from plain requests HTML miss the 'date' field (the 'time' tags are filled
+    with JavaScript), unless the page embeds the dates in some other form; the soups rendered by selenium are complete.
+    """
+
+    articles = get_articles(soup)
+    if not articles:
+        return {'article'}
+
+    missing = set()
+    for article in articles:
+        url, title, author, date, image_url = complete_records([scan_article(article)], embedded)[0]
+        if not image_url:
+            missing.add('image_url')
+        if not title.strip():
+            missing.add('title')
+        if not date.strip():
+            missing.add('date')
+        if not author.strip():
+            missing.add('author')
+    return missing
+
+
+#%%
+def inspect_page(html):
+    """Returns (has_articles, last_page) for the HTML of a search-result page: whether the page lists any articles,
+    and the number of the last page of the search result as announced by the pagination links of the page
+    (the greatest searchpage=<n> in the links), or None if the page has no pagination links.
+    To be used with music.crawl_engine.crawl_paginated(), which runs it on every page right after the fetch;
+    so, it scans the raw HTML with regular expressions instead of building a soup.
+    """
+
+    # the last 'article' tag on a page is not a search result (see get_articles())
+    has_articles = len(_ARTICLE_TAG.findall(html)) > 1
+    pages = [int(page) for page in _PAGE_LINK.findall(html)]
+    return has_articles, max(pages) if pages else None
@@ -0,0 +1,132 @@
+"""A persistent cache of extracted article records, keyed by the digest of the page content.
+If the HTML of a page is byte-identical to a page seen before, its (title, author, date, image_url) tuples
+are returned from the cache, skipping both the construction of the soup and the extraction.
+The records are stored together with music.extract.EXTRACTOR_VERSION, so that changing the extraction logic
+(and incrementing EXTRACTOR_VERSION) invalidates them, and with the key of the extractor that produced them
+(see extractor_key()), since the extractors differ in the shape of their records (with_url) and in their backends.
+The records of the earlier versions stay in the file until they are deleted with ExtractCache.purge().
+"""
+
+
+#%%
+# Setup / Data
+
+import hashlib
+import json
+import sqlite3
+from contextlib import closing
+from functools import partial
+from pathlib import Path
+
+from music.extract import EXTRACTOR_VERSION, extract_article_info_from_html
+from settings import *
+
+DEFAULT_CACHE_FILE = DATA_DIR / 'extract_cache.sqlite'
+
+
+#%%
+def page_digest(html):
+    """Returns the SHA-256 hex digest of the page content (a str or bytes).
+    """
+
+    return hashlib.sha256(html.encode('utf-8') if isinstance(html, str) else html).hexdigest()
+
+
+#%%
+def extractor_key(extract):
+    """Returns the str that identifies the extractor extract (a function, or a functools.partial of one) in the cache:
+    its qualified name, with the arguments bound by partial, e.g.
+    "music.extract.extract_article_info_from_html(backend='lxml', with_url=True)".
+    """
+
+    if isinstance(extract, partial):
+        arguments = [repr(argument) for argument in extract.args]
+        arguments += [f'{name}={value!r}' for name, value in sorted(extract.keywords.items())]
+        return f'{extractor_key(extract.func)}({", ".join(arguments)})'
+    return f'{getattr(extract, "__module__", None)}.{getattr(extract, "__qualname__", type(extract).__qualname__)}'
+
+
+#%%
+class ExtractCache:
+    """The class describing the cache of extracted article records.
+    Parameters:
+    - path: the SQLite database file
+    - version: the extractor version the records are valid for; the records of other versions are neither returned
+      nor touched (so, processes on different versions can share the cache file), until purge() deletes them
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_FILE, version=EXTRACTOR_VERSION):
+        self.path = Path(path)
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.__connect() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS extracted (version INTEGER, extractor TEXT, digest TEXT, '
+                               'records TEXT, PRIMARY KEY (version, extractor, digest))')
+
+    def __str__(self):
+        return f'ExtractCache({self.path}, version={self.version}, hits={self.hits}, misses={self.misses})'
+
+    def __connect(self):
+        return closing(sqlite3.connect(self.path, timeout=30, isolation_level=None))
+
+    def purge(self):
+        """Deletes the records of all the other extractor versions (and the table of the earlier cache format,
+        without the extractor keys), and returns the number of records deleted.
+        Run it once after upgrading the extractor, when no process of an older version uses the cache any more.
+        """
+
+        with self.__connect() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute('DROP TABLE IF EXISTS records')
+            deleted = connection.execute('DELETE FROM extracted WHERE version != ?', (self.version,)).rowcount
+            connection.execute('COMMIT')
+        return deleted
+
+    def get(self, extractor, digest):
+        """Returns the list of records cached for the page digest and the extractor (see extractor_key()), or None.
+        """
+
+        with self.__connect() as connection:
+            row = connection.execute('SELECT records FROM extracted WHERE version = ? AND extractor = ? AND digest = ?',
+                                     (self.version, extractor, digest)).fetchone()
+        return [tuple(record) for record in json.loads(row[0])] if row else None
+
+    def put(self, extractor, digest, records):
+        """Caches the list of records extracted by the extractor (see extractor_key()) from the page with the digest.
+        """
+
+        with self.__connect() as connection:
+            connection.execute('INSERT OR REPLACE INTO extracted VALUES (?, ?, ?, ?)',
+                               (self.version, extractor, digest, json.dumps(records)))
+
+    def extract(self, html, extract=extract_article_info_from_html, extractor=None):
+        """Returns the records of the page, from the cache if the same content has been extracted before
+        by the same extractor, otherwise from extract(html) (and caches them).
+        extractor is the key of extract in the cache; by default, extractor_key(extract)
+        (so, pass distinct keys for extractors that it cannot tell apart, e.g. lambdas).
+        """
+
+        extractor = extractor_key(extract) if extractor is None else extractor
+        digest = page_digest(html)
+        records = self.get(extractor, digest)
+        if records is not None:
+            self.hits += 1
+            return records
+        self.misses += 1
+        records = extract(html)
+        self.put(extractor, digest, records)
+        return records
+
+
+#%%
+if __name__ == '__main__':
+
+    # Test ExtractCache.extract(html); the second call does not parse the page
+    cache = ExtractCache()
+    html = (DATA_DIR / 'soup.html').read_text(encoding='utf-8')
+    print(cache.extract(html)[:2])
+    print(cache.extract(html)[:2])
+    print(cache)
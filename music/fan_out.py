@@ -0,0 +1,105 @@
+"""A fan-out crawl: the searches for many musicians at once, with the articles deduplicated across the searches.
+The search results of related musicians overlap heavily (an article about the Beatles comes up in the searches
+for all four of them), so instead of crawling one search after another:
+- the search-result pages of all the queries are crawled concurrently through one shared frontier,
+  a music.host_scheduler.PolitenessScheduler: every page is queued, fetched and parsed once, within the site's limits
+- the articles are merged by their canonical URLs as the pages come in, and each article carries the set
+  of the queries that found it
+- the article pages, if needed, are fetched once per article, however many queries found it
+  (music.article_detail.crawl_article_details() with the unique article URLs)
+"""
+
+
+#%%
+# Setup / Data
+
+from collections import namedtuple
+from functools import partial
+from urllib.parse import quote, urljoin
+
+from music.extract import article_key, extract_article_info_from_html, inspect_page
+from music.host_scheduler import PolitenessScheduler, crawl_seeds
+from music.urls import canonicalize_url, page_url
+
+SEARCH_URL = 'https://ultimateclassicrock.com/search/?s={}'
+
+# An article found by the fan-out crawl: the record from the search-result pages (with its absolute URL),
+# and the frozenset of the queries whose results list it
+MatchedArticle = namedtuple('MatchedArticle', ['url', 'title', 'author', 'date', 'image_url', 'queries'])
+
+
+#%%
+def musician_query(musician):
+    """Returns the search query for a Musician (music.musician_module), i.e. their name in lower case.
+    """
+
+    return ' '.join(musician.name.split()).lower()
+
+
+#%%
+def search_url(query, search_url_format=SEARCH_URL):
+    """Returns the URL of the first search-result page for query.
+    """
+
+    return search_url_format.format(quote(query))
+
+
+#%%
+def crawl_musicians(musicians, fetch_html, max_pages=None, search_url_format=SEARCH_URL, scheduler=None,
+                    backend=None, stats=None):
+    """Crawls the search results for all the musicians (Musician objects) concurrently, and returns the list of the
+    MatchedArticle of every article found, once per article, in the order in which the articles were first found.
+    Parameters:
+    - fetch_html: a blocking callable that takes a URL and returns the HTML, e.g. get_html() from music/crawl.py;
+      it must raise on error responses (as get_html() does), or an error page ends its search as if it were empty
+    - max_pages: the max number of pages per search (None: all of them)
+    - search_url_format: the URL of a search, with {} for the (URL-encoded) query
+    - scheduler: the PolitenessScheduler of the crawl (by default, one with the default settings)
+    - backend: the parser backend of the extraction (see music.extract.extract_article_info_from_html())
+    - stats: a dict, updated with the numbers of 'pages' fetched and parsed, of 'records' extracted from them,
+      of unique 'articles', and of 'duplicates' (the records of articles already found by a query or a page before)
+    The musicians with the same query are searched once; the articles are identified by their canonical URLs
+    (or by their titles and authors, if they have no URL).
+    """
+
+    queries = {search_url(musician_query(musician), search_url_format): musician_query(musician)
+               for musician in musicians}
+    extract = partial(extract_article_info_from_html, backend=backend, with_url=True)
+    articles = {}                           # article key -> (record, the set of queries)
+    stats = {} if stats is None else stats
+    for key in ('pages', 'records', 'articles', 'duplicates'):
+        stats.setdefault(key, 0)
+
+    fetch_page = lambda start_url, page: fetch_html(page_url(start_url, page))
+    for start_url, page, html in crawl_seeds(fetch_page, list(queries), page_url, inspect_page, max_pages, scheduler):
+        records = extract(html)
+        stats['pages'] += 1
+        stats['records'] += len(records)
+        for url, *info in records:
+            url = urljoin(page_url(start_url, page), url) if url else None
+            key = canonicalize_url(url) if url else article_key(info)
+            if key in articles:
+                articles[key][1].add(queries[start_url])
+                stats['duplicates'] += 1
+            else:
+                articles[key] = ((url, *info), {queries[start_url]})
+    stats['articles'] = len(articles)
+    return [MatchedArticle(*record, frozenset(matched_queries)) for record, matched_queries in articles.values()]
+
+
+#%%
+if __name__ == '__main__':
+
+    from music.http_session import get_text
+    from testdata.musicians import johnLennon, paulMcCartney, georgeHarrison, ringoStarr
+    from testdata.ucr_site import FixtureSite
+
+    # Test crawl_musicians(musicians, fetch_html, ...) on the local stand-in site, with overlapping search results
+    with FixtureSite(n_pages=5, shared=0.5) as site:
+        stats = {}
+        matched_articles = crawl_musicians([johnLennon, paulMcCartney, georgeHarrison, ringoStarr], get_text,
+                                           search_url_format=site.base_url + '/search/?s={}',
+                                           scheduler=PolitenessScheduler(per_host=4, crawl_delay=0), stats=stats)
+        print(stats)
+        for article in matched_articles[:5]:
+            print(article.title, sorted(article.queries))
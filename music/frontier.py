@@ -0,0 +1,309 @@
+"""A disk-backed crawl frontier: the queue of the URLs to crawl, and the set of all the URLs seen so far.
+The URLs are canonicalized (music.urls.canonicalize_url()) before they are queued or looked up, so the same page
+is never queued twice under different spellings of its URL. Nothing is kept in RAM but the Bloom filter's pages
+the OS chooses to cache, so the frontier scales to millions of URLs, and it survives restarts:
+- the queue is an SQLite table ordered by priority (lower first) and then by arrival (FIFO);
+  a URL taken from the queue stays there until it is marked as done, so after a crash or an interruption,
+  the URLs taken but not done are handed out again
+- the seen-set is the exact set of the 64-bit fingerprints of the URLs (an SQLite table, i.e. an on-disk hash set),
+  behind an on-disk Bloom filter (a memory-mapped bit array) that answers most lookups of new URLs without a query
+Bloom filter: https://en.wikipedia.org/wiki/Bloom_filter
+"""
+
+
+#%%
+# Setup / Data
+
+import hashlib
+import math
+import mmap
+import sqlite3
+import struct
+import threading
+from contextlib import closing
+from pathlib import Path
+
+from music.urls import canonicalize_url, url_fingerprint
+from settings import *
+
+DEFAULT_FRONTIER_DIR = DATA_DIR / 'frontier'
+DEFAULT_CAPACITY = 10_000_000                   # the number of URLs the Bloom filter is sized for
+DEFAULT_ERROR_RATE = 0.001                      # the false positive rate of the Bloom filter at full capacity
+
+
+#%%
+class BloomFilter:
+    """The class describing an on-disk Bloom filter of 64-bit integers (e.g. URL fingerprints).
+    The bit array is a memory-mapped file, sized for capacity items at the false positive rate error_rate;
+    the parameters of an existing file are kept (capacity and error_rate only apply to a new file).
+    """
+
+    _HEADER = struct.Struct('<4sQQQ')           # magic, the number of bits, of hash functions, and of items added
+    _MAGIC = b'BLM1'
+
+    def __init__(self, path, capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE):
+        self.path = Path(path)
+        if not self.path.exists():
+            n_bits = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+            n_hashes = max(1, round(n_bits / capacity * math.log(2)))
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'wb') as f:
+                f.write(self._HEADER.pack(self._MAGIC, n_bits, n_hashes, 0))
+                f.truncate(self._HEADER.size + (n_bits + 7) // 8)      # a sparse file of zeros
+        self.__file = open(self.path, 'r+b')
+        self.__map = mmap.mmap(self.__file.fileno(), 0)
+        magic, self.n_bits, self.n_hashes, self.count = self._HEADER.unpack_from(self.__map)
+        if magic != self._MAGIC:
+            self.close()
+            raise ValueError(f'{self.path} is not a Bloom filter file')
+        self.__lock = threading.Lock()
+
+    def __str__(self):
+        return f'BloomFilter({self.path}, {self.count} item(s), {self.n_bits} bits, {self.n_hashes} hashes)'
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __positions(self, item):
+        # double hashing: the k bit positions are h1 + i * h2 (mod the number of bits)
+        digest = hashlib.blake2b(item.to_bytes(8, 'big', signed=True), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % self.n_bits for i in range(self.n_hashes)]
+
+    def __contains__(self, item):
+        offset = self._HEADER.size
+        return all(self.__map[offset + position // 8] & (1 << position % 8) for position in self.__positions(item))
+
+    def add(self, item):
+        """Adds item (each item should be added once, since the items are counted); returns True if it was
+        certainly not in the filter before.
+        """
+
+        offset = self._HEADER.size
+        added = False
+        with self.__lock:
+            for position in self.__positions(item):
+                byte = self.__map[offset + position // 8]
+                if not byte & (1 << position % 8):
+                    self.__map[offset + position // 8] = byte | (1 << position % 8)
+                    added = True
+            self.count += 1
+            self._HEADER.pack_into(self.__map, 0, self._MAGIC, self.n_bits, self.n_hashes, self.count)
+        return added
+
+    def clear(self):
+        """Removes all the items.
+        """
+
+        with self.__lock:
+            chunk = 1024 * 1024
+            for start in range(self._HEADER.size, len(self.__map), chunk):
+                end = min(start + chunk, len(self.__map))
+                self.__map[start:end] = bytes(end - start)
+            self.count = 0
+            self._HEADER.pack_into(self.__map, 0, self._MAGIC, self.n_bits, self.n_hashes, self.count)
+
+    def flush(self):
+        self.__map.flush()
+
+    def close(self):
+        if not self.__map.closed:
+            self.__map.flush()
+            self.__map.close()
+        self.__file.close()
+
+
+#%%
+class SeenSet:
+    """The class describing the persistent set of the seen URLs (or any other strings):
+    the exact set of their fingerprints (the 'seen' table of the SQLite database at db_path),
+    behind a BloomFilter (at bloom_path) that answers most lookups of new URLs without a query.
+    The table is the authority; if the Bloom filter is out of step with it (e.g. after a crash), it is rebuilt.
+    It has the interface of a set of strings as used by music.article_detail.unique_urls() (in, add()).
+    """
+
+    def __init__(self, db_path, bloom_path, capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with _connect(self.db_path) as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS seen (fingerprint INTEGER PRIMARY KEY)')
+            count = connection.execute('SELECT COUNT(*) FROM seen').fetchone()[0]
+        self.bloom = BloomFilter(bloom_path, capacity, error_rate)
+        if len(self.bloom) != count:
+            self.__rebuild_bloom()
+
+    def __str__(self):
+        return f'SeenSet({self.db_path}, {len(self)} item(s))'
+
+    def __len__(self):
+        with _connect(self.db_path) as connection:
+            return connection.execute('SELECT COUNT(*) FROM seen').fetchone()[0]
+
+    def __contains__(self, key):
+        fingerprint = url_fingerprint(key)
+        if fingerprint not in self.bloom:
+            return False
+        with _connect(self.db_path) as connection:
+            return connection.execute('SELECT 1 FROM seen WHERE fingerprint = ?', (fingerprint,)).fetchone() is not None
+
+    def add(self, key):
+        """Adds key; returns True if it was not in the set before.
+        """
+
+        return bool(self.add_many([key]))
+
+    def add_many(self, keys):
+        """Adds the keys in a single transaction; returns the list of those that were not in the set before.
+        """
+
+        with _connect(self.db_path) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            new_keys = self._add_many(connection, keys)
+            connection.execute('COMMIT')
+        self._commit_bloom(new_keys)
+        return new_keys
+
+    def _add_many(self, connection, keys):
+        # within the caller's transaction; the Bloom filter is updated (_commit_bloom()) only after the commit
+        new_keys = []
+        for key in keys:
+            if connection.execute('INSERT OR IGNORE INTO seen VALUES (?)', (url_fingerprint(key),)).rowcount:
+                new_keys.append(key)
+        return new_keys
+
+    def _commit_bloom(self, keys):
+        for key in keys:
+            self.bloom.add(url_fingerprint(key))
+
+    def __rebuild_bloom(self):
+        self.bloom.clear()
+        with _connect(self.db_path) as connection:
+            for fingerprint, in connection.execute('SELECT fingerprint FROM seen'):
+                self.bloom.add(fingerprint)
+        self.bloom.flush()
+
+    def close(self):
+        self.bloom.close()
+
+
+#%%
+def _connect(path):
+    # One short-lived connection per operation, as in music.http_cache: sqlite3 connections must not be shared
+    # between threads. In WAL mode, synchronous=NORMAL commits without an fsync, which is safe against crashes
+    # of the crawler (an OS crash may lose the last transactions, but never corrupts the database).
+    connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+    connection.execute('PRAGMA busy_timeout=30000')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    return closing(connection)
+
+
+#%%
+class CrawlFrontier:
+    """The class describing a disk-backed crawl frontier, stored in the directory path
+    (frontier.sqlite, with the queue and the seen-set, and seen.bloom, the Bloom filter of the seen-set).
+    A URL is queued only the first time it is added (i.e. if it has not been seen before, in any run);
+    pop() hands out the queued URLs by priority (lower first), and in the order they were added within a priority,
+    and done() removes them from the queue. On opening, the URLs handed out but not done are queued again.
+    Parameters: capacity and error_rate of the Bloom filter (see BloomFilter).
+    """
+
+    def __init__(self, path=DEFAULT_FRONTIER_DIR, capacity=DEFAULT_CAPACITY, error_rate=DEFAULT_ERROR_RATE):
+        self.path = Path(path)
+        self.db_path = self.path / 'frontier.sqlite'
+        self.seen = SeenSet(self.db_path, self.path / 'seen.bloom', capacity, error_rate)
+        with _connect(self.db_path) as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS queue ('
+                               'id INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT NOT NULL UNIQUE, '
+                               'priority INTEGER NOT NULL, taken INTEGER NOT NULL DEFAULT 0)')
+            connection.execute('CREATE INDEX IF NOT EXISTS queue_order ON queue (taken, priority, id)')
+            connection.execute('UPDATE queue SET taken = 0 WHERE taken = 1')
+        self.__lock = threading.Lock()
+
+    def __str__(self):
+        return f'CrawlFrontier({self.path}, {len(self)} URL(s) queued, {len(self.seen)} seen)'
+
+    def __len__(self):
+        with _connect(self.db_path) as connection:
+            return connection.execute('SELECT COUNT(*) FROM queue').fetchone()[0]
+
+    def __contains__(self, url):
+        """Returns True if url has been seen (i.e. added) before, whether it has been crawled or not.
+        """
+
+        return canonicalize_url(url) in self.seen
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add(self, url, priority=0):
+        """Queues url with priority if it has not been seen before; returns True if it has been queued.
+        """
+
+        return bool(self.add_many([url], priority))
+
+    def add_many(self, urls, priority=0):
+        """Queues those of the urls that have not been seen before, with priority, in a single transaction;
+        returns the list of the canonical URLs queued.
+        """
+
+        canonical_urls = list(dict.fromkeys(canonicalize_url(url) for url in urls))
+        with _connect(self.db_path) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            new_urls = self.seen._add_many(connection, canonical_urls)
+            connection.executemany('INSERT INTO queue (url, priority) VALUES (?, ?)',
+                                   [(url, priority) for url in new_urls])
+            connection.execute('COMMIT')
+        self.seen._commit_bloom(new_urls)
+        return new_urls
+
+    def pop(self):
+        """Returns the next URL to crawl (marked as taken, until done() is called), or None if there is none.
+        """
+
+        with self.__lock, _connect(self.db_path) as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            row = connection.execute('SELECT id, url FROM queue WHERE taken = 0 '
+                                     'ORDER BY priority, id LIMIT 1').fetchone()
+            if row is not None:
+                connection.execute('UPDATE queue SET taken = 1 WHERE id = ?', (row[0],))
+            connection.execute('COMMIT')
+        return row[1] if row is not None else None
+
+    def done(self, url):
+        """Removes url (as returned by pop()) from the queue; it stays seen.
+        """
+
+        with _connect(self.db_path) as connection:
+            connection.execute('DELETE FROM queue WHERE url = ?', (url,))
+
+    def close(self):
+        self.seen.close()
+
+
+#%%
+if __name__ == '__main__':
+
+    import tempfile
+    import time
+
+    # Test CrawlFrontier(path): add and pop 100,000 URLs (half of them duplicates), and reopen the frontier
+    with tempfile.TemporaryDirectory() as frontier_dir:
+        start = time.perf_counter()
+        with CrawlFrontier(frontier_dir, capacity=1_000_000) as frontier:
+            for batch in range(100):
+                frontier.add_many(f'https://example.com/article-{i // 2}/?utm_source=x{i % 2}'
+                                  for i in range(batch * 1000, (batch + 1) * 1000))
+            print(frontier, f'{time.perf_counter() - start:.2f}s')
+            print(frontier.pop())
+        with CrawlFrontier(frontier_dir) as frontier:
+            print(frontier, frontier.pop())
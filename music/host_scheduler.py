@@ -0,0 +1,242 @@
+"""A per-host politeness scheduler, for crawls of many seed URLs across several sites.
+The URLs are queued per host, and the hosts are served round-robin, so a slow or large site does not hold up
+the others; each host has a cap on its requests in flight and a crawl delay (the min time between the starts
+of two of its requests, as in the Crawl-delay of robots.txt). Total throughput grows with the number of hosts,
+while every single site sees no more than per_host requests at a time, crawl_delay seconds apart.
+This complements music.rate_limit, which adapts the request rate of a host to its responses: the scheduler
+decides in what order and how fast the URLs are handed to the fetchers, the rate limiter guards each request.
+Crawl-delay: https://en.wikipedia.org/wiki/Robots.txt#Crawl-delay_directive
+"""
+
+
+#%%
+# Setup / Data
+
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+from music.urls import canonicalize_url
+
+DEFAULT_PER_HOST = 2                    # requests in flight per host
+DEFAULT_CRAWL_DELAY = 1.0               # seconds between the starts of two requests to the same host
+DEFAULT_WORKERS = 16                    # fetching threads for all the hosts together
+
+
+#%%
+def host_of(url):
+    """Returns the host (with the port, if any) of url, in lower case, as in music.rate_limit.RateLimiter.
+    """
+
+    return urlsplit(url).netloc.lower()
+
+
+#%%
+class _Host:
+    # the state of a host: its queue of URLs, its requests in flight, and when it may get the next one
+
+    def __init__(self, per_host, crawl_delay):
+        self.queue = deque()
+        self.per_host = per_host
+        self.crawl_delay = crawl_delay
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.fetched = 0
+        self.next_start = 0.0
+
+    def ready_in(self, now):
+        # seconds until a URL of the host can start (0: now), or None if it has no URLs or no free slot
+        if not self.queue or self.in_flight >= self.per_host:
+            return None
+        return max(0.0, self.next_start - now)
+
+
+#%%
+class PolitenessScheduler:
+    """The class describing the scheduler of the URLs of a multi-host crawl (see the module docstring).
+    Parameters:
+    - per_host: the max number of requests in flight per host
+    - crawl_delay: the min number of seconds between the starts of two requests to the same host
+    - workers: the number of fetching threads for all the hosts together (at most per_host are busy with any host)
+    - host_settings: {host: (per_host, crawl_delay)} for the hosts that need other settings
+      (e.g. from their robots.txt), where host is as returned by host_of()
+    A URL is queued only once (compared in its canonical form, see music.urls.canonicalize_url()).
+    """
+
+    def __init__(self, per_host=DEFAULT_PER_HOST, crawl_delay=DEFAULT_CRAWL_DELAY, workers=DEFAULT_WORKERS,
+                 host_settings=None):
+        self.per_host = max(1, per_host)
+        self.crawl_delay = crawl_delay
+        self.workers = max(1, workers)
+        self.host_settings = dict(host_settings or {})
+        self.__hosts = {}                   # host -> _Host, in the order of their first URLs
+        self.__seen = set()
+        self.__turn = 0                     # the index of the host served first in the next round
+
+    def __str__(self):
+        return f'PolitenessScheduler(per_host={self.per_host}, crawl_delay={self.crawl_delay}, ' \
+               f'{len(self.__hosts)} host(s), {self.queued()} URL(s) queued)'
+
+    def __len__(self):
+        return len(self.__seen)
+
+    def add(self, url):
+        """Queues url for its host, unless it has been queued before; returns True if it is queued now.
+        """
+
+        canonical_url = canonicalize_url(url)
+        if canonical_url in self.__seen:
+            return False
+        self.__seen.add(canonical_url)
+        host = host_of(url)
+        if host not in self.__hosts:
+            per_host, crawl_delay = self.host_settings.get(host, (self.per_host, self.crawl_delay))
+            self.__hosts[host] = _Host(max(1, per_host), crawl_delay)
+        self.__hosts[host].queue.append(url)
+        return True
+
+    def add_many(self, urls):
+        """Queues the urls (see add()); returns the number of URLs queued.
+        """
+
+        return sum(self.add(url) for url in urls)
+
+    def queued(self):
+        return sum(len(host.queue) for host in self.__hosts.values())
+
+    def stats(self):
+        """Returns {host: (fetched, peak_in_flight, queued)} for all the hosts seen so far.
+        """
+
+        return {name: (host.fetched, host.peak_in_flight, len(host.queue)) for name, host in self.__hosts.items()}
+
+    def __next_ready(self, now):
+        # returns (host name, 0) for the next host that can start a URL now, in round-robin order,
+        # or (None, seconds until one can) / (None, None) if none can
+        names = list(self.__hosts)
+        soonest = None
+        for i in range(len(names)):
+            name = names[(self.__turn + i) % len(names)]
+            ready_in = self.__hosts[name].ready_in(now)
+            if ready_in == 0:
+                self.__turn = (self.__turn + i + 1) % len(names)
+                return name, 0.0
+            if ready_in is not None and (soonest is None or ready_in < soonest):
+                soonest = ready_in
+        return None, soonest
+
+    def run(self, fetch, expand=None):
+        """Generator that calls fetch(url) for the queued URLs, and yields the (url, fetch(url)) pairs
+        in the order in which the fetches complete, until no URLs are left.
+        If expand is specified, expand(url, result) is called (in the consumer's thread) for every fetched URL,
+        and returns the URLs to queue next (e.g. the next pages of a multi-page list), or None.
+        If a fetch raises an exception, it is raised when its URL would be yielded.
+        """
+
+        running = {}                        # future -> (url, host name)
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='polite')
+        try:
+            while True:
+                # start everything the hosts allow right now; timeout: until a host allows the next one
+                timeout = None
+                while len(running) < self.workers:
+                    now = time.monotonic()
+                    name, ready_in = self.__next_ready(now)
+                    if name is None:
+                        timeout = ready_in
+                        break
+                    host = self.__hosts[name]
+                    url = host.queue.popleft()
+                    host.in_flight += 1
+                    host.peak_in_flight = max(host.peak_in_flight, host.in_flight)
+                    host.next_start = now + host.crawl_delay
+                    running[executor.submit(fetch, url)] = (url, name)
+                if not running:
+                    if timeout is None:
+                        return              # nothing in flight, nothing queued
+                    time.sleep(timeout)
+                    continue
+
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url, name = running.pop(future)
+                    host = self.__hosts[name]
+                    host.in_flight -= 1
+                    host.fetched += 1
+                    result = future.result()
+                    if expand is not None:
+                        self.add_many(expand(url, result) or ())
+                    yield url, result
+        finally:
+            for future in running:
+                future.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+#%%
+def crawl_seeds(fetch_page, start_urls, page_url, inspect, max_pages=None, scheduler=None):
+    """Generator that crawls the multi-page lists starting at start_urls (on any number of hosts) politely,
+    through scheduler (a PolitenessScheduler, by default with the default settings), and yields
+    (start_url, page, fetch_page(start_url, page)) in the order in which the pages are fetched.
+    Parameters:
+    - fetch_page: a blocking callable that takes a start URL and a page number,
+      e.g. lambda start_url, page: get_next_html(start_url, page, 'requests')
+    - page_url: a callable that returns the URL of page of a list, given its start URL (e.g. music.urls.page_url())
+    - inspect: as in music.crawl_engine.crawl_paginated(), (has_items, last_page) for the result of fetch_page()
+    - max_pages: the max number of pages per list (None: all of them)
+    A list is crawled page by page until its last page is announced by a page (e.g. in its pagination links);
+    then, all its remaining pages are queued at once, so they are fetched in parallel (within the host's limits).
+    Its pages are not yielded in page order; a page without items ends its list.
+    """
+
+    scheduler = PolitenessScheduler() if scheduler is None else scheduler
+    pages = {}                              # URL -> (start URL, page)
+    empty = set()                           # the URLs of the pages without items
+    queued_until = {}                       # start URL -> the last page queued
+
+    def queue(start_url, page):
+        url = page_url(start_url, page)
+        if scheduler.add(url):
+            pages[url] = (start_url, page)
+        queued_until[start_url] = max(queued_until.get(start_url, 0), page)
+
+    def expand(url, result):
+        start_url, page = pages[url]
+        has_items, last_page = inspect(result)
+        if not has_items:
+            empty.add(url)
+        bound = min((value for value in (max_pages, last_page) if value is not None), default=None)
+        if not has_items or (bound is not None and page >= bound):
+            return
+        if last_page is None:
+            next_pages = [page + 1]
+        else:
+            next_pages = range(queued_until[start_url] + 1, bound + 1)
+        for next_page in next_pages:
+            queue(start_url, next_page)
+
+    if max_pages is None or max_pages >= 1:
+        for start_url in start_urls:
+            queue(start_url, 1)
+    for url, result in scheduler.run(lambda url: fetch_page(*pages[url]), expand):
+        if url not in empty:
+            start_url, page = pages[url]
+            yield start_url, page, result
+
+
+#%%
+if __name__ == '__main__':
+
+    # Test PolitenessScheduler: 3 hosts, 6 URLs each, at most 2 requests in flight per host, 0.1s apart
+    def slow_fetch(url):
+        time.sleep(0.2)
+        return len(url)
+
+    scheduler = PolitenessScheduler(per_host=2, crawl_delay=0.1)
+    scheduler.add_many(f'https://site{host}.example/page/{page}' for page in range(6) for host in range(3))
+    print(scheduler)
+    start = time.perf_counter()
+    for url, result in scheduler.run(slow_fetch):
+        print(f'{time.perf_counter() - start:.2f}s {url}')
+    print(scheduler.stats())
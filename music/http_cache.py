@@ -0,0 +1,195 @@
+"""A persistent, on-disk HTTP response cache for the crawl fetchers.
+Responses are stored in an SQLite database (by default DATA_DIR / 'http_cache.sqlite'), keyed by URL.
+A response younger than ttl seconds is served without any network access; an older one is revalidated
+with a conditional GET (If-None-Match / If-Modified-Since), so an unchanged page costs a 304 response only.
+The total size of the stored bodies is bounded; the least recently used responses are evicted first.
+SQLite does the locking, so the cache can be shared by several crawler processes (and threads) at once.
+HTTP conditional requests: https://developer.mozilla.org/en-US/docs/Web/HTTP/Conditional_requests
+"""
+
+
+#%%
+# Setup / Data
+
+import json
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from settings import *
+
+DEFAULT_CACHE_FILE = DATA_DIR / 'http_cache.sqlite'
+DEFAULT_TTL = 60 * 60                           # seconds
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Headers that describe the transfer rather than the (already decoded) body, so they are not stored
+_TRANSFER_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive'}
+
+
+#%%
+def _make_response(url, status_code, headers, body, from_cache):
+    """Returns a requests.Response built from the stored parts of a response,
+    so that the callers (e.g. get_soup()) can use it as if it came from the network.
+    """
+
+    response = requests.Response()
+    response.url = url
+    response.status_code = status_code
+    response.headers = CaseInsensitiveDict(headers)
+    response._content = body
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.from_cache = from_cache
+    return response
+
+
+#%%
+class HTTPCache:
+    """The class describing the on-disk response cache.
+    Parameters:
+    - path: the SQLite database file
+    - ttl: the number of seconds a stored response is used without revalidation
+    - max_bytes: the max total size of the stored bodies
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_FILE, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.__connect() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS responses ('
+                               'url TEXT PRIMARY KEY, status INTEGER, headers TEXT, body BLOB, '
+                               'etag TEXT, last_modified TEXT, size INTEGER, fetched_at REAL, accessed_at REAL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)')
+
+    def __str__(self):
+        return f'HTTPCache({self.path}, ttl={self.ttl}, max_bytes={self.max_bytes})'
+
+    def __connect(self):
+        # One short-lived connection per operation: sqlite3 connections must not be shared between threads,
+        # and SQLite's file locks make concurrent processes wait (up to timeout seconds) instead of failing.
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.execute('PRAGMA busy_timeout=30000')
+        return closing(connection)
+
+    def get(self, session, url, **kwargs):
+        """Returns the response to GET url, from the cache if it is fresh, otherwise from session.get(url, **kwargs),
+        conditionally if a stored response can be revalidated. The returned response has the from_cache attribute.
+        """
+
+        now = time.time()
+        entry = self.__lookup(url)
+        if entry and now - entry['fetched_at'] < self.ttl:
+            self.__touch(url, now, fetched=False)
+            return _make_response(url, entry['status'], entry['headers'], entry['body'], True)
+
+        if entry:
+            headers = dict(kwargs.pop('headers', None) or {})
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+            kwargs['headers'] = headers
+        response = session.get(url, **kwargs)
+
+        if entry and response.status_code == 304:
+            self.__touch(url, now, fetched=True)
+            return _make_response(url, entry['status'], entry['headers'], entry['body'], True)
+        response.from_cache = False
+        if response.status_code == 200:
+            self.store(url, response.status_code, response.headers, response.content)
+        return response
+
+    def get_rendered(self, url, render):
+        """Returns the HTML of url rendered by render(url) (e.g. a selenium driver pool's render()),
+        from the cache if it is fresh. Rendered pages cannot be revalidated, so only the ttl applies.
+        """
+
+        key = 'rendered:' + url
+        now = time.time()
+        entry = self.__lookup(key)
+        if entry and now - entry['fetched_at'] < self.ttl:
+            self.__touch(key, now, fetched=False)
+            return entry['body'].decode('utf-8')
+        html = render(url)
+        self.store(key, 200, {'Content-Type': 'text/html; charset=utf-8'}, html.encode('utf-8'))
+        return html
+
+    def store(self, url, status, headers, body):
+        """Stores a response and evicts the least recently used ones if the cache exceeds max_bytes.
+        """
+
+        headers = {k: v for k, v in headers.items() if k.lower() not in _TRANSFER_HEADERS}
+        now = time.time()
+        with self.__connect() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                               (url, status, json.dumps(headers), body,
+                                CaseInsensitiveDict(headers).get('ETag'),
+                                CaseInsensitiveDict(headers).get('Last-Modified'), len(body), now, now))
+            self.__evict(connection)
+            connection.execute('COMMIT')
+
+    def clear(self):
+        """Removes all the stored responses.
+        """
+
+        with self.__connect() as connection:
+            connection.execute('DELETE FROM responses')
+
+    def size(self):
+        """Returns the total size of the stored bodies, in bytes.
+        """
+
+        with self.__connect() as connection:
+            return connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def __lookup(self, url):
+        with self.__connect() as connection:
+            row = connection.execute('SELECT status, headers, body, etag, last_modified, fetched_at '
+                                     'FROM responses WHERE url = ?', (url,)).fetchone()
+        if row is None:
+            return None
+        status, headers, body, etag, last_modified, fetched_at = row
+        return {'status': status, 'headers': json.loads(headers), 'body': body, 'etag': etag,
+                'last_modified': last_modified, 'fetched_at': fetched_at}
+
+    def __touch(self, url, now, fetched):
+        with self.__connect() as connection:
+            if fetched:
+                connection.execute('UPDATE responses SET fetched_at = ?, accessed_at = ? WHERE url = ?',
+                                   (now, now, url))
+            else:
+                connection.execute('UPDATE responses SET accessed_at = ? WHERE url = ?', (now, url))
+
+    def __evict(self, connection):
+        excess = connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return
+        victims = []
+        for url, size in connection.execute('SELECT url, size FROM responses ORDER BY accessed_at'):
+            victims.append((url,))
+            excess -= size
+            if excess <= 0:
+                break
+        connection.executemany('DELETE FROM responses WHERE url = ?', victims)
+
+
+#%%
+if __name__ == '__main__':
+
+    from music import http_session
+
+    # Test HTTPCache.get(session, url): the second call is served from the cache
+    cache = HTTPCache(ttl=60)
+    url = 'https://ultimateclassicrock.com/search/?s=paul%20mccartney'
+    for _ in range(2):
+        response = cache.get(http_session.get_session(), url, allow_redirects=False)
+        print(response.status_code, response.from_cache, len(response.text))
+    print(cache, cache.size())
@@ -0,0 +1,204 @@
+"""The shared HTTP session layer of the crawl module.
+A single requests.Session is shared by get_soup(), get_next_soup() and crawl(), so that the TCP+TLS connections
+to a host are pooled and kept alive across pages instead of being opened anew for each requests.get().
+Optionally, the GETs go through a persistent response cache (see music.http_cache and set_cache()),
+and the requests that do reach the network through a per-host rate limiter
+(see music.rate_limit and set_rate_limiter());
+the pages fetched from the network can be kept in a page archive (see music.page_archive and set_archive()).
+Requests documentation (Session objects, transport adapters): https://requests.readthedocs.io/en/latest/user/advanced/
+"""
+
+
+#%%
+# Setup / Data
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) '
+                  'Chrome/120.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+DEFAULT_TIMEOUT = (5, 30)               # (connect timeout, read timeout), in seconds
+DEFAULT_POOL_SIZE = 16                  # max connections kept alive per host; keep it >= the crawl concurrency
+DEFAULT_POOL_HOSTS = 10                 # max number of hosts whose connection pools are kept
+
+_session = None
+_session_lock = threading.Lock()
+_cache = None
+_rate_limiter = None
+_archive = None
+
+
+#%%
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies a default timeout to every request sent through it
+    (requests.Session has no session-wide timeout setting, and requests.get() without a timeout may hang forever).
+    """
+
+    def __init__(self, *args, timeout=DEFAULT_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+#%%
+def make_session(pool_size=DEFAULT_POOL_SIZE, pool_hosts=DEFAULT_POOL_HOSTS, headers=None, timeout=DEFAULT_TIMEOUT,
+                 max_retries=0) -> requests.Session:
+    """Returns a new requests.Session with keep-alive connection pooling.
+    Parameters:
+    - pool_size: the max number of connections kept alive per host
+    - pool_hosts: the max number of per-host connection pools kept by the session
+    - headers: headers sent with every request; they update DEFAULT_HEADERS
+    - timeout: the default timeout, either a number or a (connect, read) tuple
+    - max_retries: the number of retries on connection errors (see requests.adapters.HTTPAdapter)
+    """
+
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    session.headers.update(headers or {})
+    adapter = TimeoutHTTPAdapter(timeout=timeout, pool_connections=pool_hosts, pool_maxsize=pool_size,
+                                 max_retries=max_retries)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+#%%
+def get_session() -> requests.Session:
+    """Returns the shared session, creating it with the default settings on first use.
+    """
+
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = make_session()
+        return _session
+
+
+#%%
+def configure_session(**kwargs) -> requests.Session:
+    """Replaces the shared session with a new one created by make_session(**kwargs) and returns it.
+    The connections of the previous shared session are closed.
+    """
+
+    global _session
+    with _session_lock:
+        old_session, _session = _session, make_session(**kwargs)
+    if old_session is not None:
+        old_session.close()
+    return _session
+
+
+#%%
+def close_session():
+    """Closes the shared session and its pooled connections; the next get_session() creates a new one.
+    """
+
+    global _session
+    with _session_lock:
+        old_session, _session = _session, None
+    if old_session is not None:
+        old_session.close()
+
+
+#%%
+def set_cache(cache):
+    """Makes get() go through cache (a music.http_cache.HTTPCache object); set_cache(None) disables caching.
+    """
+
+    global _cache
+    _cache = cache
+
+
+#%%
+def get_cache():
+    """Returns the response cache used by get(), or None if caching is disabled.
+    """
+
+    return _cache
+
+
+#%%
+def set_rate_limiter(rate_limiter):
+    """Makes get() go through rate_limiter (a music.rate_limit.RateLimiter object); set_rate_limiter(None) disables it.
+    """
+
+    global _rate_limiter
+    _rate_limiter = rate_limiter
+
+
+#%%
+def get_rate_limiter():
+    """Returns the rate limiter used by get(), or None if rate limiting is disabled.
+    """
+
+    return _rate_limiter
+
+
+#%%
+def set_archive(archive):
+    """Makes get() append the pages it fetches to archive (a music.page_archive.PageArchive object);
+    set_archive(None) disables archiving.
+    """
+
+    global _archive
+    _archive = archive
+
+
+#%%
+def get_archive():
+    """Returns the page archive used by get(), or None if archiving is disabled.
+    """
+
+    return _archive
+
+
+#%%
+def get(url, **kwargs) -> requests.Response:
+    """Sends GET url on the shared session, through the response cache and the rate limiter if they are set,
+    and returns the response. Responses served from the cache do not count against the rate limits.
+    If the page archive is set, the successful responses that do not come from the cache are archived.
+    """
+
+    session = get_session() if _rate_limiter is None else _rate_limiter.wrap(get_session())
+    if _cache is not None:
+        response = _cache.get(session, url, **kwargs)
+    else:
+        response = session.get(url, **kwargs)
+    if _archive is not None and response.status_code == 200 and not getattr(response, 'from_cache', False):
+        _archive.append(url, response.text, response.status_code, response.headers)
+    return response
+
+
+#%%
+def get_text(url, **kwargs) -> str:
+    """Returns the text of the response to get(url, **kwargs).
+    Raises requests.HTTPError if the response is not successful (not 2xx), e.g. a 404, a 500, or the 429 left
+    after the retries of the rate limiter: an error page has no articles, so taking it for a page would end
+    a crawl as if the list were over (see music.crawl_engine.crawl_paginated()).
+    """
+
+    response = get(url, **kwargs)
+    if not 200 <= response.status_code < 300:
+        raise requests.HTTPError(f'{response.status_code} response for url: {url}', response=response)
+    return response.text
+
+
+#%%
+if __name__ == '__main__':
+
+    # Test get_session() and configure_session(**kwargs)
+    print(get_session() is get_session())
+    session = configure_session(pool_size=4, headers={'Accept-Language': 'en'}, timeout=10)
+    print(session.headers)
+    print(session.get_adapter('https://ultimateclassicrock.com').timeout)
+    close_session()
@@ -0,0 +1,46 @@
+"""Hybrid fetching for the crawl module: cheap static HTTP first, browser rendering only when needed.
+A page is fetched with plain requests first; if its soup lacks any of the fields that
+get_article_info_list() extracts (see music.extract.missing_fields()) and that rendering supplies (the fields
+the scripts of the page fill in, RENDERED_FIELDS), it is rendered with selenium. A field that is missing from
+the page itself (e.g. an article without an image) or a page without articles (e.g. the one after the last page
+of a search result) is not rendered: the browser would not find anything more.
+The fields found in the data embedded in the page (JSON-LD, script payloads, attributes; see music.structured_data)
+count as present, since get_article_info_list() takes them from there; so, only the pages that ship no such data
+are rendered.
+"""
+
+
+#%%
+# Setup / Data
+
+from collections import namedtuple
+
+from music import parsers
+from music.extract import missing_fields
+from music.memory_guard import release_soup
+from music.structured_data import find_embedded_articles
+
+# The decision made for a page: which fetcher produced its HTML ('static' or 'rendered'),
+# and which fields were missing from the static HTML (empty if the static HTML was complete)
+FetchDecision = namedtuple('FetchDecision', ['url', 'fetcher', 'missing'])
+
+RENDERED_FIELDS = frozenset({'date'})   # the fields filled in by JavaScript (the 'time' tags)
+
+
+#%%
+def fetch_hybrid(url, fetch_static, fetch_rendered, report=None, rendered_fields=RENDERED_FIELDS):
+    """Returns the HTML of url, fetched by fetch_static(url) or, if that page misses some of the rendered_fields,
+    by fetch_rendered(url). The FetchDecision made for the page is passed to report(), if specified
+    (with all the fields missing from the static page, including the ones that rendering would not supply).
+    """
+
+    html = fetch_static(url)
+    soup = parsers.make_soup(html)
+    missing = missing_fields(soup, find_embedded_articles(html))
+    release_soup(soup)
+    render = bool(missing & rendered_fields)
+    if render:
+        html = fetch_rendered(url)
+    if report:
+        report(FetchDecision(url, 'rendered' if render else 'static', frozenset(missing)))
+    return html
@@ -0,0 +1,101 @@
+"""Bounded memory for long crawls.
+A BeautifulSoup tree takes several times the memory of its HTML text, and since its tags refer to each other
+(parent, children, siblings), an unreferenced tree is only freed by the cyclic garbage collector, i.e. some time later;
+so, the extraction functions decompose the trees as soon as the records are extracted (see release_soup()),
+and only the compact tuples live on.
+MemoryBudget applies backpressure to the page fetching of music.crawl_engine: pages are scheduled for fetching ahead
+of the consumer only while the estimated memory of the pages in flight (fetched or being fetched, but not consumed
+yet, as HTML texts and then as soups) fits in the budget, and, optionally, while the RSS of the process
+is below a limit.
+"""
+
+
+#%%
+# Setup / Data
+
+import gc
+import os
+import threading
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_SOUP_FACTOR = 10                # a soup takes about this many times the memory of its HTML text
+DEFAULT_PAGE_BYTES = 512 * 1024         # the estimated size of a page before any page has been seen
+
+
+#%%
+def current_rss():
+    """Returns the current resident set size of the process in bytes, or None if it cannot be measured
+    (it is read from /proc/self/statm, so it is only available on Linux).
+    """
+
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+#%%
+def release_soup(soup):
+    """Destroys the tree of soup (a BeautifulSoup object or a tag) recursively, so that its memory is freed right away
+    instead of at the next cyclic garbage collection. soup must not be used afterwards.
+    """
+
+    if soup is not None:
+        soup.decompose()
+
+
+#%%
+class MemoryBudget:
+    """The class describing the memory budget of the pages in flight of a crawl.
+    Parameters:
+    - max_bytes: the max estimated memory of the pages in flight (at least one page is always allowed)
+    - soup_factor: the memory of a page in flight is estimated as soup_factor times the size of its HTML text
+    - max_rss: if specified, no more pages are scheduled while the RSS of the process exceeds max_rss bytes
+    Fields: page_bytes (the running average size of the pages' HTML), peak_in_flight (the max number of pages
+    in flight allowed), and throttled (the number of times a page was not scheduled because of the budget).
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, soup_factor=DEFAULT_SOUP_FACTOR, max_rss=None):
+        self.max_bytes = max_bytes
+        self.soup_factor = soup_factor
+        self.max_rss = max_rss
+        self.page_bytes = None
+        self.peak_in_flight = 0
+        self.throttled = 0
+        self.__lock = threading.Lock()
+
+    def __str__(self):
+        return f'MemoryBudget(max_bytes={self.max_bytes}, page_bytes={self.page_bytes}, ' \
+               f'peak_in_flight={self.peak_in_flight}, throttled={self.throttled})'
+
+    def record(self, html):
+        """Takes the size of a fetched page (its HTML text) into account; called by the fetching threads.
+        """
+
+        with self.__lock:
+            size = len(html)
+            self.page_bytes = size if self.page_bytes is None else 0.9 * self.page_bytes + 0.1 * size
+
+    def page_cost(self):
+        """Returns the estimated memory of a page in flight, in bytes.
+        """
+
+        return (self.page_bytes or DEFAULT_PAGE_BYTES) * self.soup_factor
+
+    def admit(self, in_flight):
+        """Returns True if in_flight pages (including the one to schedule) fit in the budget.
+        """
+
+        fits = in_flight * self.page_cost() <= self.max_bytes
+        if fits and self.max_rss is not None:
+            rss = current_rss()
+            if rss is not None and rss > self.max_rss:
+                gc.collect()                    # the trees that were not released, e.g. the soups kept by a consumer
+                rss = current_rss()
+                fits = rss is None or rss <= self.max_rss
+        if fits:
+            self.peak_in_flight = max(self.peak_in_flight, in_flight)
+        else:
+            self.throttled += 1
+        return fits
@@ -0,0 +1,263 @@
+"""Near-duplicate detection of the article records, while they are streamed from the crawl to the storage.
+The search results shift while they are crawled, and syndicated articles are listed more than once, so the same
+article shows up on adjacent pages with tracking parameters in its URL, slightly different titles
+('Paul McCartney Turns 80' and 'Paul McCartney turns 80!') or image URLs. Such records are recognized by their
+canonical URLs, and by the SimHash of their titles and authors: a 64-bit fingerprint whose Hamming distance
+to that of a similar text is small (0 for a change of case or punctuation, a few bits for a small edit),
+and about 32 bits to that of an unrelated one.
+Templated headlines of distinct articles are just as close ('Paul McCartney Turns 80' and '... Turns 81' are 3 bits
+apart), so the fingerprints alone are not trusted: two records with different canonical URLs are near duplicates
+only if their fingerprints are close and their authors and dates agree (or, if a date is unknown, their image URLs).
+The fingerprints seen so far are in a banded index: a fingerprint is split into bands, and the records are
+looked up by the values of their bands (and the values within a small Hamming radius of them); two fingerprints
+within max_distance bits of each other always share a band up to that radius (pigeonhole principle), so
+a lookup finds all of them while comparing only the few records in the matching buckets, instead of all the records.
+SimHash: https://en.wikipedia.org/wiki/SimHash, M. S. Charikar, Similarity estimation techniques from rounding
+algorithms (2002); G. S. Manku et al., Detecting near-duplicates for web crawling (2007)
+"""
+
+
+#%%
+# Setup / Data
+
+import hashlib
+import math
+import re
+from itertools import combinations
+
+from music.urls import canonicalize_url
+
+FINGERPRINT_BITS = 64
+DEFAULT_MAX_DISTANCE = 10               # a word added to or changed in a title: 6-9 bits; unrelated titles: ~32 bits
+DEFAULT_BANDS = 4
+SHINGLE_SIZE = 3                        # the features of a text are its character 3-grams
+
+_WORD = re.compile(r'\w+')
+
+
+#%%
+def normalize_text(text):
+    """Returns text in lower case, with the words separated by single spaces, and without punctuation
+    (so, 'Revisits "Jet"!' and 'revisits Jet' are the same text).
+    """
+
+    return ' '.join(_WORD.findall((text or '').lower()))
+
+
+#%%
+def simhash(text, shingle_size=SHINGLE_SIZE):
+    """Returns the 64-bit SimHash (an int) of text: bit i is 1 if most of the features of text (its distinct
+    character shingles, after normalize_text()) have bit i set in their hashes.
+    """
+
+    text = normalize_text(text)
+    features = {text[i:i + shingle_size] for i in range(max(1, len(text) - shingle_size + 1))}
+    # the bits of the feature hashes as strings of '0'/'1' (bit 63 first), so that the columns are counted in C
+    hashes = [f'{int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little"):064b}'
+              for feature in features]
+    majority = len(hashes) / 2
+    return int(''.join('1' if column.count('1') > majority else '0' for column in zip(*hashes)), 2)
+
+
+#%%
+def hamming_distance(fingerprint, other):
+    return bin(fingerprint ^ other).count('1')
+
+
+#%%
+def article_text(record):
+    """Returns the text whose SimHash identifies an article record: its title and author. The record is
+    a (title, author, date, image_url) or a (url, title, author, date, image_url) tuple (see music.extract).
+    """
+
+    title, author = record[-4], record[-3]
+    return f'{title} | {author}'
+
+
+#%%
+def article_url(record):
+    """Returns the canonical URL of an article record (see article_text()), or None if it has no URL.
+    """
+
+    return canonicalize_url(record[0]) if len(record) > 4 and record[0] else None
+
+
+#%%
+def same_article(record, other):
+    """Returns True if the near-duplicate records (with close fingerprints) can be the same article:
+    if they have the same canonical URL; otherwise, if their authors agree (or one is unknown), and their dates agree,
+    or, if a date is unknown, their image URLs do (so, 'Turns 80' and 'Turns 81' of different years are different
+    articles, and so are two unrelated articles of the same day that are listed without dates).
+    """
+
+    url, other_url = article_url(record), article_url(other)
+    if url is not None and url == other_url:
+        return True
+    author, other_author = normalize_text(record[-3]), normalize_text(other[-3])
+    if author and other_author and author != other_author:
+        return False
+    date, other_date = normalize_text(record[-2]), normalize_text(other[-2])
+    if date and other_date:
+        return date == other_date
+    return bool(record[-1]) and record[-1] == other[-1]
+
+
+#%%
+class SimHashIndex:
+    """The class describing a banded index of SimHash fingerprints, for finding the fingerprints within
+    max_distance bits of a given one (see the module docstring).
+    The fingerprint is split into bands (of about 64 / bands bits each); every value is stored in one bucket per band,
+    and a lookup probes, in every band, the buckets of all the values within radius bits of the band's value,
+    where radius is the smallest one that guarantees finding all the fingerprints within max_distance bits.
+    More bands (or a greater max_distance) mean narrower buckets or more probes per lookup, i.e. more candidates
+    to compare; the defaults (4 bands of 16 bits, radius 2) compare about 1% of the fingerprints per lookup.
+    """
+
+    def __init__(self, max_distance=DEFAULT_MAX_DISTANCE, bands=DEFAULT_BANDS):
+        self.max_distance = max_distance
+        self.bands = max(1, bands)
+        self.radius = math.ceil((max_distance + 1) / self.bands) - 1
+        width, extra = divmod(FINGERPRINT_BITS, self.bands)
+        self.__bands = []                   # (shift, mask, probe masks) of each band
+        shift = 0
+        for band in range(self.bands):
+            band_width = width + (band < extra)
+            probes = [sum(1 << bit for bit in bits)
+                      for r in range(self.radius + 1) for bits in combinations(range(band_width), r)]
+            self.__bands.append((shift, (1 << band_width) - 1, probes))
+            shift += band_width
+        self.__buckets = [{} for _ in range(self.bands)]        # band value -> list of (fingerprint, item)
+        self.__size = 0
+
+    def __str__(self):
+        return f'SimHashIndex(max_distance={self.max_distance}, bands={self.bands}, radius={self.radius}, ' \
+               f'{len(self)} fingerprint(s))'
+
+    def __len__(self):
+        return self.__size
+
+    def add(self, fingerprint, item):
+        """Stores item (anything) under fingerprint.
+        """
+
+        for (shift, mask, _), buckets in zip(self.__bands, self.__buckets):
+            buckets.setdefault(fingerprint >> shift & mask, []).append((fingerprint, item))
+        self.__size += 1
+
+    def find(self, fingerprint, accept=None):
+        """Returns the item stored under the fingerprint nearest to fingerprint, if it is within max_distance bits,
+        or None. If accept is specified, only the items for which accept(item) returns True are considered.
+        """
+
+        best, best_distance = None, self.max_distance + 1
+        for (shift, mask, probes), buckets in zip(self.__bands, self.__buckets):
+            value = fingerprint >> shift & mask
+            for probe in probes:
+                for candidate, item in buckets.get(value ^ probe, ()):
+                    distance = hamming_distance(fingerprint, candidate)
+                    if distance < best_distance and (accept is None or accept(item)):
+                        if distance == 0:
+                            return item
+                        best, best_distance = item, distance
+        return best
+
+
+#%%
+class NearDuplicateFilter:
+    """The class describing a streaming near-duplicate filter of article records (see article_text()).
+    A record with the canonical URL of a record seen before is a duplicate of it; a record whose SimHash is within
+    max_distance bits of that of a record seen before is a near duplicate of it, if they can be the same article
+    (see same_article()); a record with an empty title is never considered a duplicate. Parameters:
+    - max_distance, bands: as in SimHashIndex
+    - merge: if True, the empty fields of a record seen before (e.g. a date missing from one page)
+      are filled from its near duplicates
+    Fields: the numbers of records seen, of duplicates, and of the records updated by merging (merged).
+    """
+
+    def __init__(self, max_distance=DEFAULT_MAX_DISTANCE, bands=DEFAULT_BANDS, merge=True):
+        self.merge = merge
+        self.seen = 0
+        self.duplicates = 0
+        self.merged = 0
+        self.__index = SimHashIndex(max_distance, bands)
+        self.__records = []                 # the records kept, by their numbers in the index
+        self.__urls = {}                    # canonical URL -> the number of its record
+
+    def __str__(self):
+        return f'NearDuplicateFilter(seen={self.seen}, duplicates={self.duplicates}, merged={self.merged})'
+
+    def check(self, record):
+        """Returns (is_new, record): (True, record) for a new record (which is stored in the filter);
+        (False, the updated original record) for a near duplicate that filled some fields of its original
+        (if merge is True); and (False, None) for any other near duplicate, which is dropped.
+        """
+
+        self.seen += 1
+        text = article_text(record)
+        if not normalize_text(record[-4]):
+            return True, record
+        url = article_url(record)
+        number = self.__urls.get(url) if url is not None else None
+        if number is None:
+            fingerprint = simhash(text)
+            number = self.__index.find(fingerprint, lambda number: same_article(record, self.__records[number]))
+            if number is None:
+                number = len(self.__records)
+                self.__index.add(fingerprint, number)
+                self.__records.append(record)
+                if url is not None:
+                    self.__urls[url] = number
+                return True, record
+            if url is not None:
+                self.__urls.setdefault(url, number)
+
+        self.duplicates += 1
+        original = self.__records[number]
+        if not self.merge:
+            return False, None
+        updated = tuple(value if value not in ('', None) else other
+                        for value, other in zip(original, record))
+        if updated == original:
+            return False, None
+        self.__records[number] = updated
+        self.merged += 1
+        return False, updated
+
+    def filter_page(self, records):
+        """Returns (the new records, the updated original records) of a page of records (see check());
+        the new ones go downstream, and the updated ones (typically, of earlier pages) replace their stored versions.
+        """
+
+        new_records, updated_records = [], []
+        for record in records:
+            is_new, record = self.check(record)
+            if is_new:
+                new_records.append(record)
+            elif record is not None:
+                updated_records.append(record)
+        return new_records, updated_records
+
+    def filter(self, records):
+        """Generator that yields the records that are not near duplicates of records seen before.
+        """
+
+        for record in records:
+            is_new, record = self.check(record)
+            if is_new:
+                yield record
+
+
+#%%
+if __name__ == '__main__':
+
+    # Test simhash(text) and NearDuplicateFilter on variations of a record
+    original = ('/a', 'Paul McCartney Turns 80', 'Nick DeRiso', '', '/a.jpg')
+    variations = [('/a2', 'Paul McCartney turns 80!', 'Nick DeRiso', 'June 18, 2022', '/a.jpg'),
+                  ('/a?utm_source=feed', 'Paul McCartney Turns 80 (Updated)', 'Nick DeRiso', 'June 18, 2022', '/c.jpg'),
+                  ('/d', 'Paul McCartney Turns 81', 'Nick DeRiso', 'June 18, 2023', '/d.jpg'),
+                  ('/e', 'The Story Behind \'Hey Jude\'', 'Nick DeRiso', 'June 17, 2022', '/e.jpg')]
+    for variation in variations:
+        print(hamming_distance(simhash(article_text(original)), simhash(article_text(variation))), variation)
+    near_duplicate_filter = NearDuplicateFilter()
+    print(near_duplicate_filter.filter_page([original] + variations))
+    print(near_duplicate_filter)
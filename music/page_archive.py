@@ -0,0 +1,221 @@
+"""An append-only, compressed archive of the raw HTML of all the pages fetched by the crawl module.
+Unlike DATA_DIR / 'soup.html', which is overwritten by every fetch, the archive keeps every version of every page,
+so the articles can be extracted again (e.g. after a change of the extraction logic) without any network access.
+The archive (by default, in DATA_DIR / 'archive') consists of two files:
+- pages.warc.gz: WARC records (the URL, the timestamp, and the HTTP status line, headers and body of the response;
+  'resource' records for the pages rendered by selenium), each one compressed as a separate gzip member,
+  so any record can be decompressed on its own (and the file can be read by WARC tools as well)
+- pages.idx: the offset index, with a fixed-size entry (URL fingerprint, offset, length) per record
+The archive file is memory-mapped for reading, so a page is read by slicing the map at the offset from the index.
+The records are appended before their index entries, so after a crash, the missing entries are recovered on opening.
+WARC format: https://iipc.github.io/warc-specifications/specifications/warc-format/warc-1.1/
+"""
+
+
+#%%
+# Setup / Data
+
+import gzip
+import mmap
+import struct
+import threading
+import uuid
+import zlib
+from collections import namedtuple
+from datetime import datetime, timezone
+from http import HTTPStatus
+from pathlib import Path
+
+from music.urls import canonicalize_url, url_fingerprint
+from settings import *
+
+DEFAULT_ARCHIVE_DIR = DATA_DIR / 'archive'
+
+# A page read from the archive; fetcher is 'static' (an HTTP response) or 'rendered' (the page source from selenium)
+ArchivedPage = namedtuple('ArchivedPage', ['url', 'timestamp', 'status', 'headers', 'html', 'fetcher'])
+
+_INDEX_ENTRY = struct.Struct('<qQQ')            # URL fingerprint, offset and length of the compressed record
+
+# Headers that describe the transfer rather than the (already decoded) body, so they are not stored
+_TRANSFER_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection', 'keep-alive'}
+
+
+#%%
+def make_record(url, html, status=200, headers=None, timestamp=None, fetcher='static'):
+    """Returns the uncompressed WARC record (bytes) of the page at url with the HTML text html.
+    For a static page, the record is a 'response' with the HTTP status and headers; for a rendered one, a 'resource'.
+    """
+
+    body = html.encode('utf-8')
+    timestamp = timestamp or datetime.now(timezone.utc)
+    if fetcher == 'rendered':
+        record_type, content_type, block = 'resource', 'text/html; charset=utf-8', body
+    else:
+        try:
+            reason = HTTPStatus(status).phrase
+        except ValueError:
+            reason = ''
+        http_headers = [(name, value) for name, value in (headers or {}).items()
+                        if name.lower() not in _TRANSFER_HEADERS]
+        http_headers.append(('Content-Length', str(len(body))))
+        head = f'HTTP/1.1 {status} {reason}\r\n' + ''.join(f'{name}: {value}\r\n' for name, value in http_headers)
+        record_type, content_type = 'response', 'application/http; msgtype=response'
+        block = head.encode('utf-8') + b'\r\n' + body
+    warc_head = (f'WARC/1.1\r\n'
+                 f'WARC-Type: {record_type}\r\n'
+                 f'WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>\r\n'
+                 f'WARC-Date: {timestamp.strftime("%Y-%m-%dT%H:%M:%SZ")}\r\n'
+                 f'WARC-Target-URI: {url}\r\n'
+                 f'Content-Type: {content_type}\r\n'
+                 f'Content-Length: {len(block)}\r\n'
+                 f'\r\n')
+    return warc_head.encode('utf-8') + block + b'\r\n\r\n'
+
+
+#%%
+def parse_record(record):
+    """Returns the ArchivedPage from the uncompressed WARC record (bytes) made by make_record().
+    """
+
+    warc_head, _, rest = record.partition(b'\r\n\r\n')
+    fields = dict(line.split(': ', 1) for line in warc_head.decode('utf-8').split('\r\n')[1:])
+    block = rest[:int(fields['Content-Length'])]
+    timestamp = datetime.strptime(fields['WARC-Date'], '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+    if fields['WARC-Type'] == 'resource':
+        return ArchivedPage(fields['WARC-Target-URI'], timestamp, 200, {}, block.decode('utf-8'), 'rendered')
+
+    http_head, _, body = block.partition(b'\r\n\r\n')
+    status_line, *header_lines = http_head.decode('utf-8').split('\r\n')
+    headers = dict(line.split(': ', 1) for line in header_lines if line)
+    return ArchivedPage(fields['WARC-Target-URI'], timestamp, int(status_line.split(' ')[1]), headers,
+                        body.decode('utf-8'), 'static')
+
+
+#%%
+class PageArchive:
+    """The class describing the page archive in the directory path (see the module docstring).
+    The URLs are looked up by their canonical forms (music.urls.canonicalize_url()); get() returns the latest
+    version of a page, and history() all of them. The index is kept in memory as a dict
+    (a few dozen bytes per URL); the pages themselves are read from the memory-mapped archive file on demand.
+    It can be shared by the fetching threads of a crawl (but not by several processes writing at once).
+    """
+
+    def __init__(self, path=DEFAULT_ARCHIVE_DIR):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.archive_file = self.path / 'pages.warc.gz'
+        self.index_file = self.path / 'pages.idx'
+        self.__lock = threading.Lock()
+        self.__index = {}                       # URL fingerprint -> the list of (offset, length) of its records
+        self.__map = None
+        self.__archive = open(self.archive_file, 'ab')
+        self.__index_out = open(self.index_file, 'ab')
+        self.__load_index()
+
+    def __str__(self):
+        return f'PageArchive({self.path}, {len(self)} record(s) of {len(self.__index)} URL(s))'
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.__index.values())
+
+    def __contains__(self, url):
+        return url_fingerprint(canonicalize_url(url)) in self.__index
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __load_index(self):
+        # read the index, drop a torn last entry, and index the records appended after the last indexed one
+        data = self.index_file.read_bytes()
+        end = 0
+        for fingerprint, offset, length in _INDEX_ENTRY.iter_unpack(data[:len(data) - len(data) % _INDEX_ENTRY.size]):
+            self.__index.setdefault(fingerprint, []).append((offset, length))
+            end = max(end, offset + length)
+        if len(data) % _INDEX_ENTRY.size:
+            self.__index_out.truncate(len(data) - len(data) % _INDEX_ENTRY.size)
+        self.__recover(end)
+
+    def __recover(self, offset):
+        with open(self.archive_file, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        while data:
+            decompressor = zlib.decompressobj(wbits=31)         # a single gzip member
+            try:
+                record = decompressor.decompress(data)
+            except zlib.error:
+                break
+            if not decompressor.eof:
+                break                                           # a torn last record; it is overwritten
+            length = len(data) - len(decompressor.unused_data)
+            self.__add_to_index(parse_record(record).url, offset, length)
+            offset, data = offset + length, decompressor.unused_data
+        self.__archive.truncate(offset)
+
+    def __add_to_index(self, url, offset, length):
+        fingerprint = url_fingerprint(canonicalize_url(url))
+        self.__index_out.write(_INDEX_ENTRY.pack(fingerprint, offset, length))
+        self.__index_out.flush()
+        self.__index.setdefault(fingerprint, []).append((offset, length))
+
+    def append(self, url, html, status=200, headers=None, timestamp=None, fetcher='static'):
+        """Appends the page at url with the HTML text html (see make_record() for the other parameters).
+        """
+
+        compressed = gzip.compress(make_record(url, html, status, headers, timestamp, fetcher))
+        with self.__lock:
+            offset = self.__archive.seek(0, 2)
+            self.__archive.write(compressed)
+            self.__archive.flush()
+            self.__add_to_index(url, offset, len(compressed))
+
+    def __read(self, offset, length):
+        with self.__lock:
+            if self.__map is None or offset + length > len(self.__map):
+                # the map does not grow with the file, so the grown file is mapped again
+                if self.__map is not None:
+                    self.__map.close()
+                with open(self.archive_file, 'rb') as f:
+                    self.__map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            compressed = self.__map[offset:offset + length]
+        return parse_record(gzip.decompress(compressed))
+
+    def get(self, url):
+        """Returns the latest ArchivedPage of url, or None if url has not been archived.
+        """
+
+        entries = self.__index.get(url_fingerprint(canonicalize_url(url)))
+        return self.__read(*entries[-1]) if entries else None
+
+    def history(self, url):
+        """Returns the list of all the archived versions (ArchivedPage) of url, oldest first.
+        """
+
+        return [self.__read(*entry) for entry in self.__index.get(url_fingerprint(canonicalize_url(url)), [])]
+
+    def close(self):
+        with self.__lock:
+            if self.__map is not None:
+                self.__map.close()
+                self.__map = None
+            self.__archive.close()
+            self.__index_out.close()
+
+
+#%%
+if __name__ == '__main__':
+
+    import tempfile
+
+    # Test PageArchive(path): two versions of a page, the second one rendered
+    with tempfile.TemporaryDirectory() as archive_dir:
+        with PageArchive(archive_dir) as archive:
+            url = 'https://ultimateclassicrock.com/search/?s=paul%20mccartney'
+            archive.append(url, '<html><body>1</body></html>', headers={'Content-Type': 'text/html'})
+            archive.append(url + '&searchpage=1', '<html><body>2</body></html>', fetcher='rendered')
+            print(archive)
+            print(archive.get(url))
+            print([page.html for page in archive.history(url)])
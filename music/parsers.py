@@ -0,0 +1,97 @@
+"""Selectable HTML parser backends for the crawl module.
+BeautifulSoup can build its tree with different underlying parsers ('html.parser', 'lxml', 'html5lib');
+'selectolax' is a much faster parser that is not a BeautifulSoup backend, so it is used through an adapter
+at the extraction level (see music.extract.extract_article_info_from_html()).
+A backend that is not installed falls back automatically to the next one in FALLBACKS.
+Differences between the parsers: https://www.crummy.com/software/BeautifulSoup/bs4/doc/#differences-between-parsers
+"""
+
+
+#%%
+# Setup / Data
+
+import importlib.util
+import warnings
+
+from bs4 import BeautifulSoup
+
+# backend name -> the module that must be installed for it
+BACKENDS = {
+    'html.parser': None,                        # Python's built-in parser, always available
+    'lxml': 'lxml',
+    'html5lib': 'html5lib',
+    'selectolax': 'selectolax',
+}
+BS4_BACKENDS = ('html.parser', 'lxml', 'html5lib')
+FALLBACKS = {'selectolax': 'lxml', 'lxml': 'html.parser', 'html5lib': 'html.parser'}
+DEFAULT_BACKEND = 'html.parser'
+
+_backend = DEFAULT_BACKEND
+
+
+#%%
+class ParserBackendError(Exception):
+    """Raised when an unknown parser backend is requested.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __str__(self):
+        return f'Unknown parser backend: {self.name} (choose from {", ".join(BACKENDS)})'
+
+
+#%%
+def is_available(name):
+    """Returns True if the parser backend is installed.
+    """
+
+    if name not in BACKENDS:
+        raise ParserBackendError(name)
+    return BACKENDS[name] is None or importlib.util.find_spec(BACKENDS[name]) is not None
+
+
+#%%
+def resolve(name=None):
+    """Returns the name of the backend to actually use for name (by default, the backend set by set_backend()):
+    name itself if it is installed, otherwise the first installed backend in its FALLBACKS chain.
+    """
+
+    name = name or _backend
+    resolved = name
+    while not is_available(resolved):
+        resolved = FALLBACKS[resolved]
+    if resolved != name:
+        warnings.warn(f'Parser backend {name} is not installed, using {resolved} instead.', stacklevel=2)
+    return resolved
+
+
+#%%
+def set_backend(name):
+    """Selects the parser backend for the whole crawl module and returns the backend that will actually be used.
+    """
+
+    global _backend
+    resolved = resolve(name)
+    _backend = resolved
+    return resolved
+
+
+#%%
+def get_backend():
+    """Returns the name of the selected parser backend.
+    """
+
+    return _backend
+
+
+#%%
+def make_soup(html, name=None) -> BeautifulSoup:
+    """Returns the BeautifulSoup object of html, built with the backend name (by default, the selected backend).
+    If the backend is not a BeautifulSoup backend (i.e. selectolax), its first BeautifulSoup fallback is used.
+    """
+
+    name = resolve(name)
+    while name not in BS4_BACKENDS:
+        name = resolve(FALLBACKS[name])
+    return BeautifulSoup(html, features=name)
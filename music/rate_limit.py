@@ -0,0 +1,236 @@
+"""Adaptive, per-host rate limiting for the crawl fetchers.
+Every host gets a token bucket (a max sustained request rate, with bursts) and an AIMD concurrency limit:
+the number of requests in flight grows additively while the host answers quickly and successfully,
+and is cut multiplicatively on 429/503 responses or when the latency climbs well above its baseline.
+Retry-After headers pause the host's bucket, and throttled requests are retried after the pause.
+This keeps the crawl at about the highest throughput a host tolerates, without tripping its limits
+(some sites block IP addresses of crawlers that are too aggressive, see the leftovers in music/crawl.py).
+AIMD: https://en.wikipedia.org/wiki/Additive_increase/multiplicative_decrease
+"""
+
+
+#%%
+# Setup / Data
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+THROTTLE_STATUSES = (429, 503)
+DEFAULT_RATE = 5.0                      # requests per second
+DEFAULT_BURST = 10
+DEFAULT_INITIAL_CONCURRENCY = 2
+DEFAULT_MAX_CONCURRENCY = 32
+DEFAULT_BACKOFF = 1.0                   # seconds to pause a host after a throttling response without Retry-After
+DEFAULT_RETRIES = 3
+DEFAULT_MAX_PAUSE = 300.0               # the longest pause a Retry-After header can impose on a host, in seconds
+
+
+#%%
+def parse_retry_after(value, now=None, max_pause=DEFAULT_MAX_PAUSE):
+    """Returns the number of seconds to wait according to a Retry-After header value
+    (either a number of seconds or an HTTP date), at most max_pause, or None if the value is missing or invalid
+    (including 'inf' and 'nan', which float() accepts).
+    """
+
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - (now or time.time())
+        except (TypeError, ValueError, OverflowError):
+            return None
+    if not math.isfinite(seconds):
+        return None
+    return min(max_pause, max(0.0, seconds))
+
+
+#%%
+class TokenBucket:
+    """The class describing a thread-safe token bucket: up to burst requests at once, rate requests/s on average.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.__tokens = float(burst)
+        self.__updated = time.monotonic()
+        self.__paused_until = 0.0
+        self.__lock = threading.Lock()
+
+    def acquire(self):
+        """Takes a token, waiting until one is available (and until the end of a pause, if any).
+        """
+
+        while True:
+            with self.__lock:
+                now = time.monotonic()
+                self.__tokens = min(self.burst, self.__tokens + (now - self.__updated) * self.rate)
+                self.__updated = now
+                wait = self.__paused_until - now
+                if wait <= 0:
+                    if self.__tokens >= 1:
+                        self.__tokens -= 1
+                        return
+                    wait = (1 - self.__tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Hands out no tokens for the next seconds (e.g. as requested by a Retry-After header).
+        """
+
+        with self.__lock:
+            self.__paused_until = max(self.__paused_until, time.monotonic() + seconds)
+            self.__tokens = 0.0
+
+
+#%%
+class AIMDLimiter:
+    """The class describing an AIMD concurrency limit for a host.
+    Parameters:
+    - initial, minimum, maximum: the initial concurrency limit and its bounds
+    - latency_factor: a response slower than latency_factor times the baseline latency signals congestion
+    - decrease: the factor the limit is multiplied by on congestion or throttling
+    """
+
+    def __init__(self, initial=DEFAULT_INITIAL_CONCURRENCY, minimum=1, maximum=DEFAULT_MAX_CONCURRENCY,
+                 latency_factor=2.0, decrease=0.5):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_factor = latency_factor
+        self.decrease = decrease
+        self.in_flight = 0
+        self.baseline = None                    # the lowest smoothed latency seen so far
+        self.latency = None                     # exponentially weighted moving average of the latency
+        self.__last_decrease = 0.0
+        self.__condition = threading.Condition()
+
+    def __str__(self):
+        return f'AIMDLimiter(limit={self.limit:.1f}, in_flight={self.in_flight}, latency={self.latency})'
+
+    def acquire(self):
+        """Waits until fewer than limit requests are in flight, then counts one more.
+        """
+
+        with self.__condition:
+            while self.in_flight >= int(self.limit):
+                self.__condition.wait()
+            self.in_flight += 1
+
+    def release(self, latency, throttled=False):
+        """Counts a request as finished, and adapts the limit to its latency (in seconds) and outcome.
+        """
+
+        with self.__condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            self.baseline = self.latency if self.baseline is None else min(self.baseline, self.latency)
+            congested = self.latency > self.latency_factor * self.baseline
+            if throttled or congested:
+                # decrease at most once per round trip, so that a single burst of slow responses counts once
+                if now - self.__last_decrease > self.latency:
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self.__last_decrease = now
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.__condition.notify_all()
+
+
+#%%
+class RateLimiter:
+    """The class describing the per-host rate limiting layer: a TokenBucket and an AIMDLimiter for each host.
+    Parameters: the arguments for the token buckets (rate, burst) and for the AIMD limiters (initial, maximum),
+    the pause after a throttling response without Retry-After (backoff), the longest pause a Retry-After can impose
+    (max_pause), and the number of retries of throttled requests.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, initial=DEFAULT_INITIAL_CONCURRENCY,
+                 maximum=DEFAULT_MAX_CONCURRENCY, backoff=DEFAULT_BACKOFF, retries=DEFAULT_RETRIES,
+                 max_pause=DEFAULT_MAX_PAUSE):
+        self.rate = rate
+        self.burst = burst
+        self.initial = initial
+        self.maximum = maximum
+        self.backoff = backoff
+        self.retries = retries
+        self.max_pause = max_pause
+        self.buckets = {}
+        self.limiters = {}
+        self.__lock = threading.Lock()
+
+    def __str__(self):
+        return f'RateLimiter({", ".join(f"{host}: {limiter}" for host, limiter in self.limiters.items())})'
+
+    def host(self, url):
+        """Returns the (TokenBucket, AIMDLimiter) pair of the host of url, creating it on first use.
+        """
+
+        host = urlsplit(url).netloc.lower()
+        with self.__lock:
+            if host not in self.limiters:
+                self.buckets[host] = TokenBucket(self.rate, self.burst)
+                self.limiters[host] = AIMDLimiter(self.initial, maximum=self.maximum)
+            return self.buckets[host], self.limiters[host]
+
+    @contextmanager
+    def slot(self, url):
+        """Context manager that waits for a request slot for url (concurrency limit and token), and yields a
+        function that must be called with the response status (None if unknown) and the Retry-After value, if any.
+        """
+
+        bucket, limiter = self.host(url)
+        limiter.acquire()
+        bucket.acquire()
+        outcome = {'status': None, 'retry_after': None, 'failed': False}
+        start = time.monotonic()
+        try:
+            yield lambda status, retry_after=None: outcome.update(status=status, retry_after=retry_after)
+        except BaseException:
+            outcome['failed'] = True            # e.g. a timeout or a refused connection: back off as well
+            raise
+        finally:
+            throttled = outcome['status'] in THROTTLE_STATUSES
+            if throttled:
+                pause = parse_retry_after(outcome['retry_after'], max_pause=self.max_pause)
+                bucket.pause(self.backoff if pause is None else pause)
+            limiter.release(time.monotonic() - start, throttled or outcome['failed'])
+
+    def call(self, url, send):
+        """Returns the result of send() (a function that sends the request for url and returns its response),
+        sent within the host's limits; throttled requests (429/503) are retried up to retries times,
+        after the pause requested by the host.
+        """
+
+        for attempt in range(self.retries + 1):
+            with self.slot(url) as record:
+                response = send()
+                status = getattr(response, 'status_code', None)
+                record(status, getattr(response, 'headers', {}).get('Retry-After'))
+            if status not in THROTTLE_STATUSES or attempt == self.retries:
+                return response
+
+    def wrap(self, session):
+        """Returns a session-like object whose get() goes through the limiter (e.g. to pass to HTTPCache.get()).
+        """
+
+        return LimitedSession(session, self)
+
+
+#%%
+class LimitedSession:
+    """A thin wrapper around a requests.Session whose get() is rate limited by a RateLimiter.
+    """
+
+    def __init__(self, session, limiter):
+        self.session = session
+        self.limiter = limiter
+
+    def get(self, url, **kwargs):
+        return self.limiter.call(url, lambda: self.session.get(url, **kwargs))
@@ -0,0 +1,94 @@
+"""Streaming sinks for the article records produced by the crawl module.
+CSVSink appends the records to a CSV file in batches while the crawl is still running,
+so neither the time to the first written record nor the memory depend on the number of pages crawled.
+"""
+
+
+#%%
+# Setup / Data
+
+import csv
+from pathlib import Path
+
+from settings import *
+
+CSV_HEADER = ['Title', 'Author', 'Date', 'Featured image']
+DEFAULT_CSV_FILE = DATA_DIR / 'articles.csv'
+DEFAULT_BATCH_SIZE = 100
+
+
+#%%
+class CSVSink:
+    """The class describing a CSV file that article records are appended to in batches.
+    Parameters:
+    - csv_file: the CSV file; the header row is written if the file is new or empty
+    - batch_size: the max number of records buffered in memory before they are written (and flushed) to the file
+    - append: if False, the file is truncated first
+    Use it as a context manager, so that the buffered records are written when the block ends:
+        with CSVSink(csv_file) as sink:
+            for record in records:
+                sink.write(record)
+    """
+
+    def __init__(self, csv_file=DEFAULT_CSV_FILE, batch_size=DEFAULT_BATCH_SIZE, append=True, header=CSV_HEADER):
+        self.csv_file = Path(csv_file)
+        self.batch_size = max(1, batch_size)
+        self.count = 0
+        self.__buffer = []
+        self.csv_file.parent.mkdir(parents=True, exist_ok=True)
+        new = not append or not self.csv_file.exists() or self.csv_file.stat().st_size == 0
+        # newline: avoid blank rows; encoding: enable ш,š...
+        self.__file = open(self.csv_file, 'w' if not append else 'a', newline='', encoding='utf-8')
+        self.__writer = csv.writer(self.__file)
+        if new and header:
+            self.__writer.writerow(header)
+            self.__file.flush()
+
+    def __str__(self):
+        return f'CSVSink({self.csv_file}, {self.count} record(s) written, {len(self.__buffer)} buffered)'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, record):
+        """Buffers a record; the buffer is written to the file when it reaches batch_size records.
+        """
+
+        self.__buffer.append(record)
+        if len(self.__buffer) >= self.batch_size:
+            self.flush()
+
+    def write_many(self, records):
+        """Buffers all the records (an iterable, e.g. a generator), writing them in batches.
+        """
+
+        for record in records:
+            self.write(record)
+
+    def flush(self):
+        """Writes the buffered records to the file.
+        """
+
+        self.__writer.writerows(self.__buffer)
+        self.count += len(self.__buffer)
+        self.__buffer.clear()
+        self.__file.flush()
+
+    def close(self):
+        if not self.__file.closed:
+            self.flush()
+            self.__file.close()
+
+
+#%%
+def write_csv_stream(records, csv_file=DEFAULT_CSV_FILE, batch_size=DEFAULT_BATCH_SIZE, append=True):
+    """Writes the records (an iterable, e.g. a generator) to csv_file as they come, in batches of batch_size.
+    Returns the number of records written.
+    """
+
+    with CSVSink(csv_file, batch_size, append) as sink:
+        sink.write_many(records)
+    return sink.count
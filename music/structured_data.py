@@ -0,0 +1,182 @@
+"""Article data embedded in the static HTML of search-result pages.
+The dates of the search results are filled in the 'time' tags by JavaScript, which is why they are missing from
+the pages fetched with plain requests; but pages like these usually ship the same data for the scripts, search engines
+and social media to read: JSON-LD (schema.org Article items), inline script payloads (the JSON state the scripts render
+from, e.g. window.__INITIAL_STATE__ = {...}), and data-* / datetime attributes of the tags (see music.extract).
+find_embedded_articles() collects the dates and authors from the scripts of a page, so music.extract can complete
+the records without rendering the page in a browser.
+JSON-LD: https://json-ld.org/, schema.org Article: https://schema.org/Article
+"""
+
+
+#%%
+# Setup / Data
+
+import json
+import re
+from datetime import date
+from urllib.parse import urlsplit
+
+# The keys of the date, the author, the URL and the title of an article in the embedded payloads, in order of preference
+DATE_KEYS = ('datePublished', 'dateCreated', 'publishedAt', 'published', 'pubDate', 'date')
+AUTHOR_KEYS = ('author', 'creator', 'byline', 'authorName')
+URL_KEYS = ('url', 'link', 'href', 'mainEntityOfPage', '@id')
+TITLE_KEYS = ('headline', 'title', 'name')
+
+# The data-* attributes of the tags of an article with its date and author (see music.extract.scan_article())
+DATE_ATTRIBUTES = ('data-date', 'data-published', 'data-published-date', 'data-pubdate')
+AUTHOR_ATTRIBUTES = ('data-author', 'data-author-name', 'data-byline')
+
+_SCRIPT = re.compile(r'<script\b([^>]*)>(.*?)</script\s*>', re.IGNORECASE | re.DOTALL)
+_JSON_LD = re.compile(r'''type\s*=\s*["']?application/ld\+json''', re.IGNORECASE)
+_PAYLOAD_START = re.compile(r'[=(]\s*(?=[{\[])')            # an object or array literal assigned or passed in a script
+_ISO_DATE = re.compile(r'^\s*(\d{4})-(\d{2})-(\d{2})')
+_DECODER = json.JSONDecoder()
+
+
+#%%
+def format_date(value):
+    """Returns the date in value (an ISO date or date-time, e.g. '2022-06-18T09:30:00-04:00') in the format
+    of the search-result pages ('June 18, 2022'); any other value is returned as it is (stripped), None as ''.
+    """
+
+    value = str(value or '').strip()
+    match = _ISO_DATE.match(value)
+    if not match:
+        return value
+    try:
+        day = date(*map(int, match.groups()))
+    except ValueError:
+        return value
+    return f'{day:%B} {day.day}, {day.year}'
+
+
+#%%
+def url_key(url):
+    """Returns the key by which an article URL is matched between the records and the payloads: its path,
+    without the trailing slash (the payloads often have absolute URLs where the page links are relative).
+    """
+
+    path = urlsplit(url).path.rstrip('/')
+    return ('url', path) if path else None
+
+
+#%%
+def title_key(title):
+    """Returns the key by which an article title is matched between the records and the payloads.
+    """
+
+    title = ' '.join(title.split()).casefold()
+    return ('title', title) if title else None
+
+
+#%%
+def _first(item, keys):
+    for key in keys:
+        value = item.get(key)
+        if value:
+            return value
+    return None
+
+
+def _text(value):
+    # a person/web page is a string, an object with a name/@id/url, or a list of those
+    if isinstance(value, list):
+        return ', '.join(filter(None, map(_text, value)))
+    if isinstance(value, dict):
+        return _text(_first(value, ('name', '@id', 'url')))
+    return str(value).strip() if isinstance(value, (str, int, float)) else ''
+
+
+def _iter_objects(value):
+    # all the objects (dicts) in a JSON value, depth-first, without recursion
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            yield value
+            stack.extend(reversed(list(value.values())))
+        elif isinstance(value, list):
+            stack.extend(reversed(value))
+
+
+#%%
+def iter_payloads(html):
+    """Generator that yields the JSON values embedded in the scripts of html: the JSON-LD blocks,
+    and the object/array literals in the other inline scripts that are valid JSON.
+    """
+
+    for attributes, script in _SCRIPT.findall(html):
+        if _JSON_LD.search(attributes):
+            try:
+                yield json.loads(script)
+            except ValueError:
+                pass
+            continue
+        if 'src=' in attributes.lower():
+            continue
+        position = 0
+        while True:
+            match = _PAYLOAD_START.search(script, position)
+            if not match:
+                break
+            try:
+                value, position = _DECODER.raw_decode(script, match.end())
+            except ValueError:
+                position = match.end()
+                continue
+            yield value
+
+
+#%%
+def find_embedded_articles(html):
+    """Returns {key: (author, date)} for the articles described in the payloads of html (see iter_payloads()):
+    the objects that have a URL or a title, and a date or an author. Every article is under its URL key
+    and its title key (see url_key() and title_key()); the dates are in the format of the search-result pages,
+    and an unknown author or date is ''.
+    """
+
+    articles = {}
+    for payload in iter_payloads(html):
+        for item in _iter_objects(payload):
+            article_date = format_date(_text(_first(item, DATE_KEYS)))
+            article_author = _text(_first(item, AUTHOR_KEYS))
+            if not (article_date or article_author):
+                continue
+            keys = (url_key(_text(_first(item, URL_KEYS))), title_key(_text(_first(item, TITLE_KEYS))))
+            for key in filter(None, keys):
+                known_author, known_date = articles.get(key, ('', ''))
+                articles[key] = (known_author or article_author, known_date or article_date)
+    return articles
+
+
+#%%
+def complete_records(records, embedded):
+    """Returns the (url, title, author, date, image_url) records with their missing authors and dates
+    taken from embedded (from find_embedded_articles()), matched by URL first, then by title.
+    """
+
+    completed = []
+    for url, title, author, article_date, image_url in records:
+        if embedded and not (author.strip() and article_date.strip()):
+            for key in (url_key(url or ''), title_key(title)):
+                if key in embedded:
+                    embedded_author, embedded_date = embedded[key]
+                    author = author if author.strip() else embedded_author
+                    article_date = article_date if article_date.strip() else embedded_date
+                    break
+        completed.append((url, title, author, article_date, image_url))
+    return completed
+
+
+#%%
+if __name__ == '__main__':
+
+    # Test find_embedded_articles(html): a JSON-LD list of articles and an inline state payload
+    html = '''<script type="application/ld+json">{"@context": "https://schema.org", "@type": "ItemList",
+        "itemListElement": [{"@type": "ListItem", "position": 1, "item": {"@type": "NewsArticle",
+        "url": "https://ultimateclassicrock.com/paul-mccartney-80/", "headline": "Paul McCartney Turns 80",
+        "datePublished": "2022-06-18T09:30:00-04:00", "author": {"@type": "Person", "name": "Nick DeRiso"}}}]}</script>
+        <script>window.__INITIAL_STATE__ = {"posts": [{"title": "Wings Reunion", "date": "2022-06-17"}]};</script>'''
+    for key, value in find_embedded_articles(html).items():
+        print(key, value)
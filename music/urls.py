@@ -0,0 +1,94 @@
+"""URL handling for the crawl: canonicalization, page URLs of multi-page lists, and URL fingerprints.
+The URLs are parsed with urllib.parse (and their queries with parse_qsl()), not split as strings, so that
+e.g. 'https://UltimateClassicRock.com:443/search/?searchpage=1&s=paul+mccartney#top' and
+'https://ultimateclassicrock.com/search/?s=paul%20mccartney' are recognized as the same page.
+"""
+
+
+#%%
+# Setup / Data
+
+import hashlib
+from urllib.parse import parse_qsl, quote, unquote, urlencode, urlsplit, urlunsplit
+
+from music.extract import PAGE_PARAMETER
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Query parameters that only track where a visitor came from; they do not change the page
+TRACKING_PARAMETERS = {'fbclid', 'gclid', 'mc_cid', 'mc_eid', 'ref_src'}
+TRACKING_PREFIXES = ('utm_',)
+
+_PATH_SAFE = "/:@!$&'()*+,;=-._~"
+
+
+#%%
+def _encode_query(parameters):
+    # spaces as %20 (as in the search URLs of the site), not as +
+    return urlencode(parameters, quote_via=quote)
+
+
+#%%
+def canonicalize_url(url, default_page_parameter=PAGE_PARAMETER):
+    """Returns the canonical form of url, for comparing, deduplicating and storing URLs:
+    the scheme and the host in lower case, without the default port and the fragment,
+    the path with dot segments removed and with uniform percent-encoding, and the query parameters sorted,
+    uniformly encoded, and without the tracking parameters (utm_*,...) and page 1 of a multi-page list
+    (default_page_parameter=1 is the same page as no page parameter at all).
+    """
+
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').rstrip('.')
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host += f':{parts.port}'
+
+    segments = []
+    path_segments = unquote(parts.path).split('/')
+    for segment in path_segments:
+        if segment == '..':
+            if len(segments) > 1:
+                segments.pop()
+        elif segment != '.':
+            segments.append(segment)
+    if path_segments[-1] in ('.', '..'):
+        segments.append('')
+    path = quote('/'.join(segments) or '/', safe=_PATH_SAFE)
+
+    parameters = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                  if name not in TRACKING_PARAMETERS and not name.startswith(TRACKING_PREFIXES)
+                  and not (name == default_page_parameter and value == '1')]
+    return urlunsplit((scheme, host, path, _encode_query(sorted(parameters)), ''))
+
+
+#%%
+def page_url(url, page=1, page_parameter=PAGE_PARAMETER):
+    """Returns the URL of page (1-based) of the multi-page list that url belongs to (url can be the URL of any page):
+    the page parameter of the query is replaced, or removed for page 1; the other parameters are kept, in order.
+    """
+
+    parts = urlsplit(url)
+    parameters = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                  if name != page_parameter]
+    if page > 1:
+        parameters.append((page_parameter, str(page)))
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, _encode_query(parameters), parts.fragment))
+
+
+#%%
+def url_fingerprint(url):
+    """Returns a 64-bit signed integer fingerprint of url (usually, of its canonical form), e.g. to store in SQLite.
+    """
+
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+
+#%%
+if __name__ == '__main__':
+
+    start_url = 'https://ultimateclassicrock.com/search/?s=paul%20mccartney'
+
+    # Test page_url(url, page) and canonicalize_url(url)
+    print(page_url(start_url, 2))
+    print(page_url(page_url(start_url, 2), 1))
+    print(canonicalize_url('HTTPS://UltimateClassicRock.com:443/search/./?searchpage=1&s=paul+mccartney#top'))
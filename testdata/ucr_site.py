@@ -0,0 +1,369 @@
+"""A local stand-in for the Ultimate Classic Rock search, for testing and load-testing music/crawl.py offline.
+The pages are in the markup that get_article_info_list() expects (see music.extract): 'article' tags with
+an 'article-image-wrapper' div (the featured image in data-image), a 'content' div (the title link, and the author
+and the date in an 'auth-date' div), the extra, non-result 'article' tag at the end, and pagination links.
+The pages are synthesized (deterministically, from a seed), or served from recorded pages, if available.
+The title links lead to article pages (a canonical link, the body in a 'pod-content' div, and the tags).
+The server can simulate latency and jitter, server errors, and throttling (429 with Retry-After, 503).
+Usage:
+    with FixtureSite(n_pages=20, latency=0.05) as site:
+        article_info_list = ... site.start_url ...
+"""
+
+
+#%%
+# Setup / Data
+
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from datetime import date, timedelta
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, quote, urlsplit
+
+QUERY = 'paul mccartney'
+ARTICLES_PER_PAGE = 10
+NEWEST_DATE = date(2022, 6, 18)
+
+_TITLES = ['Let It Be', 'Yesterday', 'Hey Jude', 'Band on the Run', 'Maybe I\'m Amazed', 'Live and Let Die',
+           'Jet', 'Blackbird', 'Eleanor Rigby', 'Penny Lane', 'Silly Love Songs', 'Coming Up']
+_HEADLINES = ['The Story Behind \'{}\'', 'Why \'{}\' Still Matters', 'Paul McCartney Revisits \'{}\'',
+              'How \'{}\' Was Recorded', 'The Best Covers of \'{}\'', '\'{}\' Turns {}']
+_SENTENCES = ['{} was released in {}.', 'The song was written by Paul McCartney.', 'It was recorded at Abbey Road.',
+              'Critics called \'{}\' a turning point.', 'The band played it live for the first time in {}.']
+_ARTICLE_PATH = re.compile(r'^/[a-z0-9-]+-(\d+)/$')
+_AUTHORS = ['Nick DeRiso', 'Michael Gallucci', 'Bryan Wawzenek', 'Matthew Wilkening', 'Allison Rapp', 'Corey Irwin']
+
+
+#%%
+def make_article(index, query=QUERY, seed=0):
+    """Returns the dict of the article with the global index (0 = the newest one) of a synthetic search result.
+    """
+
+    rnd = random.Random(f'{seed}-{query}-{index}')
+    song = rnd.choice(_TITLES)
+    title = rnd.choice(_HEADLINES).format(song, rnd.randint(20, 60))
+    slug = '-'.join(''.join(c for c in title.lower() if c.isalnum() or c == ' ').split())
+    return {
+        'title': title,
+        'author': rnd.choice(_AUTHORS),
+        'date': NEWEST_DATE - timedelta(days=index // 2),
+        'url': f'/{slug}-{index}/',
+        'image_url': f'https://townsquare.media/site/366/files/2022/06/{slug}-{index}.jpg',
+        'body': [rnd.choice(_SENTENCES).format(song, rnd.randint(1962, 2022)) for _ in range(rnd.randint(3, 6))],
+        'tags': [song, query.title() or 'Classic Rock', rnd.choice(['Beatles', 'Wings', 'Solo'])],
+    }
+
+
+#%%
+def search_article(index, query=QUERY, seed=0, shared=0.0):
+    """Returns the article at the global index of the synthetic search result for query. A shared fraction of the
+    articles (chosen per index and query) come from a pool common to all the queries (make_article(index, '', seed)),
+    so that the search results of different queries overlap, as those of related musicians do.
+    """
+
+    if shared and random.Random(f'{seed}-{query}-{index}-shared').random() < shared:
+        query = ''
+    return make_article(index, query, seed)
+
+
+#%%
+def _article_html(article, js_dates, embedded):
+    date_text = '' if js_dates else article['date'].strftime('%B %d, %Y').replace(' 0', ' ')
+    datetime = f' datetime="{article["date"].isoformat()}"' if not js_dates or embedded == 'attributes' else ''
+    return f'''
+<article class="row-item">
+  <div class="article-image-wrapper">
+    <a class="theframe" href="{escape(article['url'])}" title="{escape(article['title'])}"
+       data-image="{escape(article['image_url'])}"></a>
+  </div>
+  <div class="content">
+    <a href="{escape(article['url'])}" class="title">{escape(article['title'])}</a>
+    <div class="auth-date"><em>by  {escape(article['author'])}</em> <time{datetime}>{date_text}</time></div>
+  </div>
+</article>'''
+
+
+#%%
+def _embedded_html(articles, embedded):
+    # the script with the data of the articles: a JSON-LD list of NewsArticle items, or the state of the page script
+    if embedded == 'json-ld':
+        items = [{'@type': 'ListItem', 'position': position,
+                  'item': {'@type': 'NewsArticle', 'url': article['url'], 'headline': article['title'],
+                           'datePublished': article['date'].isoformat(),
+                           'author': {'@type': 'Person', 'name': article['author']}}}
+                 for position, article in enumerate(articles, 1)]
+        item_list = {'@context': 'https://schema.org', '@type': 'ItemList', 'itemListElement': items}
+        return f'<script type="application/ld+json">{json.dumps(item_list)}</script>'
+    if embedded == 'script':
+        results = [{'link': article['url'], 'title': article['title'], 'publishedAt': article['date'].isoformat(),
+                    'byline': article['author']} for article in articles]
+        return f'<script>window.__INITIAL_STATE__ = {json.dumps({"search": {"results": results}})};</script>'
+    return ''
+
+
+#%%
+def synthesize_page(page, n_pages, per_page=ARTICLES_PER_PAGE, query=QUERY, seed=0, js_dates=False, overlap=0,
+                    embedded=None, shared=0.0):
+    """Returns the HTML of page (1-based) of a synthetic search result for query that has n_pages pages.
+    A page after the last one has no articles, like the real site. If js_dates is True, the 'time' tags are empty
+    (the real site fills them with JavaScript, so this is what plain requests get). Each page after the first one
+    also repeats the last overlap articles of the previous page (as when new articles are published during a crawl).
+    embedded is the form in which the page ships the dates and authors for its scripts, besides the 'time' tags:
+    'json-ld', 'script' (an inline JSON state), 'attributes' (the datetime of the 'time' tags, even if js_dates
+    is True), or None (the datetime attributes only if js_dates is False). shared is as in search_article().
+    """
+
+    articles = []
+    if 1 <= page <= n_pages:
+        first = (page - 1) * per_page - (overlap if page > 1 else 0)
+        articles = [search_article(index, query, seed, shared) for index in range(first, page * per_page)]
+    search_url = f'/search/?s={quote(query)}'
+    pagination = ''.join(f'<a href="{search_url}&amp;searchpage={p}">{p}</a>'
+                         for p in range(max(1, page - 2), min(n_pages, page + 2) + 1) if p != page)
+    if page < n_pages:
+        pagination += f'<a class="last" href="{search_url}&amp;searchpage={n_pages}">Last</a>'
+    script = '<script>/* fills in the time tags */</script>' if js_dates else ''
+    script = _embedded_html(articles, embedded) + script
+    return f'''<!DOCTYPE html>
+<html lang="en">
+<head><meta charset="utf-8"><title>Search results for {escape(query)} | Ultimate Classic Rock</title></head>
+<body>
+<div class="rowline clearfix">
+<span class="visually-hidden">Search results for {escape(query)}</span>
+{''.join(_article_html(article, js_dates, embedded) for article in articles)}
+<article class="sponsored"><div class="widget">Sponsored</div></article>
+</div>
+<nav class="pagination">{pagination}</nav>
+{script}
+</body>
+</html>
+'''
+
+
+#%%
+def synthesize_pages(n_pages, per_page=ARTICLES_PER_PAGE, query=QUERY, seed=0, js_dates=False, overlap=0,
+                     embedded=None, shared=0.0):
+    """Generator that yields the HTML of all the pages of a synthetic search result.
+    """
+
+    for page in range(1, n_pages + 1):
+        yield synthesize_page(page, n_pages, per_page, query, seed, js_dates, overlap, embedded, shared)
+
+
+#%%
+def synthesize_article_page(article, base_url=''):
+    """Returns the HTML of the page of an article (a dict from make_article()), whose canonical URL is base_url + url.
+    """
+
+    canonical_url = escape(base_url + article['url'])
+    return f'''<!DOCTYPE html>
+<html lang="en">
+<head><meta charset="utf-8"><title>{escape(article['title'])}</title>
+<link rel="canonical" href="{canonical_url}">
+<meta property="og:url" content="{canonical_url}">
+{''.join(f'<meta property="article:tag" content="{escape(tag)}">' for tag in article['tags'])}
+</head>
+<body>
+<article class="single">
+  <h1>{escape(article['title'])}</h1>
+  <div class="pod-content">
+    {''.join(f'<p>{escape(sentence)}</p>' for sentence in article['body'])}
+    <div class="ad">Advertisement</div>
+  </div>
+  <div class="article-tags">{''.join(f'<a rel="tag" href="/tags/{quote(tag.lower())}/">{escape(tag)}</a>'
+                                     for tag in article['tags'])}</div>
+</article>
+</body>
+</html>
+'''
+
+
+#%%
+def record_pages(fetch_page, n_pages, recordings_dir):
+    """Records the real pages 1..n_pages, fetched by fetch_page(page) (e.g. lambda page: get_next_html(start_url, page,
+    'selenium') from music/crawl.py), as recordings_dir / page-<n>.html, to be served by FixtureSite(recordings_dir=...).
+    """
+
+    recordings_dir = Path(recordings_dir)
+    recordings_dir.mkdir(parents=True, exist_ok=True)
+    for page in range(1, n_pages + 1):
+        (recordings_dir / f'page-{page}.html').write_text(fetch_page(page), encoding='utf-8')
+
+
+#%%
+class FixtureSite:
+    """The class describing the local stand-in site, served by a ThreadingHTTPServer on a background thread.
+    Parameters:
+    - n_pages, per_page, seed, js_dates, overlap, embedded, shared: the synthetic search results
+      (see synthesize_page());
+      every query has its own articles (but for the shared ones), and every article has its page
+      (see synthesize_article_page())
+    - recordings_dir: a directory with recorded pages, named page-<n>.html, served instead of synthetic ones
+    - latency, jitter: the response delay in seconds, and its max random deviation
+    - error_rate: the probability of a 500 Internal Server Error
+    - max_rps: if specified, requests beyond max_rps per second get 429 Too Many Requests with Retry-After
+    - max_concurrency: if specified, requests beyond max_concurrency in flight get 503 Service Unavailable
+    The responses carry an ETag, and conditional requests for unchanged pages get 304 Not Modified.
+    The stats field counts the requests per path and the responses per status.
+    """
+
+    def __init__(self, n_pages=20, per_page=ARTICLES_PER_PAGE, seed=0, js_dates=False, overlap=0, embedded=None,
+                 shared=0.0, recordings_dir=None, latency=0.0, jitter=0.0, error_rate=0.0, max_rps=None,
+                 max_concurrency=None, port=0):
+        self.n_pages = n_pages
+        self.per_page = per_page
+        self.seed = seed
+        self.js_dates = js_dates
+        self.overlap = overlap
+        self.embedded = embedded
+        self.shared = shared
+        self.recordings_dir = Path(recordings_dir) if recordings_dir else None
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.max_rps = max_rps
+        self.max_concurrency = max_concurrency
+        self.stats = {'requests': 0, 'paths': {}, 'statuses': {}}
+        self.__port = port
+        self.__server = None
+        self.__thread = None
+        self.__lock = threading.Lock()
+        self.__random = random.Random(seed)
+        self.__in_flight = 0
+        self.__queries = {QUERY, ''}            # the queries searched for (and the shared pool): their articles have pages
+        self.__window = (0, 0)                  # (the current second, the number of requests in it)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.__server.server_address[1]}'
+
+    @property
+    def start_url(self):
+        return self.search_url(QUERY)
+
+    def search_url(self, query):
+        return f'{self.base_url}/search/?s={quote(query)}'
+
+    def start(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'               # keep-alive
+            # TCP_NODELAY: the headers and the body go out in separate writes, and with Nagle's algorithm
+            # (and the client's delayed ACK) every request after the first on a connection would stall ~40ms
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                site._handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.__server = ThreadingHTTPServer(('127.0.0.1', self.__port), Handler)
+        self.__server.daemon_threads = True
+        self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        if self.__server is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__server = None
+
+    def page_html(self, path, query):
+        """Returns the HTML served for path with the query (a dict of lists, as from parse_qs()), or None (404).
+        """
+
+        article_path = _ARTICLE_PATH.match(path)
+        if article_path:
+            for search_query in list(self.__queries):
+                article = make_article(int(article_path.group(1)), search_query, self.seed)
+                if article['url'] == path:
+                    return synthesize_article_page(article, self.base_url)
+            return None
+        if path.rstrip('/') != '/search':
+            return None
+        page = int(query.get('searchpage', ['1'])[0])
+        if self.recordings_dir is not None:
+            recording = self.recordings_dir / f'page-{page}.html'
+            if recording.exists():
+                return recording.read_text(encoding='utf-8')
+        search_query = query.get('s', [QUERY])[0]
+        self.__queries.add(search_query)
+        return synthesize_page(page, self.n_pages, self.per_page, search_query, self.seed, self.js_dates, self.overlap,
+                               self.embedded, self.shared)
+
+    def _handle(self, handler):
+        url = urlsplit(handler.path)
+        with self.__lock:
+            self.stats['requests'] += 1
+            self.stats['paths'][url.path] = self.stats['paths'].get(url.path, 0) + 1
+            self.__in_flight += 1
+            second = int(time.monotonic())
+            count = self.__window[1] + 1 if self.__window[0] == second else 1
+            self.__window = (second, count)
+            throttled = self.max_rps is not None and count > self.max_rps
+            overloaded = self.max_concurrency is not None and self.__in_flight > self.max_concurrency
+            failed = self.__random.random() < self.error_rate
+            delay = max(0.0, self.latency + self.__random.uniform(-self.jitter, self.jitter))
+        try:
+            time.sleep(delay)
+            if throttled:
+                self.__respond(handler, 429, b'Too Many Requests', {'Retry-After': '1'})
+            elif overloaded:
+                self.__respond(handler, 503, b'Service Unavailable', {'Retry-After': '1'})
+            elif failed:
+                self.__respond(handler, 500, b'Internal Server Error')
+            else:
+                html = self.page_html(url.path, parse_qs(url.query))
+                if html is None:
+                    self.__respond(handler, 404, b'Not Found')
+                    return
+                body = html.encode('utf-8')
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                if handler.headers.get('If-None-Match') == etag:
+                    self.__respond(handler, 304, b'', {'ETag': etag})
+                else:
+                    self.__respond(handler, 200, body, {'ETag': etag, 'Content-Type': 'text/html; charset=utf-8'})
+        finally:
+            with self.__lock:
+                self.__in_flight -= 1
+
+    def __respond(self, handler, status, body, headers=None):
+        with self.__lock:
+            self.stats['statuses'][status] = self.stats['statuses'].get(status, 0) + 1
+        handler.send_response(status)
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        if status != 304:
+            handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        if status != 304:
+            handler.wfile.write(body)
+
+
+#%%
+if __name__ == '__main__':
+
+    # Serve a synthetic site until interrupted, e.g. to crawl it from music/crawl.py
+    with FixtureSite(n_pages=50, latency=0.05, jitter=0.02) as site:
+        print(f'Serving {site.start_url} (Ctrl+C to stop)')
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print(site.stats)
@@ -0,0 +1,61 @@
+import pytest
+import requests
+
+from music.article_crawl import crawl_article_info
+from music.article_store import ArticleStore
+from music.checkpoint import CrawlCheckpoint
+from music.extract import extract_article_info_from_html
+from music.http_session import get_text
+from music.near_duplicates import NearDuplicateFilter
+from music.urls import page_url
+from testdata.ucr_site import FixtureSite, synthesize_page
+
+
+def _fetcher(site):
+    return lambda page: get_text(page_url(site.start_url, page))
+
+
+def test_interrupted_crawl_resumes_after_the_last_saved_page(tmp_path):
+    expected = [record for page in range(1, 11)
+                for record in extract_article_info_from_html(synthesize_page(page, 10, seed=3))]
+    with FixtureSite(n_pages=10, error_rate=0.15, seed=3) as site:
+        records, interruptions = [], 0
+        while True:
+            checkpoint = CrawlCheckpoint(site.start_url, tmp_path)          # as after a restart
+            try:
+                for record in crawl_article_info(site.start_url, _fetcher(site), None, checkpoint=checkpoint):
+                    records.append(record)
+                break
+            except requests.HTTPError:
+                interruptions += 1
+        assert interruptions == site.stats['statuses'][500] > 0
+        assert records == expected                  # every page once, in order, however often the crawl failed
+        assert CrawlCheckpoint(site.start_url, tmp_path).next_page() == 1
+
+
+def test_incremental_crawl_stops_at_the_first_page_without_new_articles(tmp_path):
+    with FixtureSite(n_pages=5) as site:
+        checkpoint = CrawlCheckpoint(site.start_url, tmp_path)
+        assert len(list(crawl_article_info(site.start_url, _fetcher(site), None, checkpoint=checkpoint))) == 50
+        requests_before = site.stats['paths']['/search/']
+        assert list(crawl_article_info(site.start_url, _fetcher(site), None, checkpoint=checkpoint,
+                                       incremental=True)) == []
+        assert site.stats['paths']['/search/'] - requests_before <= 2           # page 1, and page 2 prefetched
+
+
+def test_records_are_deduplicated_and_stored_page_by_page(tmp_path):
+    with FixtureSite(n_pages=3, overlap=3) as site:
+        store = ArticleStore(tmp_path / 'articles.sqlite')
+        dedupe = NearDuplicateFilter()
+        records = list(crawl_article_info(site.start_url, _fetcher(site), None, store=store, dedupe=dedupe))
+        assert len(records) == len(set(records)) == 30
+        assert dedupe.duplicates == 6                       # the last 3 articles of pages 1 and 2, listed again
+        assert len(store) == 30
+        url, title, *_ = store.find(limit=1)[0]
+        assert url.startswith(site.base_url + '/') and title
+
+
+@pytest.mark.parametrize('max_pages', [0, 2])
+def test_max_pages(max_pages):
+    with FixtureSite(n_pages=5) as site:
+        assert len(list(crawl_article_info(site.start_url, _fetcher(site), max_pages))) == 10 * max_pages
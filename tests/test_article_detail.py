@@ -0,0 +1,80 @@
+import requests
+
+from music.article_detail import crawl_article_details, extract_article_detail, unique_urls
+from music.extract import extract_article_urls
+from music.http_session import get_text
+from music.parsers import make_soup
+from music.urls import canonicalize_url
+from testdata.ucr_site import FixtureSite, make_article, synthesize_article_page, synthesize_page
+
+
+def test_extract_article_detail():
+    article = make_article(3)
+    detail = extract_article_detail(synthesize_article_page(article, 'https://example.com'),
+                                    'https://example.com' + article['url'] + '?utm_source=search')
+    assert detail.canonical_url == 'https://example.com' + article['url']
+    assert detail.body == '\n'.join(article['body'])
+    assert detail.tags == article['tags']
+
+
+def test_unique_urls_compares_canonical_urls():
+    urls = ['https://Example.com/a/', 'https://example.com/a/#comments', 'https://example.com/b/']
+    seen = {canonicalize_url('https://example.com/b/')}
+    assert list(unique_urls(urls, seen)) == ['https://Example.com/a/']
+
+
+def test_extract_article_urls_are_absolute():
+    page_url = 'https://example.com/search/?s=x&searchpage=2'
+    urls = extract_article_urls(make_soup(synthesize_page(2, 3)), page_url)
+    assert len(urls) == 10
+    assert urls[0] == 'https://example.com' + make_article(10)['url']
+
+
+def test_crawl_article_details_fetches_each_article_once():
+    with FixtureSite(n_pages=3, overlap=3) as site:
+        urls = []
+        for page in range(1, 4):
+            page_url = site.start_url + (f'&searchpage={page}' if page > 1 else '')
+            urls += extract_article_urls(make_soup(requests.get(page_url).text), page_url)
+        assert len(urls) == 36
+
+        details = list(crawl_article_details(iter(urls), lambda url: requests.get(url).text, concurrency=4))
+        assert [detail.url for detail in details] == list(dict.fromkeys(urls))
+        assert all(detail.body and detail.tags for detail in details)
+        assert site.stats['requests'] == 3 + 30                  # the list pages, and each article page once
+
+
+def test_failed_fetch_is_retried_by_the_next_crawl():
+    articles = [make_article(i) for i in range(1, 5)]
+    urls = ['https://example.com' + article['url'] for article in articles]
+    pages = {url: synthesize_article_page(article, 'https://example.com') for url, article in zip(urls, articles)}
+    fetched = []
+
+    def fetch_html(url):
+        fetched.append(url)
+        if url == urls[2] and fetched.count(url) == 1:
+            raise requests.ConnectionError(url)
+        return pages[url]
+
+    seen, failed = set(), {}
+    details = [detail.url for detail in crawl_article_details(iter(urls), fetch_html, concurrency=2, seen=seen,
+                                                              failed=failed)]
+    assert details == urls[:2] + urls[3:]                   # the crawl goes on after the failure
+    assert list(failed) == [urls[2]] and isinstance(failed[urls[2]], requests.ConnectionError)
+    assert canonicalize_url(urls[2]) not in seen
+
+    details = [detail.url for detail in crawl_article_details(iter(urls), fetch_html, concurrency=2, seen=seen)]
+    assert details == [urls[2]]
+    assert fetched.count(urls[0]) == 1 and fetched.count(urls[2]) == 2
+
+
+def test_error_responses_are_not_articles():
+    with FixtureSite(n_pages=1) as site:
+        page_url = site.start_url
+        urls = extract_article_urls(make_soup(requests.get(page_url).text), page_url)[:3]
+        urls.insert(1, site.base_url + '/2022/06/no-such-article/')
+        seen, failed = set(), {}
+        details = list(crawl_article_details(iter(urls), get_text, concurrency=2, seen=seen, failed=failed))
+        assert [detail.url for detail in details] == urls[:1] + urls[2:]
+        assert failed[urls[1]].response.status_code == 404
+        assert seen == {canonicalize_url(url) for url in urls[:1] + urls[2:]}
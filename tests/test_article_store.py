@@ -0,0 +1,42 @@
+import sqlite3
+
+from music.article_store import ArticleStore, parse_date
+from music.extract import extract_article_info_from_html
+from testdata.ucr_site import make_article, synthesize_page
+
+URL = 'https://ultimateclassicrock.com/paul-mccartney-80/'
+
+
+def test_parse_date():
+    assert parse_date('June 18, 2022') == '2022-06-18'
+    assert parse_date(' Jun  8, 2022\n') == '2022-06-08'
+    assert parse_date('') is None and parse_date('yesterday') is None
+
+
+def test_upsert_keeps_one_row_per_url_and_known_dates(tmp_path):
+    store = ArticleStore(tmp_path / 'articles.sqlite')
+    store.upsert_page([(URL, 'Paul McCartney Turns 80', 'Nick DeRiso', 'June 18, 2022', '/a.jpg'),
+                       (None, 'No link', 'Nick DeRiso', '', '/b.jpg')])
+    assert store.upsert_page([(URL, 'Paul McCartney Turns 80!', 'Nick DeRiso', '', '/a.jpg')]) == 1
+    assert len(store) == 1
+    assert store.get(URL) == (URL, 'Paul McCartney Turns 80!', 'Nick DeRiso', 'June 18, 2022', '/a.jpg')
+
+
+def test_find_by_author_and_year_uses_the_index(tmp_path):
+    store = ArticleStore(tmp_path / 'articles.sqlite')
+    for page in range(1, 4):
+        records = extract_article_info_from_html(synthesize_page(page, 3, per_page=100), with_url=True)
+        store.upsert_page([('https://example.com' + url,) + tuple(info) for url, *info in records])
+    assert len(store) == 300
+
+    author = make_article(0)['author']
+    articles = store.find(author=author, year=2022)
+    assert articles and all(article[2] == author and article[3].endswith('2022') for article in articles)
+    assert [article[0] for article in articles] == [article[0] for article in store.find(author=author)
+                                                    if article[3].endswith('2022')]
+    assert len(store.find(since='2022-06-01', limit=5)) == 5
+
+    with sqlite3.connect(store.path) as connection:
+        plan = connection.execute('EXPLAIN QUERY PLAN SELECT url FROM articles WHERE author = ? AND published >= ?',
+                                  (author, '2022-01-01')).fetchall()
+    assert 'articles_author' in str(plan)
@@ -0,0 +1,18 @@
+from music.checkpoint import CrawlCheckpoint
+
+START_URL = 'https://ultimateclassicrock.com/search/?s=paul%20mccartney'
+
+
+def test_checkpoint_survives_restart(tmp_path):
+    checkpoint = CrawlCheckpoint(START_URL, tmp_path)
+    checkpoint.save(1, ['Let It Be|Jane Doe'])
+    checkpoint.save(2, ['Yesterday|Jane Doe'])
+
+    restarted = CrawlCheckpoint(START_URL, tmp_path)
+    assert restarted.next_page() == 3
+    assert restarted.seen == {'Let It Be|Jane Doe', 'Yesterday|Jane Doe'}
+
+    restarted.finish()
+    finished = CrawlCheckpoint(START_URL, tmp_path)
+    assert finished.next_page() == 1 and len(finished.seen) == 2
+    assert CrawlCheckpoint(START_URL + '&x=1', tmp_path).next_page() == 1
@@ -0,0 +1,124 @@
+import asyncio
+import random
+import threading
+import time
+
+import pytest
+import requests
+
+from music.crawl_engine import crawl_in_order, crawl_paginated, map_in_processes
+from music.extract import inspect_page
+from music.http_session import get_text
+from music.urls import page_url
+from testdata.ucr_site import FixtureSite
+
+
+def _slow_page(page):
+    time.sleep(random.uniform(0.01, 0.05))
+    return page
+
+
+def test_crawl_in_order_yields_in_page_order():
+    assert list(crawl_in_order(_slow_page, range(1, 21), concurrency=5)) == list(range(1, 21))
+
+
+def test_crawl_in_order_inside_running_event_loop():
+    async def main():                               # as in a notebook, or a script under asyncio.run()
+        return list(crawl_in_order(_slow_page, range(1, 9), concurrency=4))
+
+    assert asyncio.run(main()) == list(range(1, 9))
+
+
+def test_crawl_in_order_respects_concurrency():
+    lock = threading.Lock()
+    running = [0, 0]                                # currently running, max running
+
+    def page_fetch(page):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return page
+
+    assert list(crawl_in_order(page_fetch, range(1, 13), concurrency=3)) == list(range(1, 13))
+    assert running[1] <= 3
+
+
+def test_crawl_in_order_raises_at_failing_page():
+    def fetch(page):
+        if page == 3:
+            raise ValueError(page)
+        return page
+
+    results = []
+    try:
+        for result in crawl_in_order(fetch, range(1, 6), concurrency=4):
+            results.append(result)
+    except ValueError:
+        pass
+    assert results == [1, 2]
+
+
+def test_map_in_processes_extracts_in_order():
+    from functools import partial
+
+    from music.extract import extract_article_info_from_html
+
+    pages = [f'<article><div class="article-image-wrapper"><a data-image="/{i}.jpg"></a></div>'
+             f'<div class="content"><a>Title {i}</a><em>by  Jane Doe</em><time>June 18, 2022</time></div>'
+             f'</article><article></article>' for i in range(6)]
+    extract = partial(extract_article_info_from_html, backend='html.parser')
+    results = list(map_in_processes(extract, iter(pages), workers=2, lookahead=2))
+    assert [records[0][0] for records in results] == [f'Title {i}' for i in range(6)]
+
+
+def test_crawl_paginated_stops_at_announced_last_page():
+    requested = []
+
+    def fetch(page):
+        requested.append(page)
+        return page
+
+    results = list(crawl_paginated(fetch, lambda page: (True, 4), concurrency=2, prefetch=2))
+    assert results == [1, 2, 3, 4]
+    assert max(requested) <= 6                      # at most prefetch speculative pages beyond the last one
+
+
+def test_crawl_paginated_stops_at_empty_page():
+    results = list(crawl_paginated(lambda page: page, lambda page: (page < 5, None), max_pages=100,
+                                   concurrency=3))
+    assert results == [1, 2, 3, 4]
+
+
+def test_inspect_page():
+    from music.extract import inspect_page
+
+    html = ('<article>a</article><article></article>'
+            '<a href="/search/?s=paul%20mccartney&amp;searchpage=2">2</a>'
+            '<a href="/search/?s=paul%20mccartney&amp;searchpage=17">Last</a>')
+    assert inspect_page(html) == (True, 17)
+    assert inspect_page('<article></article>') == (False, None)
+
+
+def test_crawl_paginated_with_max_pages_0_fetches_nothing():
+    requested = []
+
+    def fetch(page):
+        requested.append(page)
+        return page
+
+    assert list(crawl_paginated(fetch, lambda page: (True, None), max_pages=0, concurrency=3)) == []
+    assert requested == []
+
+
+def test_crawl_paginated_raises_on_error_pages():
+    with FixtureSite(n_pages=30, error_rate=0.15, seed=3) as site:
+        pages = []
+        with pytest.raises(requests.HTTPError):
+            for html in crawl_paginated(lambda page: get_text(page_url(site.start_url, page)), inspect_page,
+                                        concurrency=1):
+                pages.append(html)
+        assert site.stats['statuses'][500] == 1
+        assert len(pages) == site.stats['statuses'][200] < 30         # the crawl does not end as if the list did
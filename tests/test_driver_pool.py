@@ -0,0 +1,132 @@
+import threading
+import time
+
+import pytest
+from bs4 import BeautifulSoup
+
+from music.driver_pool import (FAST_PROFILE, FRAGMENT_PROFILE, FULL_PROFILE, DriverPool, DriverPoolClosedError,
+                               blocked_url_patterns)
+from music.extract import extract_article_info_from_html
+from testdata.ucr_site import synthesize_page
+
+
+class FakeDriver:
+    instances = []
+    fill_after = 0                      # the number of checks before the 'time' tags are filled by the page script
+
+    def __init__(self):
+        self.current_url = 'about:blank'
+        self.page_source = ''
+        self.quit_called = False
+        self.checks = 0
+        FakeDriver.instances.append(self)
+
+    def get(self, url):
+        time.sleep(0.01)
+        self.current_url = url
+        self.page_source = f'<html>{url}</html>'
+        self.checks = 0
+
+    def execute_script(self, script, selector):
+        if 'every' in script:
+            self.checks += 1
+            return self.checks > FakeDriver.fill_after
+        return f'<div class="rowline">{self.current_url}</div>' if selector == FRAGMENT_PROFILE.fragment else ''
+
+    def quit(self):
+        self.quit_called = True
+
+
+class PageDriver(FakeDriver):
+    """Serves the pages of a dict {url: HTML}, and runs the fragment script on them as a browser would."""
+    pages = {}
+
+    def get(self, url):
+        self.current_url = url
+        self.page_source = PageDriver.pages[url]
+
+    def execute_script(self, script, selector):
+        if 'every' in script:
+            return True
+        soup = BeautifulSoup(self.page_source, 'html.parser')
+        elements, articles = soup.select(selector), soup.find_all('article')
+        if elements and articles and not any(element is articles[-1] or element in articles[-1].parents
+                                             for element in elements):
+            elements.append(articles[-1])
+        return '\n'.join(map(str, elements))
+
+
+@pytest.fixture(autouse=True)
+def reset_fake_drivers():
+    FakeDriver.instances = []
+    FakeDriver.fill_after = 0
+
+
+def test_drivers_are_reused_and_recycled():
+    with DriverPool(size=1, factory=FakeDriver, max_pages=3) as pool:
+        for page in range(7):
+            assert pool.render(f'page{page}') == f'<html>page{page}</html>'
+    assert len(FakeDriver.instances) == 3
+    assert all(driver.quit_called for driver in FakeDriver.instances)
+
+
+def test_unhealthy_driver_is_replaced():
+    pool = DriverPool(size=1, factory=FakeDriver, health_check=lambda d: d.current_url != 'dead')
+    pool.render('dead')
+    pool.render('page')
+    assert len(FakeDriver.instances) == 2
+    assert FakeDriver.instances[0].quit_called
+    pool.close()
+
+
+def test_pool_is_bounded_under_concurrency():
+    pool = DriverPool(size=3, factory=FakeDriver)
+    threads = [threading.Thread(target=pool.render, args=(f'page{i}',)) for i in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(FakeDriver.instances) <= 3
+    pool.close()
+    assert all(driver.quit_called for driver in FakeDriver.instances)
+    with pytest.raises(DriverPoolClosedError):
+        pool.acquire()
+
+
+def test_render_waits_for_the_filled_elements():
+    FakeDriver.fill_after = 3
+    with DriverPool(size=1, factory=FakeDriver, profile=FAST_PROFILE) as pool:
+        assert pool.render('page') == '<html>page</html>'
+        assert FakeDriver.instances[0].checks == 4
+    with DriverPool(size=1, factory=FakeDriver, profile=FAST_PROFILE._replace(wait_timeout=0.0)) as pool:
+        assert pool.render('page') == '<html>page</html>'             # the page as it is after the timeout
+        assert FakeDriver.instances[1].checks == 1
+    with DriverPool(size=1, factory=FakeDriver, profile=FULL_PROFILE) as pool:
+        pool.render('page')
+        assert FakeDriver.instances[2].checks == 0
+
+
+def test_render_returns_the_fragment():
+    with DriverPool(size=1, factory=FakeDriver, profile=FRAGMENT_PROFILE) as pool:
+        html = pool.render('page')
+    assert '<div class="rowline">page</div>' in html and html.startswith('<!DOCTYPE html>')
+    with DriverPool(size=1, factory=FakeDriver, profile=FRAGMENT_PROFILE._replace(fragment='main')) as pool:
+        assert pool.render('page') == '<html>page</html>'             # no such fragment: the whole page
+
+
+def test_blocked_url_patterns():
+    assert '*.css' in blocked_url_patterns(FAST_PROFILE) and '*doubleclick.net*' in blocked_url_patterns(FAST_PROFILE)
+    assert blocked_url_patterns(FULL_PROFILE) == []
+
+
+def test_fragment_keeps_all_the_articles():
+    page = synthesize_page(1, 3)
+    aside = '<article class="sponsored"><div class="widget">Sponsored</div></article>'
+    PageDriver.pages = {'inside': page,                                  # the trailing article outside 'div.rowline'
+                        'outside': page.replace(aside, '').replace('</nav>', f'</nav><aside>{aside}</aside>')}
+    with DriverPool(size=1, factory=PageDriver, profile=FRAGMENT_PROFILE) as pool:
+        for url in ('inside', 'outside'):
+            html = pool.render(url)
+            assert html != PageDriver.pages[url] and 'searchpage=' in html
+            assert extract_article_info_from_html(html) == extract_article_info_from_html(page)
+            assert len(extract_article_info_from_html(html)) == 10
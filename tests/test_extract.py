@@ -0,0 +1,34 @@
+from music import parsers
+from music.extract import extract_article_info, extract_article_info_from_html, missing_fields
+from testdata.ucr_site import make_article, synthesize_page
+
+PAGE = '''
+<article>
+  <div class="article-image-wrapper"><a href="/a" data-image="/a.jpg"></a></div>
+  <div class="content">
+    <a href="/a">Paul McCartney Turns 80</a>
+    <div class="auth-date"><em>by  Jane Doe</em></div>
+  </div>
+</article>
+<article>
+  <div class="content">
+    <a href="/b">Wings Reunion</a>
+    <div class="auth-date"><em>by  John Roe</em> <time>June 17, 2022</time></div>
+  </div>
+</article>
+<article></article>'''
+
+
+def test_extraction_matches_the_page():
+    records = extract_article_info(parsers.make_soup(synthesize_page(1, 1, per_page=3)), with_url=True)
+    assert records == [(article['url'], article['title'], article['author'],
+                        article['date'].strftime('%B %d, %Y').replace(' 0', ' '), article['image_url'])
+                       for article in map(make_article, range(3))]
+
+
+def test_missing_elements_do_not_leak_from_the_next_article():
+    expected = [('Paul McCartney Turns 80', 'Jane Doe', '', '/a.jpg'),
+                ('Wings Reunion', 'John Roe', 'June 17, 2022', None)]
+    assert extract_article_info(parsers.make_soup(PAGE)) == expected
+    assert extract_article_info_from_html(PAGE, 'selectolax') == expected
+    assert missing_fields(parsers.make_soup(PAGE)) == {'date', 'image_url'}
@@ -0,0 +1,56 @@
+from functools import partial
+
+from music.extract import extract_article_info_from_html
+from music.extract_cache import ExtractCache, extractor_key
+
+PAGE = '''
+<article>
+  <div class="article-image-wrapper"><a class="theframe" href="/a" data-image="/a.jpg"></a></div>
+  <div class="content">
+    <a href="/a">Paul McCartney Turns 80</a>
+    <div class="auth-date"><em>by  Jane Doe</em> <time>June 18, 2022</time></div>
+  </div>
+</article>
+<article></article>'''
+
+
+def test_identical_page_is_not_extracted_again(tmp_path):
+    calls = []
+
+    def extract(html):
+        calls.append(html)
+        return [('Paul McCartney Turns 80', 'Jane Doe', 'June 18, 2022', '/a.jpg')]
+
+    cache = ExtractCache(tmp_path / 'cache.sqlite')
+    assert cache.extract(PAGE, extract) == cache.extract(PAGE, extract)
+    assert len(calls) == 1 and cache.hits == 1
+    assert ExtractCache(tmp_path / 'cache.sqlite').extract(PAGE) == extract(PAGE)
+
+
+def test_new_extractor_version_invalidates_records(tmp_path):
+    ExtractCache(tmp_path / 'cache.sqlite', version=1).extract(PAGE, lambda html: [('old',)])
+    cache = ExtractCache(tmp_path / 'cache.sqlite', version=2)
+    assert cache.extract(PAGE, lambda html: [('new',)]) == [('new',)]
+    assert cache.misses == 1
+
+
+def test_versions_share_the_cache_file_until_purged(tmp_path):
+    old, new = ExtractCache(tmp_path / 'cache.sqlite', version=1), ExtractCache(tmp_path / 'cache.sqlite', version=2)
+    old.extract(PAGE, lambda html: [('old',)])
+    new.extract(PAGE, lambda html: [('new',)])
+    old, new = ExtractCache(tmp_path / 'cache.sqlite', version=1), ExtractCache(tmp_path / 'cache.sqlite', version=2)
+    assert old.extract(PAGE, lambda html: 1 / 0) == [('old',)]
+    assert new.extract(PAGE, lambda html: 1 / 0) == [('new',)]
+    assert new.purge() == 1
+    assert ExtractCache(tmp_path / 'cache.sqlite', version=1).extract(PAGE, lambda html: [('again',)]) == [('again',)]
+
+
+def test_call_shapes_do_not_share_records(tmp_path):
+    cache = ExtractCache(tmp_path / 'cache.sqlite')
+    with_url = partial(extract_article_info_from_html, backend='html.parser', with_url=True)
+    assert extractor_key(with_url) != extractor_key(extract_article_info_from_html)
+    assert cache.extract(PAGE) == [('Paul McCartney Turns 80', 'Jane Doe', 'June 18, 2022', '/a.jpg')]
+    assert cache.extract(PAGE, with_url) == [('/a', 'Paul McCartney Turns 80', 'Jane Doe', 'June 18, 2022', '/a.jpg')]
+    assert cache.extract(PAGE, with_url)[0][0] == '/a'
+    assert cache.extract(PAGE)[0][0] == 'Paul McCartney Turns 80'
+    assert (cache.hits, cache.misses) == (2, 2)
@@ -0,0 +1,40 @@
+import requests
+
+from music.article_detail import crawl_article_details
+from music.extract import extract_article_info_from_html
+from music.fan_out import crawl_musicians, musician_query
+from music.host_scheduler import PolitenessScheduler
+from music.musician_module import Musician
+from music.urls import page_url
+from testdata.musicians import georgeHarrison, johnLennon, paulMcCartney
+from testdata.ucr_site import FixtureSite
+
+
+def test_articles_are_fetched_once_across_queries():
+    musicians = [johnLennon, paulMcCartney, georgeHarrison, Musician('Paul  McCartney', is_band_member=False)]
+    with FixtureSite(n_pages=3, shared=0.5) as site:
+        search_url_format = site.base_url + '/search/?s={}'
+        stats = {}
+        articles = crawl_musicians(musicians, lambda url: requests.get(url).text, search_url_format=search_url_format,
+                                   scheduler=PolitenessScheduler(per_host=4, crawl_delay=0), stats=stats)
+
+        # the same articles as the searches one by one, merged
+        expected = {}
+        for query in ('john lennon', 'paul mccartney', 'george harrison'):
+            for page in (1, 2, 3):
+                url = page_url(search_url_format.format(query), page)
+                for record in extract_article_info_from_html(requests.get(url).text, with_url=True):
+                    expected.setdefault(site.base_url + record[0], set()).add(query)
+        assert {article.url: set(article.queries) for article in articles} == expected
+        assert stats['pages'] == 9 and stats['duplicates'] > 0
+        assert stats['records'] == stats['articles'] + stats['duplicates'] == 90
+
+        details = list(crawl_article_details((article.url for article in articles), lambda url: requests.get(url).text,
+                                             concurrency=4))
+        assert len(details) == len(articles)
+        article_paths = [path for path in site.stats['paths'] if not path.startswith('/search')]
+        assert all(site.stats['paths'][path] == 1 for path in article_paths)
+
+
+def test_musician_query():
+    assert musician_query(Musician(' Paul  McCartney ')) == 'paul mccartney'
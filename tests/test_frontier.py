@@ -0,0 +1,37 @@
+from music.frontier import BloomFilter, CrawlFrontier
+
+
+def test_bloom_filter_has_no_false_negatives(tmp_path):
+    with BloomFilter(tmp_path / 'seen.bloom', capacity=1000, error_rate=0.01) as bloom:
+        for item in range(1000):
+            bloom.add(item)
+        assert all(item in bloom for item in range(1000))
+        assert sum(item in bloom for item in range(1000, 11000)) < 300
+    with BloomFilter(tmp_path / 'seen.bloom') as bloom:
+        assert len(bloom) == 1000 and 999 in bloom
+
+
+def test_frontier_queues_each_url_once_by_priority(tmp_path):
+    with CrawlFrontier(tmp_path, capacity=1000) as frontier:
+        assert frontier.add_many(['https://example.com/a/', 'https://example.com/b/#x', 'https://EXAMPLE.com/a/']) == \
+               ['https://example.com/a/', 'https://example.com/b/']
+        assert frontier.add('https://example.com/c/', priority=-1)
+        assert not frontier.add('https://example.com/b/?utm_source=feed')
+        assert len(frontier) == 3 and 'https://example.com/b/' in frontier and 'https://example.com/d/' not in frontier
+        assert [frontier.pop(), frontier.pop()] == ['https://example.com/c/', 'https://example.com/a/']
+        frontier.done('https://example.com/c/')
+
+
+def test_frontier_survives_restart(tmp_path):
+    with CrawlFrontier(tmp_path, capacity=1000) as frontier:
+        frontier.add_many(f'https://example.com/{i}/' for i in range(10))
+        for _ in range(3):
+            frontier.done(frontier.pop())
+        frontier.pop()                          # taken, but not done (e.g. the crawler crashed)
+
+    (tmp_path / 'seen.bloom').unlink()          # a lost Bloom filter is rebuilt from the seen table
+    with CrawlFrontier(tmp_path, capacity=1000) as frontier:
+        assert len(frontier) == 7
+        assert frontier.pop() == 'https://example.com/3/'
+        assert not frontier.add('https://example.com/0/')
+        assert len(frontier.seen) == 10
@@ -0,0 +1,77 @@
+import threading
+import time
+
+import pytest
+
+from music.extract import extract_article_info_from_html, inspect_page
+from music.host_scheduler import PolitenessScheduler, crawl_seeds, host_of
+from music.http_session import get_session
+from music.urls import page_url
+from testdata.ucr_site import FixtureSite
+
+
+def test_hosts_are_interleaved_within_their_limits():
+    lock = threading.Lock()
+    running, peaks, starts = {}, {}, {}
+
+    def fetch(url):
+        host = host_of(url)
+        with lock:
+            running[host] = running.get(host, 0) + 1
+            peaks[host] = max(peaks.get(host, 0), running[host])
+            starts.setdefault(host, []).append(time.monotonic())
+        time.sleep(0.05)
+        with lock:
+            running[host] -= 1
+        return url
+
+    scheduler = PolitenessScheduler(per_host=2, crawl_delay=0.02, host_settings={'slow.example': (1, 0.05)})
+    urls = [f'https://{host}/{page}' for page in range(4) for host in ('a.example', 'b.example', 'slow.example')]
+    assert scheduler.add_many(urls + ['https://A.example/0#top']) == len(urls)
+    start = time.monotonic()
+    assert sorted(url for url, result in scheduler.run(fetch)) == sorted(urls)
+    assert time.monotonic() - start < 0.5                     # 4 x 0.05s per host, the hosts in parallel
+    assert peaks == {'a.example': 2, 'b.example': 2, 'slow.example': 1}
+    for host, delay in (('a.example', 0.02), ('slow.example', 0.05)):
+        assert all(b - a >= delay * 0.9 for a, b in zip(starts[host], starts[host][1:]))
+
+
+def test_failing_fetch_is_raised():
+    scheduler = PolitenessScheduler(crawl_delay=0)
+    scheduler.add('https://a.example/1')
+    with pytest.raises(ValueError):
+        list(scheduler.run(lambda url: int('x')))
+
+
+def test_crawl_seeds_on_several_sites():
+    with FixtureSite(n_pages=3) as site1, FixtureSite(n_pages=5) as site2:
+        start_urls = [site1.start_url, site1.search_url('wings'), site2.start_url]
+
+        def fetch_page(start_url, page):
+            return get_session().get(page_url(start_url, page), timeout=10).text
+
+        crawled = {(start_url, page): len(extract_article_info_from_html(html))
+                   for start_url, page, html in crawl_seeds(fetch_page, start_urls, page_url, inspect_page,
+                                                            scheduler=PolitenessScheduler(crawl_delay=0))}
+        assert sorted(crawled) == sorted([(site1.start_url, page) for page in (1, 2, 3)] +
+                                         [(site1.search_url('wings'), page) for page in (1, 2, 3)] +
+                                         [(site2.start_url, page) for page in (1, 2, 3, 4, 5)])
+        assert set(crawled.values()) == {10}
+        assert site2.stats['paths']['/search/'] == 5                # no page after the last one is requested
+
+
+def test_crawl_seeds_max_pages():
+    fetched = []
+
+    def fetch_page(start_url, page):
+        fetched.append((start_url, page))
+        return page
+
+    start_urls = ['https://site1.example/', 'https://site2.example/']
+    inspect = lambda page: (True, None)
+    scheduler = PolitenessScheduler(crawl_delay=0)
+    assert sorted(page for _, page, _ in crawl_seeds(fetch_page, start_urls, page_url, inspect, 2, scheduler)) == \
+        [1, 1, 2, 2]
+    fetched.clear()
+    assert list(crawl_seeds(fetch_page, start_urls, page_url, inspect, 0, PolitenessScheduler(crawl_delay=0))) == []
+    assert fetched == []
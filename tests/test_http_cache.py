@@ -0,0 +1,51 @@
+import requests
+
+from music.http_cache import HTTPCache
+
+
+class FakeSession:
+    """Serves one page with an ETag and answers conditional GETs with 304 Not Modified."""
+
+    def __init__(self):
+        self.requests = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.requests.append(dict(headers or {}))
+        response = requests.Response()
+        response.url = url
+        if (headers or {}).get('If-None-Match') == '"v1"':
+            response.status_code = 304
+            response._content = b''
+        else:
+            response.status_code = 200
+            response.headers['ETag'] = '"v1"'
+            response.headers['Content-Type'] = 'text/html; charset=utf-8'
+            response._content = f'<html>{url}</html>'.encode()
+        return response
+
+
+def test_fresh_response_needs_no_network(tmp_path):
+    cache, session = HTTPCache(tmp_path / 'cache.sqlite', ttl=60), FakeSession()
+    assert not cache.get(session, 'u1').from_cache
+    response = cache.get(session, 'u1')
+    assert response.from_cache and response.text == '<html>u1</html>'
+    assert len(session.requests) == 1
+
+
+def test_stale_response_is_revalidated(tmp_path):
+    cache, session = HTTPCache(tmp_path / 'cache.sqlite', ttl=0), FakeSession()
+    cache.get(session, 'u1')
+    response = cache.get(session, 'u1')
+    assert session.requests[1]['If-None-Match'] == '"v1"'
+    assert response.status_code == 200 and response.from_cache and response.text == '<html>u1</html>'
+
+
+def test_least_recently_used_responses_are_evicted(tmp_path):
+    cache, session = HTTPCache(tmp_path / 'cache.sqlite', ttl=60, max_bytes=40), FakeSession()
+    cache.get(session, 'u1')
+    cache.get(session, 'u2')
+    cache.get(session, 'u1')                        # u1 is now more recently used than u2
+    cache.get(session, 'u3')
+    assert cache.size() <= 40
+    assert cache.get(session, 'u1').from_cache
+    assert not cache.get(session, 'u2').from_cache
@@ -0,0 +1,59 @@
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+from music import http_session
+from music.http_session import (DEFAULT_HEADERS, DEFAULT_TIMEOUT, configure_session, get_session, get_text,
+                                make_session)
+from testdata.ucr_site import FixtureSite
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """Replaces the network with a fake transport; returns the list of (request, send kwargs) it received."""
+    sent = []
+
+    def send(adapter, request, **kwargs):
+        sent.append((request, kwargs))
+        response = requests.Response()
+        response.status_code, response.url, response.request, response._content = 200, request.url, request, b'ok'
+        return response
+
+    monkeypatch.setattr(HTTPAdapter, 'send', send)
+    yield sent
+    http_session.close_session()
+
+
+def test_default_timeout_is_applied(sent):
+    session = make_session(timeout=7)
+    session.get('https://example.com/a')
+    session.get('https://example.com/b', timeout=1)
+    assert [kwargs['timeout'] for _, kwargs in sent] == [7, 1]
+    assert make_session().get_adapter('http://example.com').timeout == DEFAULT_TIMEOUT
+
+
+def test_headers_are_merged(sent):
+    session = make_session(headers={'Accept-Language': 'de', 'X-Crawler': 'music'})
+    session.get('https://example.com/', headers={'Accept': 'text/html'})
+    headers = sent[0][0].headers
+    assert headers['User-Agent'] == DEFAULT_HEADERS['User-Agent']
+    assert (headers['Accept-Language'], headers['X-Crawler'], headers['Accept']) == ('de', 'music', 'text/html')
+
+
+def test_configure_session_replaces_and_closes_the_shared_session(sent, monkeypatch):
+    old_session = get_session()
+    closed = []
+    monkeypatch.setattr(old_session, 'close', lambda: closed.append(True))
+    session = configure_session(pool_size=4, timeout=3)
+    assert session is not old_session and get_session() is session
+    assert closed == [True]
+    get_session().get('https://example.com/')
+    assert sent[0][1]['timeout'] == 3
+
+
+def test_get_text_raises_on_error_responses():
+    with FixtureSite(n_pages=2) as site:
+        assert 'article' in get_text(site.start_url)
+        with pytest.raises(requests.HTTPError) as error:
+            get_text(site.base_url + '/no-such-page')
+        assert error.value.response.status_code == 404
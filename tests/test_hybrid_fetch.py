@@ -0,0 +1,41 @@
+from bs4 import BeautifulSoup
+
+from music.extract import extract_article_info_from_html, missing_fields
+from music.hybrid_fetch import fetch_hybrid
+
+
+def _page(date_text):
+    article = f'''
+        <article>
+          <div class="article-image-wrapper"><a class="theframe" href="/a" data-image="/a.jpg"></a></div>
+          <div class="content">
+            <a href="/a">Paul McCartney Turns 80</a>
+            <div class="auth-date"><em>by  Jane Doe</em> <time>{date_text}</time></div>
+          </div>
+        </article>'''
+    return f'<div class="rowline clearfix">{article}<article></article></div>'
+
+
+def test_static_page_is_used_when_complete():
+    decisions = []
+    html = fetch_hybrid('u', lambda url: _page('June 18, 2022'), lambda url: 1 / 0, decisions.append)
+    assert extract_article_info_from_html(html) == [('Paul McCartney Turns 80', 'Jane Doe', 'June 18, 2022', '/a.jpg')]
+    assert decisions[0].fetcher == 'static' and not decisions[0].missing
+
+
+def test_page_missing_dates_is_rendered():
+    decisions = []
+    assert missing_fields(BeautifulSoup(_page(''), 'html.parser')) == {'date'}
+    html = fetch_hybrid('u', lambda url: _page(''), lambda url: _page('June 18, 2022'), decisions.append)
+    assert not missing_fields(BeautifulSoup(html, 'html.parser'))
+    assert decisions[0].fetcher == 'rendered' and decisions[0].missing == {'date'}
+
+
+def test_pages_that_rendering_cannot_complete_are_not_rendered():
+    decisions = []
+    no_image = _page('June 18, 2022').replace(' data-image="/a.jpg"', '')
+    empty = '<div class="rowline clearfix"><article></article></div>'          # the page after the last one
+    for html in (no_image, empty):
+        assert fetch_hybrid('u', lambda url: html, lambda url: 1 / 0, decisions.append) == html
+    assert [(decision.fetcher, decision.missing) for decision in decisions] == [('static', {'image_url'}),
+                                                                                ('static', {'article'})]
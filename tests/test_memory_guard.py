@@ -0,0 +1,36 @@
+import threading
+import time
+
+from music.crawl_engine import crawl_paginated
+from music.memory_guard import MemoryBudget, current_rss
+
+PAGE = 'x' * 1000
+
+
+def test_budget_admits_pages_that_fit():
+    budget = MemoryBudget(max_bytes=50_000, soup_factor=10)
+    budget.record(PAGE)
+    assert budget.page_cost() == 10_000
+    assert budget.admit(5) and not budget.admit(6)
+    assert budget.peak_in_flight == 5 and budget.throttled == 1
+    assert current_rss() is None or current_rss() > 0
+
+
+def test_budget_bounds_the_pages_fetched_ahead():
+    in_flight, peak, lock = set(), [0], threading.Lock()
+
+    def fetch_page(page):
+        with lock:
+            in_flight.add(page)
+            peak[0] = max(peak[0], len(in_flight))
+        time.sleep(0.001)
+        return PAGE
+
+    budget = MemoryBudget(max_bytes=30_000, soup_factor=10)           # 3 pages
+    for page, html in enumerate(crawl_paginated(fetch_page, lambda html: (True, None), max_pages=30, concurrency=8,
+                                                budget=budget), start=1):
+        time.sleep(0.002)                                               # a slow consumer
+        with lock:
+            in_flight.discard(page)
+    assert page == 30
+    assert peak[0] <= 3 and budget.throttled > 0
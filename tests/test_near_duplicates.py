@@ -0,0 +1,65 @@
+import random
+
+from music.near_duplicates import NearDuplicateFilter, SimHashIndex, hamming_distance, simhash
+
+
+def test_simhash_distances():
+    record = 'Paul McCartney Turns 80 | Nick DeRiso'
+    assert simhash(record) == simhash('paul mccartney turns 80! | Nick DeRiso')
+    assert hamming_distance(simhash(record), simhash('Paul McCartney Turns 80 (Updated) | Nick DeRiso')) <= 10
+    assert hamming_distance(simhash(record), simhash('The Story Behind \'Hey Jude\' | Nick DeRiso')) > 10
+
+
+def test_banded_index_finds_everything_within_max_distance():
+    rnd = random.Random(0)
+    index = SimHashIndex(max_distance=10, bands=4)
+    fingerprints = [rnd.getrandbits(64) for _ in range(2000)]
+    for number, fingerprint in enumerate(fingerprints):
+        index.add(fingerprint, number)
+    for _ in range(200):
+        number = rnd.randrange(len(fingerprints))
+        query = fingerprints[number]
+        for bit in rnd.sample(range(64), rnd.randint(0, 10)):
+            query ^= 1 << bit
+        assert index.find(query) == number                  # random fingerprints are ~32 bits apart
+    assert index.find(rnd.getrandbits(64)) is None
+
+
+def test_filter_drops_and_merges_near_duplicates():
+    near_duplicate_filter = NearDuplicateFilter()
+    page1 = [('/a', 'Paul McCartney Turns 80', 'Nick DeRiso', '', '/a.jpg'),
+             ('/b', 'Wings Reunion', 'Allison Rapp', 'June 17, 2022', '/b.jpg')]
+    page2 = [('/a2', 'Paul McCartney Turns 80!', 'Nick DeRiso', 'June 18, 2022', '/a.jpg'),
+             ('/b?utm_source=feed', 'Wings Reunion (Updated)', 'Allison Rapp', 'June 17, 2022', '/b2.jpg'),
+             ('/c', 'Wings Over America Turns 45', 'Corey Irwin', 'June 18, 2022', '/c.jpg')]
+    assert near_duplicate_filter.filter_page(page1) == (page1, [])
+    assert near_duplicate_filter.filter_page(page2) == ([page2[2]],
+                                                        [('/a', 'Paul McCartney Turns 80', 'Nick DeRiso',
+                                                          'June 18, 2022', '/a.jpg')])
+    assert (near_duplicate_filter.seen, near_duplicate_filter.duplicates, near_duplicate_filter.merged) == (5, 2, 1)
+    assert list(NearDuplicateFilter(merge=False).filter(page1 + page2)) == page1 + [page2[2]]
+
+
+def test_filter_keeps_distinct_articles_with_templated_headlines():
+    records = [('/mccartney-80', 'Paul McCartney Turns 80', 'Nick DeRiso', 'June 18, 2022', '/1.jpg'),
+               ('/mccartney-81', 'Paul McCartney Turns 81', 'Nick DeRiso', 'June 18, 2023', '/2.jpg'),
+               ('/stones-2023', 'Rolling Stones 2023 Tour', 'Corey Irwin', 'May 1, 2023', '/3.jpg'),
+               ('/stones-2024', 'Rolling Stones 2024 Tour', 'Corey Irwin', 'May 1, 2024', '/4.jpg'),
+               ('/albums', 'Every Beatles Albums Ranked', 'Nick DeRiso', 'June 1, 2022', '/5.jpg'),
+               ('/singles', 'Every Beatles Singles Ranked', 'Nick DeRiso', 'June 2, 2022', '/6.jpg')]
+    near_duplicate_filter = NearDuplicateFilter(max_distance=16)                # even with a loose distance
+    assert near_duplicate_filter.filter_page(records) == (records, [])
+    assert near_duplicate_filter.duplicates == 0
+    assert list(NearDuplicateFilter().filter(record[1:] for record in records)) == [record[1:] for record in records]
+
+
+def test_filter_catches_retitled_articles_under_other_urls():
+    original = ('/mccartney-80', 'Paul McCartney Turns 80', 'Nick DeRiso', 'June 18, 2022', '/img/80.jpg')
+    variants = [('/mccartney-turns-80-updated', 'Paul McCartney Turns 80 (Updated)', 'Nick DeRiso', 'June 18, 2022',
+                 '/img/80-updated.jpg'),
+                ('/mccartney-eighty', 'Paul McCartney Turns Eighty', 'Nick DeRiso', 'June 18, 2022', '/img/80-b.jpg'),
+                ('/mccartney-celebrates', 'Paul McCartney Celebrates Turning 80', 'Nick DeRiso', 'June 18, 2022',
+                 '/img/80-c.jpg')]
+    near_duplicate_filter = NearDuplicateFilter()
+    assert near_duplicate_filter.filter_page([original] + variants) == ([original], [])
+    assert near_duplicate_filter.duplicates == 3
@@ -0,0 +1,54 @@
+from datetime import datetime, timezone
+
+from music import http_session
+from music.page_archive import PageArchive
+from testdata.ucr_site import FixtureSite
+
+URL = 'https://ultimateclassicrock.com/search/?s=paul%20mccartney'
+
+
+def test_archive_keeps_every_version(tmp_path):
+    timestamp = datetime(2022, 6, 18, 12, 30, tzinfo=timezone.utc)
+    with PageArchive(tmp_path) as archive:
+        archive.append(URL, '<p>Let It Be – š</p>', headers={'ETag': '"1"', 'Content-Encoding': 'gzip'},
+                       timestamp=timestamp)
+        archive.append(URL + '&searchpage=1#top', '<p>Yesterday</p>', fetcher='rendered')
+        archive.append(URL + '&searchpage=2', '<p>Jet</p>', status=404)
+
+    with PageArchive(tmp_path) as archive:
+        assert len(archive) == 3 and URL in archive and URL + '&searchpage=3' not in archive
+        first, second = archive.history(URL)
+        assert (first.html, first.status, first.timestamp, first.fetcher) == ('<p>Let It Be – š</p>', 200, timestamp,
+                                                                              'static')
+        assert first.headers == {'ETag': '"1"', 'Content-Length': str(len('<p>Let It Be – š</p>'.encode('utf-8')))}
+        assert archive.get(URL) == second and second.fetcher == 'rendered'
+        assert archive.get(URL + '&searchpage=2').status == 404
+
+
+def test_archive_recovers_after_a_crash(tmp_path):
+    with PageArchive(tmp_path) as archive:
+        for page in range(1, 4):
+            archive.append(f'{URL}&searchpage={page}', f'<p>{page}</p>')
+    index = (tmp_path / 'pages.idx').read_bytes()
+    (tmp_path / 'pages.idx').write_bytes(index[:30])               # the last entries are lost, one of them torn
+    with open(tmp_path / 'pages.warc.gz', 'ab') as f:
+        f.write(b'\x1f\x8b\x08\x00')                                # a torn record
+
+    with PageArchive(tmp_path) as archive:
+        assert len(archive) == 3
+        assert archive.get(f'{URL}&searchpage=3').html == '<p>3</p>'
+        archive.append(f'{URL}&searchpage=4', '<p>4</p>')
+    with PageArchive(tmp_path) as archive:
+        assert [archive.get(f'{URL}&searchpage={page}').html for page in range(1, 5)] == \
+               ['<p>1</p>', '<p>2</p>', '<p>3</p>', '<p>4</p>']
+
+
+def test_session_archives_fetched_pages(tmp_path):
+    with FixtureSite(n_pages=2) as site, PageArchive(tmp_path) as archive:
+        http_session.set_archive(archive)
+        try:
+            html = http_session.get(site.start_url).text
+        finally:
+            http_session.set_archive(None)
+            http_session.close_session()
+        assert archive.get(site.start_url).html == html
@@ -0,0 +1,17 @@
+import pytest
+
+from music import parsers
+
+
+def test_missing_backend_falls_back(monkeypatch):
+    monkeypatch.setitem(parsers.BACKENDS, 'lxml', 'no_such_module')
+    monkeypatch.setitem(parsers.BACKENDS, 'selectolax', 'no_such_module')
+    with pytest.warns(UserWarning):
+        assert parsers.resolve('selectolax') == 'html.parser'
+    with pytest.warns(UserWarning):
+        assert parsers.make_soup('<p>Yesterday</p>', 'lxml').p.text == 'Yesterday'
+
+
+def test_unknown_backend_is_an_error():
+    with pytest.raises(parsers.ParserBackendError):
+        parsers.set_backend('regex')
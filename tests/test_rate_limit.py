@@ -0,0 +1,51 @@
+import time
+
+import requests
+
+from music.rate_limit import AIMDLimiter, RateLimiter, TokenBucket, parse_retry_after
+
+
+def _response(status, retry_after=None):
+    response = requests.Response()
+    response.status_code = status
+    if retry_after is not None:
+        response.headers['Retry-After'] = retry_after
+    return response
+
+
+def test_retry_after_is_honored():
+    responses = [_response(429, '0.2'), _response(200)]
+    limiter = RateLimiter(rate=100, burst=100)
+    start = time.monotonic()
+    response = limiter.call('https://ultimateclassicrock.com/search/', lambda: responses.pop(0))
+    assert response.status_code == 200
+    assert time.monotonic() - start >= 0.2
+
+
+def test_aimd_increases_additively_and_decreases_multiplicatively():
+    limiter = AIMDLimiter(initial=4, maximum=8)
+    for _ in range(8):
+        limiter.acquire()
+        limiter.release(0.01)
+    assert 5 < limiter.limit <= 8
+    before = limiter.limit
+    limiter.acquire()
+    limiter.release(0.01, throttled=True)
+    assert limiter.limit == before / 2
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=50, burst=1)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.09
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('120') == 120
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after('inf') is None and parse_retry_after('nan') is None
+    assert parse_retry_after('1e300') == parse_retry_after('86400', max_pause=300) == 300
+    assert parse_retry_after('86400', max_pause=3600) == 3600
@@ -0,0 +1,16 @@
+import csv
+
+from music.sinks import CSV_HEADER, CSVSink, write_csv_stream
+
+
+def test_records_are_appended_in_batches(tmp_path):
+    csv_file = tmp_path / 'articles.csv'
+    with CSVSink(csv_file, batch_size=2) as sink:
+        sink.write(('Let It Be', 'Jane Doe', 'June 18, 2022', '/a.jpg'))
+        assert csv_file.read_text(encoding='utf-8').count('\n') == 1          # header only, record buffered
+        sink.write(('Yesterday', 'Jane Doe', 'June 19, 2022', '/b.jpg'))
+        assert csv_file.read_text(encoding='utf-8').count('\n') == 3
+    assert write_csv_stream((r for r in [('Jet', 'John Roe', 'June 20, 2022', '/c.jpg')]), csv_file) == 1
+    with open(csv_file, newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == CSV_HEADER and [row[0] for row in rows[1:]] == ['Let It Be', 'Yesterday', 'Jet']
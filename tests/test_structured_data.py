@@ -0,0 +1,44 @@
+import pytest
+
+from music import parsers
+from music.extract import extract_article_info_from_html, missing_fields
+from music.hybrid_fetch import fetch_hybrid
+from music.structured_data import find_embedded_articles, format_date
+from testdata.ucr_site import make_article, synthesize_page
+
+
+def _expected(n):
+    return [(article['title'], article['author'], format_date(article['date'].isoformat()), article['image_url'])
+            for article in map(make_article, range(n))]
+
+
+def test_format_date():
+    assert format_date('2022-06-08T09:30:00-04:00') == 'June 8, 2022'
+    assert format_date('June 8, 2022') == 'June 8, 2022'
+    assert format_date(None) == ''
+
+
+@pytest.mark.parametrize('embedded', ['json-ld', 'script', 'attributes'])
+@pytest.mark.parametrize('backend', ['html.parser', 'selectolax'])
+def test_dates_come_from_the_embedded_data(embedded, backend):
+    html = synthesize_page(1, 1, per_page=4, js_dates=True, embedded=embedded)
+    assert extract_article_info_from_html(html, backend) == _expected(4)
+    assert not missing_fields(parsers.make_soup(html), find_embedded_articles(html))
+
+
+def test_embedded_data_is_matched_by_title_without_urls():
+    html = '''<article><div class="content"><a>Wings Reunion</a><div class="auth-date"><time></time></div></div></article>
+        <article></article>
+        <script type="application/ld+json">[{"@type": "NewsArticle", "headline": "Wings  Reunion",
+            "datePublished": "2022-06-17", "author": [{"name": "Jane Doe"}, {"name": "John Roe"}]}]</script>'''
+    assert extract_article_info_from_html(html) == [('Wings Reunion', 'Jane Doe, John Roe', 'June 17, 2022', None)]
+
+
+def test_pages_with_embedded_data_are_not_rendered():
+    decisions = []
+    fetch_hybrid('u', lambda url: synthesize_page(1, 1, js_dates=True, embedded='json-ld'), lambda url: 1 / 0,
+                 decisions.append)
+    assert decisions[0].fetcher == 'static'
+    fetch_hybrid('u', lambda url: synthesize_page(1, 1, js_dates=True), lambda url: synthesize_page(1, 1),
+                 decisions.append)
+    assert decisions[1].fetcher == 'rendered' and decisions[1].missing == {'date'}
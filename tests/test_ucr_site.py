@@ -0,0 +1,38 @@
+import statistics
+import time
+
+import requests
+
+from music.extract import extract_article_info_from_html, inspect_page, missing_fields
+from music.parsers import make_soup
+from testdata.ucr_site import FixtureSite, synthesize_page
+
+
+def test_synthetic_pages_have_the_expected_markup():
+    records = extract_article_info_from_html(synthesize_page(2, 5))
+    assert len(records) == 10
+    assert all(title and author and date and image_url for title, author, date, image_url in records)
+    assert inspect_page(synthesize_page(2, 5)) == (True, 5)
+    assert inspect_page(synthesize_page(6, 5))[0] is False
+    assert missing_fields(make_soup(synthesize_page(1, 5, js_dates=True))) == {'date'}
+
+
+def test_site_serves_pages_with_etags_and_throttling():
+    with FixtureSite(n_pages=3, max_rps=2) as site:
+        response = requests.get(site.start_url + '&searchpage=3')
+        assert response.status_code == 200
+        assert extract_article_info_from_html(response.text) == extract_article_info_from_html(synthesize_page(3, 3))
+        response = requests.get(site.start_url + '&searchpage=3', headers={'If-None-Match': response.headers['ETag']})
+        assert response.status_code == 304
+        assert requests.get(site.start_url).status_code == 429
+        assert site.stats['statuses'] == {200: 1, 304: 1, 429: 1}
+
+
+def test_keep_alive_requests_do_not_stall():
+    with FixtureSite(n_pages=3) as site, requests.Session() as session:
+        durations = []
+        for _ in range(6):
+            start = time.perf_counter()
+            session.get(site.start_url)
+            durations.append(time.perf_counter() - start)
+        assert statistics.median(durations[1:]) < 0.02          # Nagle + delayed ACK would add ~40ms per request
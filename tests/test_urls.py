@@ -0,0 +1,21 @@
+from music.urls import canonicalize_url, page_url, url_fingerprint
+
+START_URL = 'https://ultimateclassicrock.com/search/?s=paul%20mccartney'
+
+
+def test_page_url_sets_the_page_parameter():
+    assert page_url(START_URL, 2) == START_URL + '&searchpage=2'
+    assert page_url(START_URL + '&searchpage=2', 3) == START_URL + '&searchpage=3'
+    assert page_url(START_URL + '&searchpage=2', 1) == START_URL
+    assert page_url('https://example.com/list?searchpage=4&sort=new', 5) == \
+           'https://example.com/list?sort=new&searchpage=5'
+
+
+def test_canonicalize_url():
+    variants = [START_URL, START_URL + '&searchpage=1',
+                'HTTPS://UltimateClassicRock.com:443/search/?s=paul+mccartney#top',
+                'https://ultimateclassicrock.com/search/./?utm_source=feed&s=paul%20mccartney']
+    assert {canonicalize_url(url) for url in variants} == {START_URL}
+    assert canonicalize_url('http://example.com:8080/a/../b?y=2&x=1') == 'http://example.com:8080/b?x=1&y=2'
+    assert canonicalize_url('http://example.com') == 'http://example.com/'
+    assert url_fingerprint(START_URL) != url_fingerprint(START_URL + '&searchpage=2')